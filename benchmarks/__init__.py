@@ -0,0 +1 @@
+"""Offline benchmarks for the agent runtime; run with `python -m benchmarks`."""
@@ -0,0 +1,177 @@
+"""
+Run the offline benchmark suite.
+
+    python -m benchmarks                        # every scenario, report to benchmarks/results/
+    python -m benchmarks fan_out --fan-out 16   # one scenario with overrides
+    python -m benchmarks --compare benchmarks/results/baseline.json
+
+Each scenario runs in a fresh process against local mock Anthropic and Honcho
+servers, so peak RSS is per scenario and no live service is touched. With
+`--compare`, the exit status is 1 if any scenario regressed by more than
+`--max-regression`.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from .runner import run_scenario
+from .scenarios import SCENARIOS
+
+# Metrics checked by --compare, and whether a larger value is better
+COMPARED_METRICS = {
+    ("iterations_per_second",): True,
+    ("overhead_ms", "p50"): False,
+    ("overhead_ms", "p99"): False,
+    ("state_io_ms", "total"): False,
+}
+
+
+def _run_isolated(name: str, overrides: dict[str, Any], options: dict[str, Any]):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_scenario, name, overrides, **options).result()
+
+
+def compare(
+    report: dict[str, Any], baseline: dict[str, Any], max_regression: float
+) -> list[str]:
+    """Describe every metric that got worse than `baseline` by more than `max_regression`."""
+    regressions = []
+    for name, result in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for path, higher_is_better in COMPARED_METRICS.items():
+            new, old = _lookup(result, path), _lookup(previous, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > max_regression:
+                regressions.append(
+                    f"{name}: {'.'.join(path)} {old} -> {new} ({change:+.0%})"
+                )
+    return regressions
+
+
+def _lookup(result: dict[str, Any], path: tuple[str, ...]) -> float | None:
+    value: Any = result
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument(
+        "scenarios", nargs="*", help=f"Scenarios to run: {', '.join(SCENARIOS)}"
+    )
+    parser.add_argument(
+        "--backend", dest="state_backend", choices=["honcho", "memory", "sqlite"]
+    )
+    parser.add_argument("--stream", action="store_true", default=None)
+    parser.add_argument("--tools", type=int)
+    parser.add_argument("--turns", type=int)
+    parser.add_argument("--fan-out", type=int)
+    parser.add_argument("--transcript", type=int)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--model-latency", type=float, default=0.0)
+    parser.add_argument("--honcho-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--output", help="Report path, default benchmarks/results/<time>.json"
+    )
+    parser.add_argument("--compare", help="Baseline report to check for regressions")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    parser.add_argument(
+        "--no-isolate", action="store_true", help="Run scenarios in this process"
+    )
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    overrides = {
+        key: getattr(args, key)
+        for key in (
+            "state_backend",
+            "stream",
+            "tools",
+            "turns",
+            "fan_out",
+            "transcript",
+        )
+        if getattr(args, key) is not None
+    }
+    options = {
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "model_latency": args.model_latency,
+        "honcho_latency": args.honcho_latency,
+    }
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": options,
+        "scenarios": {},
+    }
+    print(
+        f"{'scenario':<22}{'it/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'state ms':>11}{'rss MB':>9}"
+    )
+    for name in args.scenarios or list(SCENARIOS):
+        if args.no_isolate:
+            result = run_scenario(name, overrides, **options)
+        else:
+            result = _run_isolated(name, overrides, options)
+        report["scenarios"][name] = result
+        print(
+            f"{name:<22}{result['iterations_per_second']:>10}"
+            f"{result['overhead_ms']['p50']:>10}{result['overhead_ms']['p99']:>10}"
+            f"{result['state_io_ms']['total']:>11}{result['peak_rss_mb']:>9}"
+        )
+
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", time.strftime("%Y%m%d-%H%M%S.json")
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
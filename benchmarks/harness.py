@@ -0,0 +1,220 @@
+"""
+Instrumentation and metrics for benchmark runs.
+
+`Recorder` wraps the agent runtime's entry points for the duration of a run
+and keeps timestamps of every agent invocation, model call and state call.
+Framework overhead of an iteration is the wall time between one model call
+returning and the next one starting (or the agent returning), minus time
+spent in nested subagent runs: context fitting, transcript reads and writes,
+tool dispatch and bookkeeping.
+"""
+
+import asyncio
+import contextvars
+import functools
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable
+
+from src.agent import Agent
+from src.llm import LLMClient
+from src.message_writer import BufferedMessageWriter
+from src.state_backends import STATE_BACKENDS
+
+STATE_METHODS = ("add_message", "get_messages", "sync", "flush")
+
+# Set while inside a state call, so nested calls (get_messages -> sync) count once
+_in_state_call = contextvars.ContextVar("in_state_call", default=False)
+
+
+class Recorder:
+    def __init__(self):
+        self.invocations: list[tuple[int, float, float]] = []
+        self.model_calls: dict[int, list[tuple[float, float]]] = defaultdict(list)
+        self.state_seconds: dict[str, float] = defaultdict(float)
+        self.state_calls: dict[str, int] = defaultdict(int)
+        self.state_total_seconds = 0.0
+        self.background_write_seconds = 0.0
+        # Keeps clients alive so their ids are never reused within a run
+        self._clients: list[LLMClient] = []
+
+    @contextmanager
+    def install(self):
+        """Wrap the runtime's entry points until the block exits."""
+        patches = [
+            (Agent, "invoke", self._wrap_invoke(Agent.invoke)),
+            (LLMClient, "invoke", self._wrap_model_call(LLMClient.invoke)),
+            (LLMClient, "stream", self._wrap_model_stream(LLMClient.stream)),
+            (
+                BufferedMessageWriter,
+                "_write_batch",
+                self._wrap_background(BufferedMessageWriter._write_batch),
+            ),
+        ]
+        for cls in _state_classes():
+            for method in STATE_METHODS:
+                if method in vars(cls):
+                    patches.append(
+                        (cls, method, self._wrap_state(method, vars(cls)[method]))
+                    )
+
+        originals = [(cls, name, vars(cls)[name]) for cls, name, _ in patches]
+        for cls, name, wrapper in patches:
+            setattr(cls, name, wrapper)
+        try:
+            yield self
+        finally:
+            for cls, name, original in originals:
+                setattr(cls, name, original)
+
+    def _wrap_invoke(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def invoke(agent, *args, **kwargs):
+            self._clients.append(agent.llm)
+            started = time.perf_counter()
+            try:
+                return await func(agent, *args, **kwargs)
+            finally:
+                self.invocations.append((id(agent.llm), started, time.perf_counter()))
+
+        return invoke
+
+    def _wrap_model_call(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def invoke(llm, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(llm, *args, **kwargs)
+            finally:
+                self.model_calls[id(llm)].append((started, time.perf_counter()))
+
+        return invoke
+
+    def _wrap_model_stream(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def stream(llm, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                async for chunk in func(llm, *args, **kwargs):
+                    yield chunk
+            finally:
+                self.model_calls[id(llm)].append((started, time.perf_counter()))
+
+        return stream
+
+    def _wrap_state(self, name: str, func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_call(state, *args, **kwargs):
+                outer = not _in_state_call.get()
+                token = _in_state_call.set(True)
+                started = time.perf_counter()
+                try:
+                    return await func(state, *args, **kwargs)
+                finally:
+                    self._count_state(name, time.perf_counter() - started, outer)
+                    _in_state_call.reset(token)
+
+            return async_call
+
+        @functools.wraps(func)
+        def call(state, *args, **kwargs):
+            outer = not _in_state_call.get()
+            token = _in_state_call.set(True)
+            started = time.perf_counter()
+            try:
+                return func(state, *args, **kwargs)
+            finally:
+                self._count_state(name, time.perf_counter() - started, outer)
+                _in_state_call.reset(token)
+
+        return call
+
+    def _count_state(self, name: str, seconds: float, outer: bool) -> None:
+        self.state_seconds[name] += seconds
+        self.state_calls[name] += 1
+        if outer:
+            self.state_total_seconds += seconds
+
+    def _wrap_background(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.background_write_seconds += time.perf_counter() - started
+
+        return call
+
+    def overhead_samples(self) -> list[float]:
+        """Per-iteration framework overhead in seconds, across every agent."""
+        samples = []
+        for llm_id, started, ended in self.invocations:
+            calls = sorted(self.model_calls.get(llm_id, []))
+            if not calls:
+                continue
+            nested = [
+                (s, e)
+                for other, s, e in self.invocations
+                if other != llm_id and started <= s and e <= ended
+            ]
+            edges = [started] + [t for call in calls for t in call] + [ended]
+            gaps = [
+                max(0.0, end - start - _covered(nested, start, end))
+                for start, end in zip(edges[::2], edges[1::2])
+            ]
+            # The time after the last call belongs to the last iteration
+            gaps[-2] += gaps.pop()
+            samples.extend(gaps)
+        return samples
+
+    @property
+    def iterations(self) -> int:
+        return sum(len(calls) for calls in self.model_calls.values())
+
+
+def _state_classes() -> list[type]:
+    classes = list(STATE_BACKENDS.values())
+    try:
+        from src.agent_state import AgentState
+    except ImportError:
+        pass
+    else:
+        classes.append(AgentState)
+    return classes
+
+
+def _covered(intervals: list[tuple[float, float]], start: float, end: float) -> float:
+    """Length of [start, end] covered by the union of `intervals`."""
+    clipped = sorted(
+        (max(s, start), min(e, end)) for s, e in intervals if e > start and s < end
+    )
+    total, reach = 0.0, start
+    for s, e in clipped:
+        if e > reach:
+            total += e - max(s, reach)
+            reach = e
+    return total
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile, `q` in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_ms(values: list[float]) -> dict[str, Any]:
+    return {
+        "samples": len(values),
+        "mean": round(1000 * sum(values) / len(values), 3) if values else 0.0,
+        "p50": round(1000 * percentile(values, 50), 3),
+        "p99": round(1000 * percentile(values, 99), 3),
+        "max": round(1000 * max(values), 3) if values else 0.0,
+    }
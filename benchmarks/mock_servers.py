@@ -0,0 +1,391 @@
+"""
+Local stand-ins for the Anthropic Messages API and the Honcho endpoints used by
+`AgentState`, so the agent runtime can be benchmarked without live services.
+"""
+
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+
+Route = Callable[[str, dict[str, Any], dict[str, list[str]]], Any]
+
+
+class MockServer:
+    """
+    A JSON HTTP server on a free localhost port, run on a background thread.
+
+    Subclasses register `(method, path regex) -> handler` routes; handlers get
+    the path match groups, the JSON body and the query and return a JSON value.
+    Requests handled and time spent per route are counted in `stats`.
+    """
+
+    def __init__(self):
+        self.routes: list[tuple[str, re.Pattern, Route]] = []
+        self.stats: dict[str, dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def route(self, method: str, pattern: str, handler: Route) -> None:
+        self.routes.append((method, re.compile(f"^{pattern}$"), handler))
+
+    def start(self) -> "MockServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; don't let Nagle hold the body
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                started = time.perf_counter()
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = (
+                    json.loads(self.rfile.read(length) or b"null") if length else None
+                )
+
+                for method, pattern, handler in server.routes:
+                    match = pattern.match(parts.path)
+                    if method == self.command and match:
+                        server.dispatch(
+                            self, handler, match.groups(), body, parse_qs(parts.query)
+                        )
+                        server._count(pattern.pattern, time.perf_counter() - started)
+                        return
+                server.send_json(self, {"detail": "not found"}, status=404)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name=type(self).__name__, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def dispatch(self, request, handler, groups, body, query) -> None:
+        self.send_json(request, handler(*groups, body or {}, query))
+
+    @staticmethod
+    def send_json(request, value: Any, status: int = 200) -> None:
+        payload = json.dumps(value).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(payload)))
+        request.end_headers()
+        request.wfile.write(payload)
+
+    def _count(self, route: str, seconds: float) -> None:
+        with self._stats_lock:
+            entry = self.stats.setdefault(route, {"requests": 0, "seconds": 0.0})
+            entry["requests"] += 1
+            entry["seconds"] += seconds
+
+
+class ScriptedModel:
+    """
+    Deterministic stand-in for the model's decisions.
+
+    The turn number is read from the request itself (how many `bench step`
+    messages the agent has recorded), so the script is stateless and works for
+    any number of concurrent agents:
+
+    - a coordinator with `invoke_subagents` available fans out `fan_out` tasks
+      on its first turn, then completes
+    - a subagent calls every benchmark tool for `subagent_turns` turns, then
+      answers in text
+    - any other agent calls every benchmark tool for `turns` turns, then calls
+      `complete_task`
+    """
+
+    def __init__(self, *, turns: int = 5, subagent_turns: int = 2, fan_out: int = 4):
+        self.turns = turns
+        self.subagent_turns = subagent_turns
+        self.fan_out = fan_out
+
+    def __call__(self, payload: dict[str, Any]) -> dict[str, Any]:
+        tools = [t["name"] for t in payload.get("tools", [])]
+        bench_tools = [name for name in tools if name.startswith("bench_")]
+        turn = sum(
+            1
+            for message in payload["messages"]
+            if message["role"] == "assistant"
+            and _text(message["content"]).startswith("bench step")
+        )
+        content: list[dict[str, Any]] = [
+            {"type": "text", "text": f"bench step {turn + 1}"}
+        ]
+
+        if "You are a subagent" in _text(payload.get("system")):
+            if turn < self.subagent_turns:
+                content += [
+                    _tool_use(name, {"query": f"q{turn}"}) for name in bench_tools
+                ]
+            else:
+                content = [{"type": "text", "text": "bench step done: subagent result"}]
+        elif "invoke_subagents" in tools and turn == 0:
+            tasks = [
+                {"subagent_name": "bench-worker", "prompt": f"task {i}"}
+                for i in range(self.fan_out)
+            ]
+            content.append(_tool_use("invoke_subagents", {"tasks": tasks}))
+        elif turn < self.turns and "invoke_subagents" not in tools:
+            content += [_tool_use(name, {"query": f"q{turn}"}) for name in bench_tools]
+        else:
+            content.append(_tool_use("complete_task", {"result": "bench complete"}))
+
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": payload["model"],
+            "content": content,
+            "stop_reason": "tool_use" if len(content) > 1 else "end_turn",
+            "usage": {
+                "input_tokens": len(json.dumps(payload["messages"])) // 4,
+                "output_tokens": len(json.dumps(content)) // 4,
+                "cache_creation_input_tokens": 0,
+                "cache_read_input_tokens": 0,
+            },
+        }
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content)
+    return ""
+
+
+def _tool_use(name: str, arguments: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "type": "tool_use",
+        "id": f"toolu_{uuid.uuid4().hex[:12]}",
+        "name": name,
+        "input": arguments,
+    }
+
+
+class MockAnthropicServer(MockServer):
+    def __init__(
+        self,
+        model: Callable[[dict[str, Any]], dict[str, Any]] | None = None,
+        *,
+        latency: float = 0.0,
+        event_delay: float = 0.0,
+    ):
+        """
+        Serves `POST /v1/messages`, plain or streamed.
+
+        Args:
+            model: Maps a request payload to a response message, a ScriptedModel by default
+            latency: Seconds before the response (or first streamed event) is sent
+            event_delay: Seconds between streamed events
+        """
+        super().__init__()
+        self.model = model or ScriptedModel()
+        self.latency = latency
+        self.event_delay = event_delay
+        self.route("POST", "/v1/messages", self._messages)
+
+    def _messages(self, body, query):
+        time.sleep(self.latency)
+        return self.model(body)
+
+    def dispatch(self, request, handler, groups, body, query) -> None:
+        message = handler(*groups, body or {}, query)
+        if not body.get("stream"):
+            self.send_json(request, message)
+            return
+
+        request.send_response(200)
+        request.send_header("Content-Type", "text/event-stream")
+        request.send_header("Transfer-Encoding", "chunked")
+        request.end_headers()
+        for event in _stream_events(message):
+            chunk = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+            request.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            request.wfile.flush()
+            if self.event_delay:
+                time.sleep(self.event_delay)
+        request.wfile.write(b"0\r\n\r\n")
+
+
+def _stream_events(message: dict[str, Any]) -> list[dict[str, Any]]:
+    usage = message["usage"]
+    events = [
+        {
+            "type": "message_start",
+            "message": {
+                **{k: v for k, v in message.items() if k != "content"},
+                "content": [],
+                "usage": {**usage, "output_tokens": 0},
+            },
+        }
+    ]
+    for index, block in enumerate(message["content"]):
+        if block["type"] == "text":
+            start = {"type": "text", "text": ""}
+            delta = {"type": "text_delta", "text": block["text"]}
+        else:
+            start = {**block, "input": {}}
+            delta = {
+                "type": "input_json_delta",
+                "partial_json": json.dumps(block["input"]),
+            }
+        events += [
+            {"type": "content_block_start", "index": index, "content_block": start},
+            {"type": "content_block_delta", "index": index, "delta": delta},
+            {"type": "content_block_stop", "index": index},
+        ]
+    events += [
+        {
+            "type": "message_delta",
+            "delta": {"stop_reason": message["stop_reason"]},
+            "usage": {"output_tokens": usage["output_tokens"]},
+        },
+        {"type": "message_stop"},
+    ]
+    return events
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class MockHonchoServer(MockServer):
+    """
+    In-memory implementation of the Honcho v2 endpoints `AgentState` calls:
+    workspace/peer/session get-or-create, message batches, session context,
+    session search, session metadata and peer chat.
+    """
+
+    def __init__(self, *, latency: float = 0.0):
+        """
+        Args:
+            latency: Seconds added to every request, to model a remote service
+        """
+        super().__init__()
+        self.latency = latency
+        self.sessions: dict[tuple[str, str], dict[str, Any]] = {}
+        self.messages: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        self._lock = threading.RLock()
+
+        ws = "/v2/workspaces"
+        self.route("POST", ws, self._workspace)
+        self.route("POST", rf"{ws}/([^/]+)/peers", self._peer)
+        self.route("POST", rf"{ws}/([^/]+)/peers/([^/]+)/chat", self._chat)
+        self.route("POST", rf"{ws}/([^/]+)/sessions", self._session)
+        self.route("PUT", rf"{ws}/([^/]+)/sessions/([^/]+)", self._update_session)
+        self.route(
+            "POST", rf"{ws}/([^/]+)/sessions/([^/]+)/messages/?", self._add_messages
+        )
+        self.route("GET", rf"{ws}/([^/]+)/sessions/([^/]+)/context", self._context)
+        self.route("POST", rf"{ws}/([^/]+)/sessions/([^/]+)/search", self._search)
+
+    def dispatch(self, request, handler, groups, body, query) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        super().dispatch(request, handler, groups, body, query)
+
+    def _workspace(self, body, query):
+        return {
+            "id": body["id"],
+            "metadata": {},
+            "configuration": {},
+            "created_at": _now(),
+        }
+
+    def _peer(self, workspace_id, body, query):
+        return {
+            "id": body["id"],
+            "workspace_id": workspace_id,
+            "metadata": {},
+            "configuration": body.get("configuration") or {},
+            "created_at": _now(),
+        }
+
+    def _chat(self, workspace_id, peer_id, body, query):
+        return {
+            "content": f"{peer_id} knows nothing about {body.get('query', '')!r} yet"
+        }
+
+    def _session(self, workspace_id, body, query):
+        with self._lock:
+            session = self.sessions.setdefault(
+                (workspace_id, body["id"]),
+                {
+                    "id": body["id"],
+                    "workspace_id": workspace_id,
+                    "is_active": True,
+                    "metadata": body.get("metadata") or {},
+                    "configuration": body.get("configuration") or {},
+                    "created_at": _now(),
+                },
+            )
+        return session
+
+    def _update_session(self, workspace_id, session_id, body, query):
+        with self._lock:
+            session = self._session(workspace_id, {"id": session_id}, query)
+            session["metadata"] = body.get("metadata") or {}
+        return session
+
+    def _add_messages(self, workspace_id, session_id, body, query):
+        created = [
+            {
+                "id": uuid.uuid4().hex,
+                "content": message["content"],
+                "peer_id": message["peer_id"],
+                "session_id": session_id,
+                "workspace_id": workspace_id,
+                "metadata": message.get("metadata") or {},
+                "token_count": len(message["content"]) // 4,
+                "created_at": _now(),
+            }
+            for message in body["messages"]
+        ]
+        with self._lock:
+            self.messages.setdefault((workspace_id, session_id), []).extend(created)
+        return created
+
+    def _context(self, workspace_id, session_id, body, query):
+        with self._lock:
+            messages = list(self.messages.get((workspace_id, session_id), []))
+        return {"id": session_id, "messages": messages, "summary": ""}
+
+    def _search(self, workspace_id, session_id, body, query):
+        needle = body.get("query", "").lower()
+        with self._lock:
+            messages = self.messages.get((workspace_id, session_id), [])
+            hits = [m for m in messages if needle in m["content"].lower()]
+        return hits[: body.get("limit") or 10]
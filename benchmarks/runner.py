@@ -0,0 +1,106 @@
+"""Runs one benchmark scenario in the current process against fresh mock servers."""
+
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Any
+
+from .harness import Recorder, summarize_ms
+from .mock_servers import MockAnthropicServer, MockHonchoServer, ScriptedModel
+from .scenarios import DEFAULT_PARAMS, SCENARIOS
+
+
+def run_scenario(
+    name: str,
+    overrides: dict[str, Any],
+    *,
+    repeat: int,
+    warmup: int,
+    model_latency: float,
+    honcho_latency: float,
+) -> dict[str, Any]:
+    """Run one scenario in this process and return its report."""
+    builder, scenario_params = SCENARIOS[name]
+    params = {**DEFAULT_PARAMS, **scenario_params, **overrides}
+    model = ScriptedModel(
+        turns=params["turns"],
+        subagent_turns=params["subagent_turns"],
+        fan_out=params["fan_out"],
+    )
+    scratch = tempfile.mkdtemp(prefix="deepagents-bench-")
+
+    with (
+        MockAnthropicServer(model, latency=model_latency) as anthropic,
+        MockHonchoServer(latency=honcho_latency) as honcho,
+    ):
+        os.environ.update(
+            ANTHROPIC_BASE_URL=f"{anthropic.url}/v1",
+            ANTHROPIC_API_KEY="bench",
+            HONCHO_URL=honcho.url,
+            HONCHO_API_KEY="bench",
+            DEEPAGENTS_SQLITE_PATH=os.path.join(scratch, "state.db"),
+            DEEPAGENTS_WORKSPACE=scratch,
+        )
+        os.environ.pop("DEEPAGENTS_CASSETTE_MODE", None)
+
+        report = asyncio.run(
+            _measure(builder, params, repeat, warmup, anthropic, honcho)
+        )
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    report["peak_rss_mb"] = round(
+        peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1
+    )
+    report["params"] = params
+    return report
+
+
+async def _measure(builder, params, repeat, warmup, anthropic, honcho):
+    recorder = Recorder()
+    wall: list[float] = []
+    for run in range(warmup + repeat):
+        measured = run >= warmup
+        if run == warmup:
+            anthropic.stats.clear()
+            honcho.stats.clear()
+
+        agent, prompt = builder(params)
+        await agent.state.flush()
+        try:
+            if measured:
+                with recorder.install():
+                    started = time.perf_counter()
+                    await agent.invoke(prompt)
+                    wall.append(time.perf_counter() - started)
+            else:
+                await agent.invoke(prompt)
+        finally:
+            await agent.aclose()
+
+    total = sum(wall)
+    return {
+        "runs": repeat,
+        "wall_seconds": round(total, 4),
+        "iterations": recorder.iterations,
+        "iterations_per_second": round(recorder.iterations / total, 2) if total else 0,
+        "overhead_ms": summarize_ms(recorder.overhead_samples()),
+        "state_io_ms": {
+            "total": round(1000 * recorder.state_total_seconds, 3),
+            **{
+                method: round(1000 * seconds, 3)
+                for method, seconds in sorted(recorder.state_seconds.items())
+            },
+        },
+        "state_calls": dict(sorted(recorder.state_calls.items())),
+        "background_write_ms": round(1000 * recorder.background_write_seconds, 3),
+        "anthropic_requests": _requests(anthropic.stats),
+        "honcho_requests": _requests(honcho.stats),
+    }
+
+
+def _requests(stats: dict[str, dict[str, float]]) -> int:
+    return sum(int(entry["requests"]) for entry in stats.values())
@@ -0,0 +1,117 @@
+"""
+Benchmark scenarios. Each builds a top-level agent wired to the local mock
+servers and returns it with the task prompt to run.
+"""
+
+import uuid
+from typing import Any, Callable
+
+from src import SubAgent
+from src.agent import Agent
+from src.tool_registry import tool
+
+DEFAULT_PARAMS: dict[str, Any] = {
+    # Benchmark tools offered to each agent, all called on every tool turn
+    "tools": 8,
+    # Tool turns before the agent completes
+    "turns": 5,
+    # Subagent tasks handed out by the coordinator, and tool turns per subagent
+    "fan_out": 4,
+    "subagent_turns": 2,
+    # Messages already in the session before the task starts
+    "transcript": 0,
+    "message_chars": 400,
+    # Characters returned by each tool call
+    "result_chars": 200,
+    "stream": False,
+    "state_backend": "honcho",
+}
+
+_bench_tools: dict[int, Callable] = {}
+
+
+def bench_tools(count: int, result_chars: int) -> list[Callable]:
+    """Register (once) and return `count` trivial tools, alternating sync and async."""
+    tools = []
+    for i in range(count):
+        if i not in _bench_tools:
+            _bench_tools[i] = _make_tool(i)
+        tools.append(_bench_tools[i])
+    _BenchResult.chars = result_chars
+    return tools
+
+
+class _BenchResult:
+    chars = 200
+
+
+def _make_tool(i: int) -> Callable:
+    if i % 2:
+
+        async def bench_tool(query: str) -> dict:
+            return {"tool": i, "query": query, "data": "x" * _BenchResult.chars}
+
+    else:
+
+        def bench_tool(query: str) -> dict:
+            return {"tool": i, "query": query, "data": "x" * _BenchResult.chars}
+
+    bench_tool.__name__ = f"bench_tool_{i}"
+    return tool(description=f"Benchmark tool {i}")(bench_tool)
+
+
+def _agent(params: dict[str, Any], **kwargs) -> Agent:
+    return Agent(
+        session_id=f"bench-{uuid.uuid4().hex[:12]}",
+        verbose=False,
+        stream=params["stream"],
+        state_backend=params["state_backend"],
+        **kwargs,
+    )
+
+
+def single_agent(params: dict[str, Any]) -> tuple[Agent, str]:
+    agent = _agent(
+        params,
+        name="bench-agent",
+        tools=bench_tools(params["tools"], params["result_chars"]),
+        instructions="You are a benchmark agent.",
+    )
+    return agent, "Run the benchmark task."
+
+
+def fan_out(params: dict[str, Any]) -> tuple[Agent, str]:
+    worker = SubAgent(
+        name="bench-worker",
+        description="Runs one benchmark task",
+        tools=bench_tools(params["tools"], params["result_chars"]),
+        instructions="You are a benchmark worker.",
+        stream=params["stream"],
+        verbose=False,
+    )
+    agent = _agent(
+        params,
+        name="bench-coordinator",
+        tools=[],
+        instructions="You are a benchmark coordinator.",
+        subagents=[worker],
+        max_subagent_concurrency=params["fan_out"],
+    )
+    return agent, "Split the benchmark task across workers."
+
+
+def long_transcript(params: dict[str, Any]) -> tuple[Agent, str]:
+    agent, prompt = single_agent(params)
+    filler = "lorem ipsum " * (params["message_chars"] // 12)
+    for i in range(params["transcript"]):
+        peer = "User" if i % 2 else "tool-caller"
+        agent.state.add_message(peer, f"earlier message {i}: {filler}")
+    return agent, prompt
+
+
+SCENARIOS: dict[str, tuple[Callable[[dict[str, Any]], tuple[Agent, str]], dict]] = {
+    "single_agent": (single_agent, {}),
+    "single_agent_stream": (single_agent, {"stream": True}),
+    "fan_out": (fan_out, {}),
+    "long_transcript": (long_transcript, {"transcript": 2000, "turns": 3}),
+}
@@ -20,7 +20,8 @@ load_dotenv()
 
 # Conversational tool for user interaction
 @tool(
-    description="Communicate with the user - ask questions, provide updates, or share findings"
+    description="Communicate with the user - ask questions, provide updates, or share findings",
+    serial=True,
 )
 def communicate_with_user(
     message: str,
@@ -90,7 +91,7 @@ async def main():
         verbose=True,
     )
 
-    result = agent.invoke(
+    result = await agent.invoke(
         "Use the conversational assistant to determine what the user wants to research, then delegate to the report writer to write a report. Once the report is complete, let the user know where to find it."
     )
 
@@ -10,7 +10,14 @@ project_root = os.path.join(script_dir, "..")
 sys.path.insert(0, project_root)
 
 from src import SubAgent, create_deep_agent  # noqa: E402
-from src.tools import internet_search, ls, read_file, write_file  # noqa: E402
+from src.tools import (  # noqa: E402
+    append_file,
+    edit_file,
+    internet_search,
+    ls,
+    read_file,
+    write_file,
+)
 
 # Load environment variables
 load_dotenv()
@@ -73,7 +80,7 @@ Your workflow should be:
 1. Save the original user question to `question.txt` using write_file (do this only once)
 2. Use the research-agent subagent to conduct deep research on the topic
 3. Write a comprehensive report to `final_report.md` based on the research findings
-4. Optionally use the critique-agent to review your report and provide feedback
+4. Optionally use the critique-agent to review your report and provide feedback; apply its feedback with edit_file rather than rewriting the whole report
 5. When you have completed the research and written the report, use complete_task to provide the final result
 
 Important guidelines:
@@ -85,7 +92,9 @@ Important guidelines:
 Available tools:
 - invoke_subagent: Delegate research and critique tasks to specialized agents
 - write_file: Save files (filename, content) - use sparingly and purposefully
-- read_file: Read existing files when needed
+- append_file: Add a section to the end of a file without rewriting it
+- edit_file: Change part of a file (a unique snippet or a range of lines) in place
+- read_file: Read existing files when needed; long files come back a page at a time
 - ls: List files in the output directory
 - complete_task: Signal completion and provide final result"""
 
@@ -93,7 +102,7 @@ Available tools:
 async def main():
     agent = create_deep_agent(
         name="ResearchCoordinator",
-        tools=[ls, read_file, write_file],
+        tools=[ls, read_file, write_file, append_file, edit_file],
         instructions=research_coordinator_instructions,
         subagents=[research_subagent, critique_subagent],
         verbose=True,
@@ -103,7 +112,7 @@ async def main():
     print("This may take a few minutes...")
 
     # Run agent
-    result = agent.invoke("Research the impact of AI on healthcare in 2024")
+    result = await agent.invoke("Research the impact of AI on healthcare in 2024")
 
     print("\n=== Research Complete ===")
     print(f"\033[92mFinal result: {result}\033[0m")
@@ -36,11 +36,11 @@ async def main():
     print("Starting agent...")
 
     # Run agent
-    result = agent.invoke("What is the current time?")
+    result = await agent.invoke("What is the current time?")
     print(f"\033[92mFinal result: {result}\033[0m")
 
     # Run agent again
-    result = agent.invoke(
+    result = await agent.invoke(
         "Who is the current president of France? Check the news for the latest information."
     )
     print(f"\033[92mFinal result: {result}\033[0m")
@@ -36,7 +36,7 @@ async def main():
     print("Starting agent...")
 
     # Run agent
-    result = agent.invoke(
+    result = await agent.invoke(
         "Who is the current president of the United States? Check the news for the latest information."
     )
     print(f"\033[92mFinal result: {result}\033[0m")
@@ -1,3 +1,13 @@
 from .agent import Agent, SubAgent, create_deep_agent
+from .runtime import AgentRuntime
+from .state_backends import InMemoryState, SQLiteState, StateBackend
 
-__all__ = ["create_deep_agent", "SubAgent", "Agent"]
+__all__ = [
+    "create_deep_agent",
+    "SubAgent",
+    "Agent",
+    "AgentRuntime",
+    "StateBackend",
+    "InMemoryState",
+    "SQLiteState",
+]
@@ -1,11 +1,90 @@
+import asyncio
 import json
 import uuid
-from typing import Any, Callable, cast
-
-from .agent_state import AgentState
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, Awaitable, Callable, cast
+
+import httpx
+
+from .agent_spec import AgentSpec, compile_agent_spec
+from .budget import (
+    DEFAULT_MAX_TOKENS,
+    AdaptiveMaxTokens,
+    Budget,
+    TaskUsage,
+    task_usage_scope,
+)
+from .context_window import DEFAULT_CONTEXT_WINDOW, ContextWindow
+from .deadline import Deadline, deadline_scope, time_remaining
 from .llm import LLMClient
-from .tool_registry import registry
-from .tools import complete_task, invoke_subagent
+from .prompt_cache import DEFAULT_CACHE_POLICY, CachePolicy
+from .rate_limit import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from .state_backends import StateBackend, create_state
+from .streaming import MessageAssembler
+from .tool_registry import ToolTimeout, registry
+from .tool_schema import ToolArgumentError
+from .tools import complete_task, invoke_subagent, invoke_subagents
+from .tracing import span
+
+
+class ToolCallBatch:
+    """
+    Runs the tool calls of one assistant turn concurrently.
+
+    Calls start in submission order and at most `semaphore`'s worth run at
+    once. Tools registered with `serial=True` act as barriers: they wait for
+    every earlier call in the turn to finish, and later calls wait for them.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[str, dict[str, Any]], Awaitable[Any]],
+        semaphore: asyncio.Semaphore,
+    ):
+        self._run = run
+        self._semaphore = semaphore
+        self._tasks: list[asyncio.Task] = []
+        self._barrier: asyncio.Task | None = None
+
+    def submit(self, tool_name: str, tool_args: dict[str, Any]) -> asyncio.Task:
+        serial = registry.is_serial(tool_name)
+        if serial:
+            waits = list(self._tasks)
+        else:
+            waits = [self._barrier] if self._barrier else []
+
+        task = asyncio.create_task(self._start(waits, tool_name, tool_args))
+        if serial:
+            self._barrier = task
+        self._tasks.append(task)
+        return task
+
+    async def _start(
+        self, waits: list[asyncio.Task], tool_name: str, tool_args: dict[str, Any]
+    ) -> Any:
+        if waits:
+            await asyncio.wait(waits)
+        async with self._semaphore:
+            return await self._run(tool_name, tool_args)
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            if not task.done():
+                task.cancel()
+
+
+def _stopped_early(reason: str, progress: str) -> str:
+    """The best-effort answer of a task cut short by its budget or deadline."""
+    return f"Task stopped early: {reason}." + (
+        f"\n\nProgress so far:\n{progress}" if progress.strip() else ""
+    )
+
+
+async def _iterate_blocks(
+    content: list[dict[str, Any]],
+) -> AsyncGenerator[dict[str, Any], None]:
+    for block in content:
+        yield block
 
 
 class SubAgent:
@@ -18,6 +97,10 @@ class SubAgent:
         model: str = "claude-4-sonnet-20250514",
         verbose: bool = True,
         max_iterations: int = 50,
+        stream: bool = False,
+        max_tool_concurrency: int = 8,
+        timeout: float | None = None,
+        tool_timeout: float | None = None,
     ):
         self.name: str = name
         self.description: str = description
@@ -26,6 +109,11 @@ class SubAgent:
         self.model = model
         self.verbose = verbose
         self.max_iterations = max_iterations
+        self.stream = stream
+        self.max_tool_concurrency = max_tool_concurrency
+        # Seconds each run may take; the parent's deadline applies as well
+        self.timeout = timeout
+        self.tool_timeout = tool_timeout
 
 
 class Agent:
@@ -34,19 +122,32 @@ class Agent:
         name: str,
         tools: list[Callable],
         instructions: str,
-        session_id: str = str(uuid.uuid4()),
+        session_id: str | None = None,
         model: str = "claude-4-sonnet-20250514",
         verbose: bool = True,
         subagents: list[SubAgent] = None,
         max_iterations: int = 50,
         is_subagent: bool = False,
+        stream: bool = False,
+        max_tool_concurrency: int = 8,
+        max_subagent_concurrency: int = 4,
+        state_backend: str | Callable[..., StateBackend] = "honcho",
+        cache_policy: CachePolicy | None = DEFAULT_CACHE_POLICY,
+        context_window: ContextWindow | None = DEFAULT_CONTEXT_WINDOW,
+        budget: Budget | None = None,
+        max_tokens: int | AdaptiveMaxTokens = DEFAULT_MAX_TOKENS,
+        http_client: httpx.AsyncClient | None = None,
+        timeout: float | None = None,
+        tool_timeout: float | None = None,
     ):
         self.name: str = name
+        # A fresh session per agent unless one is given to resume
+        session_id = session_id or str(uuid.uuid4())
 
         extra_tools = []
 
         if subagents:
-            extra_tools.append(invoke_subagent)
+            extra_tools.extend([invoke_subagent, invoke_subagents])
 
         if not is_subagent:
             extra_tools.append(complete_task)
@@ -60,8 +161,43 @@ class Agent:
         self.verbose = verbose
         self.max_iterations = max_iterations
         self.is_subagent = is_subagent
-        self.state = AgentState(peer_id=self.name, session_id=session_id)
-        self.llm = LLMClient(model=model)
+        self.stream = stream
+        self._tool_semaphore = asyncio.Semaphore(max_tool_concurrency)
+        self._subagent_semaphore = asyncio.Semaphore(max_subagent_concurrency)
+        self.state_backend = state_backend
+        self.state: StateBackend = create_state(
+            state_backend, peer_id=self.name, session_id=session_id
+        )
+        self.llm = LLMClient(
+            model=model,
+            cache_policy=cache_policy,
+            http_client=http_client,
+            priority=PRIORITY_BACKGROUND if is_subagent else PRIORITY_INTERACTIVE,
+            session=self.state.session_id,
+        )
+        self.context_window = context_window
+        # Applies when this agent runs as the root task; subagents share the root's
+        self.budget = budget
+        self.max_tokens = max_tokens
+        self.task_usage: TaskUsage | None = None
+        self._output_tokens: list[int] = []
+        self._last_max_tokens: int | None = None
+        self._truncated = False
+        # Seconds a task may take, and a tool call unless the tool sets its own;
+        # both are cut short by the deadline of the task this agent runs under
+        self.timeout = timeout
+        self.tool_timeout = tool_timeout
+        self.deadline: Deadline | None = None
+
+    @property
+    def spec(self) -> AgentSpec:
+        """This agent's compiled system prompt and tool schemas, shared by agents like it."""
+        return compile_agent_spec(
+            self.instructions,
+            [tool.__name__ for tool in self.tools],
+            [(s.name, s.description) for s in self.subagents.values()],
+            self.is_subagent,
+        )
 
     def _log(self, message: str, level: str = "INFO"):
         """Log agent dialogue with formatting"""
@@ -75,167 +211,419 @@ class Agent:
     async def invoke(
         self, first_message: str = "Hello", *, parent_agent: str | None = None
     ) -> str:
-        tool_names = [tool.__name__ for tool in self.tools]
+        with (
+            span(
+                "agent.task",
+                agent=self.name,
+                session_id=self.state.session_id,
+                parent_agent=parent_agent,
+            ) as task,
+            task_usage_scope(self.budget) as (usage, is_root),
+            deadline_scope(self.timeout) as deadline,
+        ):
+            self.task_usage = usage
+            self.deadline = deadline
+            succeeded = False
+            try:
+                result = await self._run_task(first_message, parent_agent)
+                succeeded = True
+                return result
+            finally:
+                if is_root:
+                    summary = usage.summary()
+                    task.set_attributes(
+                        {
+                            "task.tokens": summary["tokens"],
+                            "task.cost_usd": summary["cost"],
+                        }
+                    )
+                    self._log(
+                        f"Task used {summary['tokens']} tokens (${summary['cost']:.4f}) "
+                        f"over {summary['iterations']} model calls in {summary['seconds']}s",
+                        "DEBUG",
+                    )
+                # Transcript writes are batched in the background; land them before returning
+                try:
+                    await self.state.flush()
+                except Exception as e:
+                    # A failed write surfaces only if the task itself succeeded,
+                    # so it never replaces the task's own error
+                    if succeeded:
+                        raise
+                    self._log(f"Could not save the transcript: {e}", "DEBUG")
+
+    async def _run_task(self, first_message: str, parent_agent: str | None) -> str:
+        spec = self.spec
+        system_prompt = spec.system_prompt
+        tool_schemas = spec.tool_schemas
+
+        self._log(f"Starting task with {len(spec.tool_names)} available tools", "DEBUG")
+        if spec.tool_names:
+            self._log(f"Tools: {', '.join(spec.tool_names)}", "DEBUG")
+
+        # Read any earlier transcript off the event loop, then kick off this task
+        await self.state.load()
+        self.state.add_message(parent_agent or "User", first_message)
 
-        system_prompt = self.instructions
+        last_text_response = ""
 
-        if self.tools:
-            system_prompt += """
+        for iteration in range(self.max_iterations):
+            with span(
+                "agent.iteration", agent=self.name, iteration=iteration + 1
+            ) as step:
+                exceeded = self.task_usage.check()
+                if exceeded is not None:
+                    action, reason = exceeded
+                    if action == "stop":
+                        self._log(f"Stopping: {reason}", "DEBUG")
+                        step.set("budget.stopped", reason)
+                        return _stopped_early(reason, last_text_response)
+                    downgrade_model = self.task_usage.budget.downgrade_model
+                    if self.llm.client.model != downgrade_model:
+                        self._log(f"{reason}; switching to {downgrade_model}", "DEBUG")
+                        self.llm.client.model = downgrade_model
+
+                if self.deadline is not None and self.deadline.expired:
+                    self._log("Stopping: deadline reached", "DEBUG")
+                    step.set("deadline.stopped", True)
+                    return _stopped_early("deadline reached", last_text_response)
+
+                max_tokens = self._choose_max_tokens()
+                # Model calls, rate-limit waits and the turn's tool calls are all
+                # cancelled when the deadline passes
+                scope = asyncio.timeout(time_remaining())
+                try:
+                    async with scope:
+                        result, content, stop_reason = await self._run_iteration(
+                            iteration, system_prompt, tool_schemas, max_tokens
+                        )
+                except TimeoutError:
+                    if not scope.expired():
+                        raise
+                    self._log("Stopping: deadline reached mid-turn", "DEBUG")
+                    step.set("deadline.stopped", True)
+                    return _stopped_early("deadline reached", last_text_response)
+
+                usage = self.llm.last_usage
+                cost = self.task_usage.record(self.name, self.llm.client.model, usage)
+                step.set("cost_usd", cost)
+                self._output_tokens = (
+                    self._output_tokens + [usage.get("output_tokens", 0)]
+                )[-5:]
+                self._last_max_tokens = max_tokens
+                self._truncated = stop_reason == "max_tokens"
+                self._log(
+                    f"Tokens: {usage.get('input_tokens', 0)} in "
+                    f"({usage.get('cache_read_input_tokens', 0)} cache read, "
+                    f"{usage.get('cache_creation_input_tokens', 0)} cache write), "
+                    f"{usage.get('output_tokens', 0)} out",
+                    "DEBUG",
+                )
 
-You have access to the following tools to complete the task:
-""" + "\n".join([f"- {name}: {registry.get_description(name)}" for name in tool_names])
+                # Turn boundary: let the background writer persist this turn
+                self.state.flush_soon()
 
-        if self.subagents:
-            system_prompt += (
-                """
+                if result:
+                    return result
 
-You have access to the following subagents to complete the task:
-"""
-                + "\n".join(
-                    [
-                        f"- {subagent.name}: {subagent.description}"
-                        for subagent in self.subagents.values()
-                    ]
-                )
-                + """
+                if not content:
+                    self._log("No response from LLM", "DEBUG")
+                    break
 
-Use subagents by calling the `invoke_subagent` tool. If subagents are provided, you should make use of them to complete the task if at all possible.
-"""
-            )
+                for item in content:
+                    if item.get("type") == "text":
+                        last_text_response = item["text"]
+                has_tool_calls = any(item.get("type") == "tool_use" for item in content)
 
-        if not self.is_subagent:
-            system_prompt += """
+                # if we got a text response but no tool calls, and we have some content, stop here
+                if not has_tool_calls and last_text_response.strip():
+                    return last_text_response
 
-When you are done, you should call the `complete_task` tool to tell the user the result. The user will **only** see the text given to this tool. The user will now send a message describing the task.
-"""
-        else:
-            system_prompt += """
-            
-You are a subagent. When you have completed your task, provide your final result in a comprehensive response. Do NOT continue making additional tool calls after you have sufficient information to answer the question. Stop as soon as you have a complete answer.
-"""
+        # For subagents, return the last text response instead of failing
+        if self.is_subagent:
+            return last_text_response
 
-        self._log(f"Starting task with {len(tool_names)} available tools", "DEBUG")
-        if tool_names:
-            self._log(f"Tools: {', '.join(tool_names)}", "DEBUG")
+        self._log(f"Task failed after {iteration + 1} iterations", "DEBUG")
 
-        tool_schemas: list[dict[str, Any]] = [
-            registry.get_schema(tool_name) for tool_name in tool_names
-        ]
+    async def _run_iteration(
+        self,
+        iteration: int,
+        system_prompt: str,
+        tool_schemas: list[dict[str, Any]],
+        max_tokens: int,
+    ) -> tuple[str | None, list[dict[str, Any]], str | None]:
+        """
+        One model call and the tool calls it asks for.
+
+        Returns:
+            The `complete_task` result if any, the response content, and its stop reason
+        """
+        messages = self.state.get_messages()
+        if self.context_window is not None:
+            messages = await self.context_window.fit(
+                messages, system_prompt, tool_schemas
+            )
 
-        # Add the first message to kick off this task
-        self.state.add_message(parent_agent or "User", first_message)
+        self._log(
+            f"Iteration {iteration + 1}/{self.max_iterations} - Thinking...",
+            "DEBUG",
+        )
 
-        last_text_response = ""
+        if self.stream:
+            assembler = MessageAssembler()
+            result = await self._run_turn(
+                self._stream_blocks(
+                    assembler, messages, tool_schemas, system_prompt, max_tokens
+                )
+            )
+            self.llm.record_usage(assembler.message.get("usage"))
+            return result, assembler.content, assembler.message.get("stop_reason")
+
+        response = await self.llm.invoke(
+            messages, tool_schemas, system_prompt, max_tokens
+        )
+        content = response.get("content") or []
+        if not isinstance(content, list):
+            content = [content]
+        result = await self._run_turn(_iterate_blocks(content))
+        return result, content, response.get("stop_reason")
+
+    def _choose_max_tokens(self) -> int:
+        """`max_tokens` for the next call, from the policy and the task's remaining budget."""
+        remaining = self.task_usage.remaining_tokens()
+        if isinstance(self.max_tokens, int):
+            return (
+                self.max_tokens
+                if remaining is None
+                else min(self.max_tokens, max(256, remaining))
+            )
+        return self.max_tokens.choose(
+            self._output_tokens, self._last_max_tokens, self._truncated, remaining
+        )
 
-        for iteration in range(self.max_iterations):
-            messages = self.state.get_messages()
+    async def _stream_blocks(
+        self,
+        assembler: MessageAssembler,
+        messages: list[dict[str, str]],
+        tool_schemas: list[dict[str, Any]],
+        system_prompt: str,
+        max_tokens: int,
+    ) -> AsyncGenerator[dict[str, Any], None]:
+        """Stream one model turn, yielding each content block as soon as it closes."""
+        async with aclosing(
+            self.llm.stream(messages, tool_schemas, system_prompt, max_tokens)
+        ) as stream:
+            async for data in stream:
+                block = assembler.feed(data)
+                if block is not None:
+                    yield block
+
+    async def _run_turn(
+        self, blocks: AsyncGenerator[dict[str, Any], None]
+    ) -> str | None:
+        """
+        Handle the content blocks of one assistant turn.
 
-            self._log(
-                f"Iteration {iteration + 1}/{self.max_iterations} - Thinking...",
-                "DEBUG",
-            )
-            response = self.llm.invoke(messages, tool_schemas, system_prompt)
-
-            if response.get("content"):
-                content: list[dict[str, Any]] | dict[str, Any] = response["content"]
-                has_tool_calls = False
-
-                if isinstance(content, list):
-                    for item in content:
-                        if item.get("type") == "text":
-                            last_text_response = item["text"]
-                        if item.get("type") == "tool_use":
-                            has_tool_calls = True
-                        result = await self._handle_content_item(item)
-                        if result:
-                            return result
-                else:
-                    if content.get("type") == "text":
-                        last_text_response = content["text"]
-                    if content.get("type") == "tool_use":
-                        has_tool_calls = True
-                    result = await self._handle_content_item(content)
-                    if result:
-                        return result
+        Each tool call is started as soon as its block arrives and runs
+        concurrently with the other calls of the turn (see `ToolCallBatch`).
+        Transcript messages are recorded in block order once every call has
+        finished. A `complete_task` block stops reading further blocks.
 
-                # if we got a text response but no tool calls, and we have some content, stop here
-                if not has_tool_calls and last_text_response.strip():
-                    return last_text_response
+        Returns:
+            The `complete_task` result, if the turn produced one
+        """
+        batch = ToolCallBatch(self._run_tool_call, self._tool_semaphore)
+        pending: list[tuple[dict[str, Any], asyncio.Task | None]] = []
+        final_result: str | None = None
 
-            else:
-                self._log("No response from LLM", "DEBUG")
-                break
+        try:
+            async with aclosing(blocks):
+                async for block in blocks:
+                    if block.get("type") == "text":
+                        self._log(f"{block['text']}")
+                        pending.append((block, None))
+                    elif block.get("type") == "tool_use":
+                        if block.get("incomplete"):
+                            # Input cut off by max_tokens; the next turn gets a
+                            # larger limit and the model is told to retry
+                            self._log(f"Tool call {block['name']} truncated", "TOOL")
+                            pending.append((block, None))
+                        elif block["name"] == "complete_task":
+                            final_result = cast(str, block["input"]["result"])
+                            break
+                        else:
+                            pending.append(
+                                (block, batch.submit(block["name"], block["input"]))
+                            )
+
+            for block, task in pending:
+                if block.get("incomplete"):
+                    self.state.add_message(
+                        "tool-caller",
+                        f"Error executing {block['name']}: the call was cut off by "
+                        "the output token limit before its arguments were complete; "
+                        "retry it",
+                    )
+                elif task is None:
+                    self.state.add_message(self.name, block["text"])
+                else:
+                    for peer_name, message in await task:
+                        self.state.add_message(peer_name, message)
+        finally:
+            batch.cancel()
 
-        # For subagents, return the last text response instead of failing
-        if self.is_subagent:
-            return last_text_response
+        if final_result is not None:
+            self.state.add_message(self.name, final_result)
 
-        self._log(f"Task failed after {iteration + 1} iterations", "DEBUG")
+        return final_result
 
-    async def _handle_content_item(self, item: dict[str, Any]) -> str | None:
-        if item.get("type") == "text":
-            response_text = item["text"]
-            self._log(f"{response_text}")
-            self.state.add_message(self.name, response_text)
-            return None
-        elif item.get("type") == "tool_use":
-            tool_name = item["name"]
-            tool_args = item["input"]
-            return await self._execute_tool_call(tool_name, tool_args)
-
-    async def _execute_tool_call(
+    async def _run_tool_call(
         self, tool_name: str, tool_args: dict[str, Any]
-    ) -> str | None:
-        if tool_name == "complete_task":
-            self.state.add_message(self.name, tool_args["result"])
-            return cast(str, tool_args["result"])
+    ) -> list[tuple[str, str]]:
+        """
+        Execute a tool call without touching the transcript.
 
+        Returns:
+            The (peer, content) messages the call should add to the session
+        """
         self._log(f"Using tool: {tool_name} with args: {tool_args}", "TOOL")
 
+        if tool_name in ("invoke_subagent", "invoke_subagents"):
+            # Handled here rather than by the registry, so validate them here too
+            try:
+                tool_args = registry.validate(tool_name, tool_args)
+            except ToolArgumentError as e:
+                self._log(f"Tool {tool_name} failed: {str(e)}", "TOOL")
+                return [("tool-caller", f"Error executing {tool_name}: {str(e)}")]
+
         if tool_name == "invoke_subagent":
-            subagent_name = tool_args["subagent_name"]
-            subagent_prompt = tool_args["prompt"]
-            subagent = self.subagents.get(subagent_name)
-            if not subagent:
-                self._log(f"Subagent {subagent_name} not found", "TOOL")
-                return None
-            # the result will be added to message history by the subagent
-            run_subagent(subagent, self.name, self.state.session_id, subagent_prompt)
-            return None
+            return [
+                await self._invoke_subagent(
+                    tool_args["subagent_name"], tool_args["prompt"]
+                )
+            ]
+
+        if tool_name == "invoke_subagents":
+            return list(
+                await asyncio.gather(
+                    *(
+                        self._invoke_subagent(task["subagent_name"], task["prompt"])
+                        for task in tool_args["tasks"]
+                    )
+                )
+            )
 
         try:
-            result = await registry.execute(name=tool_name, arguments=tool_args)
+            result = await registry.execute(
+                name=tool_name, arguments=tool_args, timeout=self.tool_timeout
+            )
             result_preview = (
                 str(result)[:150] + "..." if len(str(result)) > 150 else str(result)
             )
             self._log(f"Tool {tool_name} result: {result_preview}", "TOOL")
 
             if tool_name == "communicate_with_user":
-                self.state.add_message(
-                    self.name,
-                    tool_args["message"],
+                return [
+                    (self.name, tool_args["message"]),
+                    ("User", result["user_response"]),
+                ]
+            encoded = await registry.encode_result(tool_name, result)
+            if encoded.saved_chars:
+                self._log(
+                    f"Tool {tool_name} result encoded in {len(encoded.text)} chars, "
+                    f"saved {encoded.saved_chars} chars (~{encoded.saved_tokens} tokens)"
+                    + (
+                        f", spilled to {encoded.spilled_to}"
+                        if encoded.spilled_to
+                        else ""
+                    ),
+                    "TOOL",
                 )
-                self.state.add_message(
-                    "User",
-                    result["user_response"],
-                )
-            else:
-                self.state.add_message(
+            return [("tool-caller", f"Tool {tool_name} returned: {encoded.text}")]
+
+        except ToolTimeout as e:
+            self._log(str(e), "TOOL")
+            # Structured, so the model can decide to retry smaller or move on
+            timeout = {
+                "error": "timeout",
+                "tool": tool_name,
+                "timeout_seconds": round(e.seconds, 3),
+                "message": "The call did not finish in time and was abandoned. "
+                "Retry with a smaller request, or continue without this result.",
+            }
+            return [
+                (
                     "tool-caller",
-                    f"Tool {tool_name} returned: {json.dumps(result, indent=2)}",
+                    f"Tool {tool_name} returned: {json.dumps(timeout, separators=(',', ':'))}",
                 )
-
+            ]
         except Exception as e:
             self._log(f"Tool {tool_name} failed: {str(e)}", "TOOL")
-            self.state.add_message(
-                "tool-caller", f"Error executing {tool_name}: {str(e)}"
-            )
-
-        return None
-
+            return [("tool-caller", f"Error executing {tool_name}: {str(e)}")]
+
+    async def _invoke_subagent(
+        self, subagent_name: str, prompt: str
+    ) -> tuple[str, str]:
+        """
+        Run a subagent to completion, at most `max_subagent_concurrency` at a time.
+
+        Each run gets its own child session so concurrent subagents never
+        interleave their transcripts; the result comes back to this agent's
+        transcript as a message from the subagent.
+        """
+        subagent = self.subagents.get(subagent_name)
+        if not subagent:
+            self._log(f"Subagent {subagent_name} not found", "TOOL")
+            return ("tool-caller", f"Error: subagent {subagent_name} not found")
+
+        child_session_id = (
+            f"{self.state.session_id}-{subagent.name}-{uuid.uuid4().hex[:8]}"
+        )
+        async with self._subagent_semaphore:
+            try:
+                with span(
+                    "agent.subagent",
+                    subagent=subagent.name,
+                    session_id=child_session_id,
+                ):
+                    result = await run_subagent(
+                        subagent,
+                        self.name,
+                        child_session_id,
+                        prompt,
+                        state_backend=self.state_backend,
+                        cache_policy=self.llm.cache_policy,
+                        max_tokens=self.max_tokens,
+                        # Subagents reuse this agent's open connections
+                        http_client=self.llm.http_client,
+                        tool_timeout=self.tool_timeout,
+                    )
+            except Exception as e:
+                self._log(f"Subagent {subagent_name} failed: {str(e)}", "TOOL")
+                return (
+                    "tool-caller",
+                    f"Error executing subagent {subagent_name}: {str(e)}",
+                )
 
-def run_subagent(
-    subagent: SubAgent, parent_agent_name: str, session_id: str, prompt: str
+        self._log(f"Subagent {subagent_name} finished", "TOOL")
+        return (subagent.name, result or "(no result)")
+
+    async def aclose(self) -> None:
+        """Flush state and release the pooled LLM connections held by this agent."""
+        await self.state.aclose()
+        await self.llm.aclose()
+
+
+async def run_subagent(
+    subagent: SubAgent,
+    parent_agent_name: str,
+    session_id: str,
+    prompt: str,
+    state_backend: str | Callable[..., StateBackend] = "honcho",
+    cache_policy: CachePolicy | None = DEFAULT_CACHE_POLICY,
+    max_tokens: int | AdaptiveMaxTokens = DEFAULT_MAX_TOKENS,
+    http_client: httpx.AsyncClient | None = None,
+    tool_timeout: float | None = None,
 ) -> str:
     # Create an agent in subagent mode (excludes complete_task tool)
     subagent_runner = Agent(
@@ -247,18 +635,40 @@ def run_subagent(
         verbose=subagent.verbose,
         max_iterations=subagent.max_iterations,
         is_subagent=True,
+        stream=subagent.stream,
+        max_tool_concurrency=subagent.max_tool_concurrency,
+        state_backend=state_backend,
+        cache_policy=cache_policy,
+        max_tokens=max_tokens,
+        http_client=http_client,
+        # Runs under the parent's deadline, narrowed by the subagent's own timeout
+        timeout=subagent.timeout,
+        tool_timeout=subagent.tool_timeout or tool_timeout,
     )
-    return subagent_runner.invoke(prompt, parent_agent=parent_agent_name)
+    try:
+        return await subagent_runner.invoke(prompt, parent_agent=parent_agent_name)
+    finally:
+        await subagent_runner.aclose()
 
 
 def create_deep_agent(
     name: str,
     tools: list[Callable],
     instructions: str,
-    session_id: str = str(uuid.uuid4()),
+    session_id: str | None = None,
     model: str = "claude-4-sonnet-20250514",
     subagents: list[SubAgent] = None,
     verbose: bool = True,
+    stream: bool = False,
+    max_tool_concurrency: int = 8,
+    max_subagent_concurrency: int = 4,
+    state_backend: str | Callable[..., StateBackend] = "honcho",
+    cache_policy: CachePolicy | None = DEFAULT_CACHE_POLICY,
+    context_window: ContextWindow | None = DEFAULT_CONTEXT_WINDOW,
+    budget: Budget | None = None,
+    max_tokens: int | AdaptiveMaxTokens = DEFAULT_MAX_TOKENS,
+    timeout: float | None = None,
+    tool_timeout: float | None = None,
 ) -> Agent:
     """Create a deep agent with built-in tools and optional subagents."""
 
@@ -270,4 +680,14 @@ def create_deep_agent(
         model=model,
         verbose=verbose,
         subagents=subagents,
+        stream=stream,
+        max_tool_concurrency=max_tool_concurrency,
+        max_subagent_concurrency=max_subagent_concurrency,
+        state_backend=state_backend,
+        cache_policy=cache_policy,
+        context_window=context_window,
+        budget=budget,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        tool_timeout=tool_timeout,
     )
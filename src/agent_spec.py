@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from .tool_registry import registry
+
+SUBAGENT_USAGE = """
+
+Use subagents by calling the `invoke_subagent` tool. To hand out several independent tasks at once, call `invoke_subagents` with all of them so they run in parallel. If subagents are provided, you should make use of them to complete the task if at all possible.
+"""
+
+ROOT_AGENT_FOOTER = """
+
+When you are done, you should call the `complete_task` tool to tell the user the result. The user will **only** see the text given to this tool. The user will now send a message describing the task.
+"""
+
+SUBAGENT_FOOTER = """
+
+You are a subagent. When you have completed your task, provide your final result in a comprehensive response. Do NOT continue making additional tool calls after you have sufficient information to answer the question. Stop as soon as you have a complete answer.
+"""
+
+
+class AgentSpec:
+    """
+    The static part of every request an agent makes: its system prompt and
+    tool schemas, built once per agent definition.
+
+    Specs are shared: every agent (and subagent run) with the same
+    definition gets the same objects, so the prompt-cache markup and the
+    serialized request prefix derived from them are computed once and are
+    byte-identical across agents of that type. Treat them as read-only.
+    """
+
+    __slots__ = ("key", "system_prompt", "tool_names", "tool_schemas")
+
+    def __init__(
+        self,
+        key: tuple,
+        system_prompt: str,
+        tool_names: list[str],
+        tool_schemas: list[dict[str, Any]],
+    ):
+        self.key = key
+        self.system_prompt = system_prompt
+        self.tool_names = tool_names
+        self.tool_schemas = tool_schemas
+
+
+_specs: OrderedDict[tuple, AgentSpec] = OrderedDict()
+_specs_lock = threading.Lock()
+MAX_CACHED_SPECS = 256
+
+
+def compile_agent_spec(
+    instructions: str,
+    tool_names: list[str],
+    subagents: list[tuple[str, str]],
+    is_subagent: bool,
+) -> AgentSpec:
+    """
+    The spec for an agent definition, compiled on first use and memoized.
+
+    Args:
+        instructions: The agent's instructions
+        tool_names: Names of the registered tools the agent can call
+        subagents: (name, description) of each subagent it can delegate to
+        is_subagent: Whether the agent runs as a subagent
+    """
+    # Re-registering a tool bumps the registry version, so stale specs are never reused
+    key = (
+        instructions,
+        tuple(tool_names),
+        tuple(subagents),
+        is_subagent,
+        registry.version,
+    )
+    with _specs_lock:
+        spec = _specs.get(key)
+        if spec is not None:
+            _specs.move_to_end(key)
+            return spec
+
+    spec = AgentSpec(
+        key,
+        _build_system_prompt(instructions, tool_names, subagents, is_subagent),
+        list(tool_names),
+        [registry.get_schema(name) for name in tool_names],
+    )
+    with _specs_lock:
+        spec = _specs.setdefault(key, spec)
+        if len(_specs) > MAX_CACHED_SPECS:
+            _specs.popitem(last=False)
+    return spec
+
+
+def _build_system_prompt(
+    instructions: str,
+    tool_names: list[str],
+    subagents: list[tuple[str, str]],
+    is_subagent: bool,
+) -> str:
+    system_prompt = instructions
+
+    if tool_names:
+        system_prompt += """
+
+You have access to the following tools to complete the task:
+""" + "\n".join([f"- {name}: {registry.get_description(name)}" for name in tool_names])
+
+    if subagents:
+        system_prompt += (
+            """
+
+You have access to the following subagents to complete the task:
+"""
+            + "\n".join([f"- {name}: {description}" for name, description in subagents])
+            + SUBAGENT_USAGE
+        )
+
+    system_prompt += SUBAGENT_FOOTER if is_subagent else ROOT_AGENT_FOOTER
+    return system_prompt
@@ -1,13 +1,85 @@
+import asyncio
+import os
+import threading
 from typing import Optional
 
 from honcho import Honcho
-from honcho.session import MessageCreateParam
+from honcho.peer import Peer
+from honcho.session import MessageCreateParam, Session
+
+from .message_writer import BufferedMessageWriter
+from .state_backends import to_anthropic_message
+from .tracing import span
+
+
+# Process-wide Honcho clients, one per (server, workspace), and the peers
+# already created in each workspace. Creating a client or configuring a peer
+# is a network round trip, so agents and subagents share them instead.
+_clients: dict[tuple[str | None, str], Honcho] = {}
+_peers: dict[tuple[int, str], tuple[Honcho, Peer]] = {}
+_registry_lock = threading.Lock()
+
+
+def get_honcho_client(workspace_id: str = "deepagents-stream-5") -> Honcho:
+    """
+    The shared Honcho client for `workspace_id`, created on first use.
+
+    Points at HONCHO_URL if set (e.g. a self-hosted server), else production.
+    """
+    base_url = os.getenv("HONCHO_URL")
+    key = (base_url, workspace_id)
+    with _registry_lock:
+        client = _clients.get(key)
+    if client is not None:
+        return client
+
+    if base_url:
+        client = Honcho(base_url=base_url, workspace_id=workspace_id)
+    else:
+        client = Honcho(environment="production", workspace_id=workspace_id)
+    with _registry_lock:
+        return _clients.setdefault(key, client)
+
+
+def get_peer(honcho: Honcho, peer_id: str) -> Peer:
+    """The agent peer `peer_id`, created with its config once per workspace."""
+    key = (id(honcho), peer_id)
+    with _registry_lock:
+        entry = _peers.get(key)
+    # The entry holds its client, so a matching id is the same client
+    if entry is not None and entry[0] is honcho:
+        return entry[1]
+
+    peer = honcho.peer(peer_id, config={"observe_me": False})
+    with _registry_lock:
+        _peers[key] = (honcho, peer)
+    return peer
+
+
+def clear_honcho_registry() -> None:
+    """Forget the shared clients and resolved peers, e.g. after switching servers."""
+    with _registry_lock:
+        _clients.clear()
+        _peers.clear()
 
 
 class AgentState:
     """
     Manages agent state using Honcho's Python SDK for conversation memory,
     peer representations, and session management.
+
+    Construction makes no network calls: the Honcho client and peers are
+    shared process-wide (see `get_honcho_client`), and the peer and session
+    are created in Honcho on first use.
+
+    The session transcript is kept in memory as the source of truth for
+    `get_messages`: it is loaded from Honcho once, by `load` (or on first
+    use), and every `add_message` writes through to both. Call `sync` to
+    reconcile with Honcho, e.g. when resuming a session that other processes
+    have written to; both block, so inside an event loop await `load` first.
+
+    Writes to Honcho are buffered and sent in batches by a background task
+    (see `BufferedMessageWriter`); `flush` waits for them to land.
     """
 
     def __init__(
@@ -15,6 +87,7 @@ class AgentState:
         peer_id: str,
         session_id: str,
         workspace_id: str = "deepagents-stream-5",
+        honcho: Honcho | None = None,
     ):
         """
         Initialize AgentState with Honcho integration.
@@ -22,19 +95,48 @@ class AgentState:
         Args:
             workspace_id: The Honcho workspace identifier
             session_id: The session identifier for this conversation
+            honcho: Client to use instead of the shared one for `workspace_id`
         """
-        self.honcho = Honcho(environment="production", workspace_id=workspace_id)
+        self.workspace_id = workspace_id
+        self._honcho = honcho
         self.session_id = session_id
 
         self.peer_id = peer_id
+        self._peer: Peer | None = None
+        self._session: Session | None = None
+        self._resolve_lock = threading.Lock()
 
-        # Get or create peer
-        self.peer = self.honcho.peer(peer_id, config={"observe_me": False})
+        # Local transcript in Anthropic format, loaded lazily by `load` or `sync`
+        self._messages: list[dict[str, str]] | None = None
 
-        # Get or create session
-        self.session = self.honcho.session(
-            session_id, config={"deriver_disabled": True}
-        )
+        # Resolves the session from the writer thread on the first write
+        self.writer = BufferedMessageWriter(lambda: self.session)
+
+    @property
+    def honcho(self) -> Honcho:
+        if self._honcho is None:
+            self._honcho = get_honcho_client(self.workspace_id)
+        return self._honcho
+
+    @property
+    def peer(self) -> Peer:
+        """This agent's peer, created in Honcho on first use."""
+        if self._peer is None:
+            self._peer = get_peer(self.honcho, self.peer_id)
+        return self._peer
+
+    @property
+    def session(self) -> Session:
+        """The conversation session, created in Honcho on first use."""
+        if self._session is None:
+            with self._resolve_lock:
+                if self._session is None:
+                    # The agent's peer must exist with its config before it writes
+                    self.peer
+                    self._session = self.honcho.session(
+                        self.session_id, config={"deriver_disabled": True}
+                    )
+        return self._session
 
     def add_message(self, peer_name: str, content: str, metadata: dict = {}) -> None:
         """
@@ -45,23 +147,73 @@ class AgentState:
             content: The message content
             metadata: Optional metadata for the message
         """
-        self.session.add_messages(
-            [MessageCreateParam(content=content, peer_id=peer_name, metadata=metadata)]
+        self.writer.add(
+            MessageCreateParam(content=content, peer_id=peer_name, metadata=metadata)
         )
+        if self._messages is not None:
+            self._messages.append(
+                to_anthropic_message(peer_name, content, self.peer_id)
+            )
 
     def get_messages(self) -> list[dict[str, str]]:
         """
         Get all messages from the current session.
 
+        Served from the local transcript; only the first call reads from Honcho.
+
         Returns:
             List of message dictionaries with role and content
         """
+        if self._messages is None:
+            self.sync()
+        return list(self._messages)
 
-        messages = self.session.get_context(summary=False).to_anthropic(
-            assistant=self.peer_id
-        )
+    def sync(self) -> None:
+        """
+        Replace the local transcript with the session context stored in Honcho.
+
+        Blocks on the network; use `load` from async code.
+        """
+        self.writer.flush_blocking()
+        self._messages = self._read_context()
+
+    async def load(self) -> None:
+        """Load the transcript from Honcho on first use, off the event loop."""
+        if self._messages is None:
+            await self.writer.flush()
+            self._messages = await asyncio.to_thread(self._read_context)
+
+    def _read_context(self) -> list[dict[str, str]]:
+        with span("state.read", backend="honcho", operation="sync") as read:
+            messages = self.session.get_context(summary=False).to_anthropic(
+                assistant=self.peer_id
+            )
+            read.set("messages", len(messages))
         return messages
 
+    def get_summary(self) -> str:
+        """
+        Get Honcho's running summary of the session, if it has produced one.
+
+        Returns:
+            The summary text, or an empty string
+        """
+        with span("state.read", backend="honcho", operation="summary"):
+            self.writer.flush_blocking()
+            return self.session.get_context(summary=True).summary or ""
+
+    def flush_soon(self) -> None:
+        """Start writing buffered messages to Honcho without waiting."""
+        self.writer.flush_soon()
+
+    async def flush(self) -> None:
+        """Wait until every recorded message has been written to Honcho."""
+        await self.writer.flush()
+
+    async def aclose(self) -> None:
+        """Flush buffered messages and stop the background writer."""
+        await self.writer.aclose()
+
     def query_agent_knowledge(
         self, query: str, target_peer: Optional[str] = None
     ) -> str:
@@ -89,7 +241,9 @@ class AgentState:
         Returns:
             List of search results
         """
-        return self.session.search(query)
+        with span("state.read", backend="honcho", operation="search"):
+            self.writer.flush_blocking()
+            return self.session.search(query)
 
     def set_session_metadata(self, metadata: dict) -> None:
         """
@@ -0,0 +1,271 @@
+import contextvars
+import math
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from .prompt_cache import USAGE_FIELDS, add_usage
+
+# USD per million tokens: input, output, cache write, cache read. Matched by
+# model name prefix, longest first.
+MODEL_PRICING: dict[str, tuple[float, float, float, float]] = {
+    "claude-opus-4": (15.0, 75.0, 18.75, 1.50),
+    "claude-4-opus": (15.0, 75.0, 18.75, 1.50),
+    "claude-sonnet-4": (3.0, 15.0, 3.75, 0.30),
+    "claude-4-sonnet": (3.0, 15.0, 3.75, 0.30),
+    "claude-3-7-sonnet": (3.0, 15.0, 3.75, 0.30),
+    "claude-3-5-sonnet": (3.0, 15.0, 3.75, 0.30),
+    "claude-3-5-haiku": (0.80, 4.0, 1.0, 0.08),
+    "claude-3-haiku": (0.25, 1.25, 0.30, 0.03),
+}
+
+BUDGET_ACTIONS = ("stop", "downgrade")
+
+
+def cost_of(model: str, usage: dict[str, Any] | None) -> float:
+    """Dollar cost of one response's usage; 0 for models without known pricing."""
+    prices = next(
+        (
+            MODEL_PRICING[prefix]
+            for prefix in sorted(MODEL_PRICING, key=len, reverse=True)
+            if model.startswith(prefix)
+        ),
+        None,
+    )
+    if prices is None or not usage:
+        return 0.0
+    input_price, output_price, write_price, read_price = prices
+    return (
+        (usage.get("input_tokens") or 0) * input_price
+        + (usage.get("output_tokens") or 0) * output_price
+        + (usage.get("cache_creation_input_tokens") or 0) * write_price
+        + (usage.get("cache_read_input_tokens") or 0) * read_price
+    ) / 1_000_000
+
+
+def total_tokens(usage: dict[str, Any]) -> int:
+    return sum(usage.get(field) or 0 for field in USAGE_FIELDS)
+
+
+class Budget:
+    """
+    Limits for one root task, shared by every agent in its tree.
+
+    Limits are checked before each model call. Once one is exceeded the task
+    either stops, returning its progress so far, or downgrades: every agent
+    switches to `downgrade_model` and carries on until usage reaches
+    `hard_limit` times the limit, then stops.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_tokens: int | None = None,
+        max_cost: float | None = None,
+        max_seconds: float | None = None,
+        max_iterations: int | None = None,
+        on_exceed: str = "stop",
+        downgrade_model: str = "claude-3-5-haiku-20241022",
+        hard_limit: float = 1.5,
+    ):
+        """
+        Args:
+            max_tokens: Tokens processed (input, output and cached) across the tree
+            max_cost: Dollars spent across the tree, priced with MODEL_PRICING
+            max_seconds: Wall-clock time since the root task started
+            max_iterations: Model calls across the tree, a ceiling on runaway loops
+            on_exceed: "stop" or "downgrade"
+            downgrade_model: Cheaper model used after a limit is hit in downgrade mode
+            hard_limit: Multiple of a limit at which a downgraded task stops
+        """
+        if on_exceed not in BUDGET_ACTIONS:
+            raise ValueError(
+                f"Unknown on_exceed {on_exceed!r}, expected one of {BUDGET_ACTIONS}"
+            )
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.max_seconds = max_seconds
+        self.max_iterations = max_iterations
+        self.on_exceed = on_exceed
+        self.downgrade_model = downgrade_model
+        self.hard_limit = hard_limit
+
+
+class TaskUsage:
+    """Running usage of one root task, broken down by agent."""
+
+    def __init__(self, budget: Budget | None = None):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.usage: dict[str, int] = {}
+        self.cost = 0.0
+        self.iterations = 0
+        self.by_agent: dict[str, dict[str, Any]] = {}
+
+    @property
+    def tokens(self) -> int:
+        return total_tokens(self.usage)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def record(self, agent: str, model: str, usage: dict[str, Any] | None) -> float:
+        """Add one model response; returns its cost."""
+        cost = cost_of(model, usage)
+        add_usage(self.usage, usage)
+        self.cost += cost
+        self.iterations += 1
+
+        entry = self.by_agent.setdefault(
+            agent, {"usage": {}, "cost": 0.0, "iterations": 0}
+        )
+        add_usage(entry["usage"], usage)
+        entry["cost"] += cost
+        entry["iterations"] += 1
+        return cost
+
+    def remaining_tokens(self) -> int | None:
+        if self.budget is None or self.budget.max_tokens is None:
+            return None
+        return max(0, self.budget.max_tokens - self.tokens)
+
+    def check(self) -> tuple[str, str] | None:
+        """
+        Compare usage with the budget.
+
+        Returns:
+            None while within budget, else ("stop" | "downgrade", reason)
+        """
+        budget = self.budget
+        if budget is None:
+            return None
+
+        exceeded = [
+            (name, used, limit)
+            for name, used, limit in (
+                ("token", self.tokens, budget.max_tokens),
+                ("cost", self.cost, budget.max_cost),
+                ("time", self.elapsed, budget.max_seconds),
+                ("iteration", self.iterations, budget.max_iterations),
+            )
+            if limit is not None and used >= limit
+        ]
+        if not exceeded:
+            return None
+
+        name, used, limit = exceeded[0]
+        reason = f"{name} budget of {limit:g} exhausted ({used:g} used)"
+        hard = any(used >= limit * budget.hard_limit for _, used, limit in exceeded)
+        if budget.on_exceed == "stop" or hard:
+            return "stop", reason
+        return "downgrade", reason
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "usage": dict(self.usage),
+            "cost": round(self.cost, 6),
+            "iterations": self.iterations,
+            "seconds": round(self.elapsed, 3),
+            "by_agent": {
+                agent: {**entry, "cost": round(entry["cost"], 6)}
+                for agent, entry in self.by_agent.items()
+            },
+        }
+
+
+_current_task_usage: contextvars.ContextVar[TaskUsage | None] = contextvars.ContextVar(
+    "current_task_usage", default=None
+)
+
+
+def current_task_usage() -> TaskUsage | None:
+    """Usage of the root task the caller runs under, if any."""
+    return _current_task_usage.get()
+
+
+@contextmanager
+def task_usage_scope(budget: Budget | None) -> Iterator[tuple[TaskUsage, bool]]:
+    """
+    Join the caller's task, or start a new root task with `budget`.
+
+    Yields:
+        The task's usage, and whether this scope is its root
+    """
+    usage = _current_task_usage.get()
+    if usage is not None:
+        yield usage, False
+        return
+    usage = TaskUsage(budget)
+    token = _current_task_usage.set(usage)
+    try:
+        yield usage, True
+    finally:
+        _current_task_usage.reset(token)
+
+
+class AdaptiveMaxTokens:
+    """
+    Picks `max_tokens` for each model call from the agent's recent responses.
+
+    Most turns are short tool calls, so reserving a large fixed `max_tokens`
+    for every request wastes output-token rate limit (which is charged
+    against `max_tokens` up front). The limit starts at `initial`, then
+    tracks `headroom` times the longest of the recent responses, doubles
+    after a response is cut off, and never exceeds what is left of the task's
+    token budget.
+
+    Opt in with `max_tokens=AdaptiveMaxTokens()`. Raise `floor` when the
+    agent has tools that take long arguments (e.g. `write_file`), since a
+    run of short tool turns otherwise shrinks the limit below what such a
+    call needs.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int = 4096,
+        floor: int = 1024,
+        ceiling: int = 16384,
+        headroom: float = 2.0,
+    ):
+        """
+        Args:
+            initial: Limit for an agent's first call
+            floor: Smallest limit ever requested
+            ceiling: Largest limit ever requested
+            headroom: Multiple of the longest recent response to allow
+        """
+        self.initial = initial
+        self.floor = floor
+        self.ceiling = ceiling
+        self.headroom = headroom
+
+    def choose(
+        self,
+        recent_output_tokens: list[int],
+        last_limit: int | None,
+        truncated: bool,
+        remaining_tokens: int | None = None,
+    ) -> int:
+        """
+        Args:
+            recent_output_tokens: Output tokens of the agent's recent responses
+            last_limit: The limit used for the previous call
+            truncated: Whether the previous response stopped at `max_tokens`
+            remaining_tokens: Tokens left in the task budget, if it has one
+        """
+        if not recent_output_tokens:
+            limit = self.initial
+        else:
+            limit = math.ceil(max(recent_output_tokens) * self.headroom / 256) * 256
+        if truncated and last_limit:
+            limit = max(limit, last_limit * 2)
+        limit = min(self.ceiling, max(self.floor, limit))
+        if remaining_tokens is not None:
+            limit = min(limit, max(256, remaining_tokens))
+        return limit
+
+
+DEFAULT_MAX_TOKENS = 4000
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import aclosing
+from typing import Any, AsyncGenerator
+
+from .llm import AnthropicClient
+
+CASSETTE_MODES = ("record", "replay", "auto")
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def _as_blocks(content: Any) -> Any:
+    if isinstance(content, str):
+        return [{"type": "text", "text": content}]
+    return content
+
+
+def _strip_cache_control(value: Any) -> Any:
+    # Breakpoints don't change the answer, so recordings survive cache policy changes
+    if isinstance(value, dict):
+        return {
+            k: _strip_cache_control(v) for k, v in value.items() if k != "cache_control"
+        }
+    if isinstance(value, list):
+        return [_strip_cache_control(v) for v in value]
+    return value
+
+
+class Cassette:
+    """
+    On-disk store of recorded model interactions.
+
+    Each interaction is one row of a SQLite table keyed by a hash of the
+    request, so lookups stay a single index probe however large the recording
+    grows. Responses are stored as zlib-compressed JSON along with how long the
+    live call took.
+    """
+
+    def __init__(self, path: str | None = None):
+        """
+        Args:
+            path: SQLite file, defaults to DEEPAGENTS_CASSETTE or `cassettes/llm.db`
+        """
+        self.path = path or os.getenv("DEEPAGENTS_CASSETTE", "cassettes/llm.db")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS interactions ("
+            " key TEXT PRIMARY KEY, kind TEXT NOT NULL, model TEXT NOT NULL,"
+            " response BLOB NOT NULL, latency REAL NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(
+        kind: str,
+        model: str,
+        messages: list[dict[str, Any]],
+        tools: list[dict[str, Any]] | None,
+        system: str | list[dict[str, Any]] | None,
+        max_tokens: int,
+    ) -> str:
+        """Stable hash of a request; `kind` is "chat" or "stream"."""
+        request = _strip_cache_control(
+            {
+                "kind": kind,
+                "model": model,
+                # Plain strings and single text blocks are the same request
+                "system": _as_blocks(system) if system else None,
+                "tools": tools or None,
+                "messages": [
+                    {**message, "content": _as_blocks(message["content"])}
+                    for message in messages
+                ],
+                "max_tokens": max_tokens,
+            }
+        )
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> tuple[Any, float] | None:
+        """The recorded response and live latency for `key`, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, latency FROM interactions WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0])), row[1]
+
+    def put(
+        self, key: str, kind: str, model: str, response: Any, latency: float
+    ) -> None:
+        body = zlib.compress(json.dumps(response, separators=(",", ":")).encode())
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO interactions"
+                " (key, kind, model, response, latency, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, model, body, latency, time.time()),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM interactions").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class CassetteClient:
+    def __init__(
+        self,
+        cassette: Cassette | str | None = None,
+        *,
+        mode: str = "replay",
+        model: str = "claude-4-sonnet-20250514",
+        client: AnthropicClient | None = None,
+        latency: float | None = 0.0,
+    ):
+        """
+        Drop-in replacement for AnthropicClient that records or replays calls.
+
+        Pass it as `LLMClient(client=CassetteClient(...))`.
+
+        Args:
+            cassette: Cassette or path of one
+            mode: "record" always calls the API and stores the result, "replay"
+                only serves recordings, "auto" replays and records misses
+            model: Model used for every request made by this client
+            client: Live client for record/auto mode, created on first miss if None
+            latency: Seconds each replayed call takes; None replays the recorded
+                latency
+        """
+        if mode not in CASSETTE_MODES:
+            raise ValueError(
+                f"Unknown cassette mode {mode!r}, expected one of {CASSETTE_MODES}"
+            )
+        self.cassette = (
+            cassette if isinstance(cassette, Cassette) else Cassette(cassette)
+        )
+        self.mode = mode
+        self.model = client.model if client else model
+        self.latency = latency
+        self.stats = {"hits": 0, "misses": 0, "recorded": 0}
+        self._client = client
+
+    @property
+    def client(self) -> AnthropicClient:
+        """The live client, only needed when recording."""
+        if self._client is None:
+            self._client = AnthropicClient(model=self.model)
+        return self._client
+
+    async def _lookup(self, key: str) -> tuple[Any, float] | None:
+        if self.mode == "record":
+            return None
+        recorded = await asyncio.to_thread(self.cassette.get, key)
+        if recorded is not None:
+            self.stats["hits"] += 1
+            return recorded
+        self.stats["misses"] += 1
+        if self.mode == "replay":
+            raise CassetteMiss(f"No recorded interaction for request {key[:12]}")
+        return None
+
+    async def _record(self, key: str, kind: str, response: Any, latency: float) -> None:
+        await asyncio.to_thread(
+            self.cassette.put, key, kind, self.model, response, latency
+        )
+        self.stats["recorded"] += 1
+
+    async def chat(
+        self,
+        messages: list[dict[str, str]],
+        tools: list[dict[str, Any]] = None,
+        system: str | list[dict[str, Any]] = None,
+        max_tokens: int = 4000,
+    ) -> dict[str, Any]:
+        key = Cassette.key("chat", self.model, messages, tools, system, max_tokens)
+        recorded = await self._lookup(key)
+        if recorded is not None:
+            response, latency = recorded
+            await asyncio.sleep(latency if self.latency is None else self.latency)
+            return response
+
+        started = time.perf_counter()
+        response = await self.client.chat(messages, tools, system, max_tokens)
+        await self._record(key, "chat", response, time.perf_counter() - started)
+        return response
+
+    async def stream_chat(
+        self,
+        messages: list[dict[str, str]],
+        tools: list[dict[str, Any]] = None,
+        system: str | list[dict[str, Any]] = None,
+        max_tokens: int = 4000,
+    ) -> AsyncGenerator[str, None]:
+        key = Cassette.key("stream", self.model, messages, tools, system, max_tokens)
+        recorded = await self._lookup(key)
+        if recorded is not None:
+            chunks, latency = recorded
+            # Spread the latency over the events so consumers see a real stream
+            delay = (latency if self.latency is None else self.latency) / max(
+                1, len(chunks)
+            )
+            for chunk in chunks:
+                await asyncio.sleep(delay)
+                yield chunk
+            return
+
+        started = time.perf_counter()
+        chunks = []
+        async with aclosing(
+            self.client.stream_chat(messages, tools, system, max_tokens)
+        ) as stream:
+            try:
+                async for chunk in stream:
+                    chunks.append(chunk)
+                    yield chunk
+            except GeneratorExit:
+                # The consumer stopped early (e.g. at complete_task); read the
+                # rest so the whole turn is recorded and can be replayed
+                async for chunk in stream:
+                    chunks.append(chunk)
+            await self._record(key, "stream", chunks, time.perf_counter() - started)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from .llm import LLMClient
+from .rate_limit import PRIORITY_BACKGROUND
+
+# Rough Claude tokenizer ratio; deliberately conservative for code and JSON
+CHARS_PER_TOKEN = 3.5
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_TOOL_RESULT = re.compile(r"^tool-caller: Tool (\S+) returned: ", re.DOTALL)
+
+Summarizer = Callable[[list[dict[str, Any]]], Awaitable[str]]
+
+
+def estimate_tokens(value: Any) -> int:
+    """Cheap token estimate for a string, message, or JSON-serialisable value."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return int(len(value) / CHARS_PER_TOKEN) + 1
+    if isinstance(value, dict) and "role" in value:
+        return estimate_tokens(value.get("content")) + MESSAGE_OVERHEAD_TOKENS
+    if isinstance(value, list) and all(
+        isinstance(v, dict) and "role" in v for v in value
+    ):
+        return sum(estimate_tokens(v) for v in value)
+    return estimate_tokens(json.dumps(value, separators=(",", ":")))
+
+
+class ContextWindowExceeded(ValueError):
+    """Raised when even the opening and newest messages cannot fit the budget."""
+
+
+class ContextWindow:
+    """
+    Fits the transcript into a token budget before each model call.
+
+    Transcripts that already fit are returned untouched, so the cached
+    prompt prefix stays stable. Over budget, the window degrades in steps
+    until the request fits:
+
+    1. tool results older than the `keep_recent` newest messages are
+       collapsed into one-line stubs
+    2. if a `summarizer` is configured, that older span is replaced by a
+       running summary. The span is split into chunks of `summary_chunk`
+       messages at fixed positions, and each completed chunk extends the
+       previous chunk's summary, so the summarizer runs once per chunk
+       rather than on every call
+    3. the oldest messages after the opening task message are dropped
+
+    The opening message and the newest message are always kept; if they
+    alone exceed the budget, the newest message is truncated.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 180_000,
+        *,
+        reserve_tokens: int = 8_000,
+        keep_recent: int = 12,
+        summarizer: Summarizer | None = None,
+        summary_chunk: int = 16,
+        max_cached_summaries: int = 32,
+    ):
+        """
+        Args:
+            max_tokens: The model's context window
+            reserve_tokens: Room left for the response
+            keep_recent: Newest messages that are never altered
+            summarizer: Optional coroutine that summarises a span of messages
+            summary_chunk: Messages folded into the running summary at a time
+            max_cached_summaries: Summaries kept in the LRU cache
+        """
+        self.max_tokens = max_tokens
+        self.reserve_tokens = reserve_tokens
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer
+        self.summary_chunk = max(1, summary_chunk)
+        self.max_cached_summaries = max_cached_summaries
+        self._summaries: OrderedDict[str, str] = OrderedDict()
+
+    async def fit(
+        self,
+        messages: list[dict[str, Any]],
+        system: str | None = None,
+        tools: list[dict[str, Any]] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Return a transcript that fits the budget left after `system` and `tools`.
+
+        Raises:
+            ContextWindowExceeded: If the opening message alone leaves no room
+                for the newest one
+        """
+        budget = (
+            self.max_tokens
+            - self.reserve_tokens
+            - estimate_tokens(system)
+            - estimate_tokens(tools)
+        )
+        costs = [estimate_tokens(message) for message in messages]
+        if sum(costs) <= budget:
+            return messages
+
+        split = max(1, len(messages) - self.keep_recent)
+        head, old, recent = messages[:1], messages[1:split], messages[split:]
+        head_cost, recent_costs = sum(costs[:1]), costs[split:]
+
+        old = [self._stub_tool_result(message) for message in old]
+        old_costs = [estimate_tokens(message) for message in old]
+        if head_cost + sum(old_costs) + sum(recent_costs) <= budget:
+            return head + old + recent
+
+        if self.summarizer is not None and len(old) >= self.summary_chunk:
+            summarized = len(old) - len(old) % self.summary_chunk
+            summary = await self._summarize(old[:summarized])
+            if summary:
+                message = {"role": "user", "content": f"<summary>{summary}</summary>"}
+                old = [message] + old[summarized:]
+                old_costs = [estimate_tokens(message)] + old_costs[summarized:]
+                if head_cost + sum(old_costs) + sum(recent_costs) <= budget:
+                    return head + old + recent
+
+        # Last resort: drop from the oldest end, then trim inside the recent
+        # window, keeping a running total so each message is costed once
+        budget -= estimate_tokens(_omitted_notice(len(messages)))
+        total = head_cost + sum(old_costs) + sum(recent_costs)
+        dropped = 0
+        while dropped < len(old) and total > budget:
+            total -= old_costs[dropped]
+            dropped += 1
+        old = old[dropped:]
+        trimmed = 0
+        while trimmed < len(recent) - 1 and total > budget:
+            total -= recent_costs[trimmed]
+            trimmed += 1
+        recent = recent[trimmed:]
+        dropped += trimmed
+
+        if total > budget:
+            if recent:
+                recent = [self._truncate(recent[-1], budget - head_cost)]
+            else:
+                head = [self._truncate(head[0], budget)]
+
+        if not dropped:
+            return head + old + recent
+        return head + [_omitted_notice(dropped)] + old + recent
+
+    def _truncate(self, message: dict[str, Any], budget: int) -> dict[str, Any]:
+        content = message.get("content")
+        marker = "\n[... {} characters truncated to fit the context window]"
+        room = int(
+            (budget - MESSAGE_OVERHEAD_TOKENS - estimate_tokens(marker.format(0)) - 1)
+            * CHARS_PER_TOKEN
+        )
+        if not isinstance(content, str) or room <= 0:
+            raise ContextWindowExceeded(
+                f"Cannot fit the transcript into the context window: only {max(0, budget)} "
+                "tokens are left for the newest message after the system prompt, "
+                "tools and opening message"
+            )
+        return {
+            **message,
+            "content": content[:room] + marker.format(len(content) - room),
+        }
+
+    def _stub_tool_result(self, message: dict[str, Any]) -> dict[str, Any]:
+        content = message.get("content")
+        if message.get("role") != "user" or not isinstance(content, str):
+            return message
+        match = _TOOL_RESULT.match(content)
+        if not match:
+            return message
+        return {
+            **message,
+            "content": f"tool-caller: Tool {match.group(1)} returned "
+            f"{len(content) - match.end()} characters (elided from context)",
+        }
+
+    async def _summarize(self, span: list[dict[str, Any]]) -> str:
+        # Summaries are chained per chunk: the key of chunk k covers every
+        # message up to its end, and its summary extends the one before it.
+        # Only the chunks after the newest cached one are sent to the model,
+        # in a single call together with that cached summary.
+        keys = []
+        digest = hashlib.sha256()
+        for start in range(0, len(span), self.summary_chunk):
+            chunk = span[start : start + self.summary_chunk]
+            digest.update(json.dumps(chunk, sort_keys=True).encode("utf-8"))
+            keys.append(digest.hexdigest())
+
+        done, previous = 0, None
+        for index in range(len(keys) - 1, -1, -1):
+            if keys[index] in self._summaries:
+                self._summaries.move_to_end(keys[index])
+                done, previous = index + 1, self._summaries[keys[index]]
+                break
+        if done == len(keys):
+            return previous
+
+        pending = span[done * self.summary_chunk :]
+        if previous:
+            pending = [
+                {"role": "user", "content": f"<summary>{previous}</summary>"}
+            ] + pending
+        summary = await self.summarizer(pending)
+        self._summaries[keys[-1]] = summary
+        if len(self._summaries) > self.max_cached_summaries:
+            self._summaries.popitem(last=False)
+        return summary
+
+
+def _omitted_notice(dropped: int) -> dict[str, Any]:
+    return {
+        "role": "user",
+        "content": f"[{dropped} earlier messages omitted to fit the context window]",
+    }
+
+
+class LLMSummarizer:
+    """Summarises transcript spans with a small, cheap model."""
+
+    def __init__(
+        self, model: str = "claude-3-5-haiku-20241022", max_tokens: int = 1024
+    ):
+        self.llm = LLMClient(
+            model=model, cache_policy=None, priority=PRIORITY_BACKGROUND
+        )
+        self.max_tokens = max_tokens
+
+    async def __call__(self, messages: list[dict[str, Any]]) -> str:
+        transcript = "\n\n".join(
+            f"[{m['role']}] {m['content']}"
+            for m in messages
+            if isinstance(m["content"], str)
+        )
+        response = await self.llm.invoke(
+            [{"role": "user", "content": transcript}],
+            system="Summarise this agent transcript for the agent itself. Keep every "
+            "fact, decision, file name and open question it will need to finish its "
+            "task; drop pleasantries and repetition.",
+            max_tokens=self.max_tokens,
+        )
+        return "".join(
+            block.get("text", "") for block in response.get("content", [])
+        ).strip()
+
+
+class HonchoSummarizer:
+    """Uses the session summary Honcho maintains instead of calling a model."""
+
+    def __init__(self, state: Any):
+        self.state = state
+
+    async def __call__(self, messages: list[dict[str, Any]]) -> str:
+        return await asyncio.to_thread(self.state.get_summary)
+
+
+DEFAULT_CONTEXT_WINDOW = ContextWindow()
@@ -0,0 +1,96 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised by `check_deadline` once the caller's deadline has passed."""
+
+
+class Deadline:
+    """A point in time (on the monotonic clock) by which a task must finish."""
+
+    __slots__ = ("expires",)
+
+    def __init__(self, expires: float):
+        self.expires = expires
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+
+_current_deadline: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar(
+    "current_deadline", default=None
+)
+
+
+def current_deadline() -> Deadline | None:
+    """The deadline of the task the caller runs under, if it has one."""
+    return _current_deadline.get()
+
+
+def time_remaining(cap: float | None = None) -> float | None:
+    """
+    Seconds the caller may still spend: until its deadline or `cap`, whichever is sooner.
+
+    Returns:
+        None if there is neither a deadline nor a cap
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return cap
+    remaining = deadline.remaining()
+    return remaining if cap is None else min(cap, remaining)
+
+
+def check_deadline() -> None:
+    """
+    Cooperative cancellation point for long-running tools.
+
+    Synchronous tools run with the caller's context, so a tool working
+    through a large input can call this between steps and stop promptly
+    instead of running on after the agent has given up on it.
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None and deadline.expired:
+        raise DeadlineExceeded("Deadline exceeded")
+
+
+@contextmanager
+def deadline_scope(seconds: float | None) -> Iterator[Deadline | None]:
+    """
+    Run the block under a deadline `seconds` from now.
+
+    Deadlines nest: an inner scope can only shorten the caller's deadline,
+    never extend it, so a root task's deadline bounds every subagent, model
+    call and tool call under it. With `seconds=None` the caller's deadline
+    (if any) applies unchanged.
+
+    Yields:
+        The deadline in force inside the block, or None
+    """
+    parent = _current_deadline.get()
+    if seconds is None:
+        yield parent
+        return
+    deadline = Deadline.after(seconds)
+    if parent is not None and parent.expires <= deadline.expires:
+        yield parent
+        return
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
@@ -1,111 +1,523 @@
+import asyncio
+import importlib.util
+import json
 import os
+from collections import OrderedDict
+from contextlib import aclosing
 from typing import Any, AsyncGenerator
 
-import aiohttp
-import requests
+import httpx
 from dotenv import load_dotenv
 
+from .deadline import time_remaining
+from .prompt_cache import DEFAULT_CACHE_POLICY, USAGE_FIELDS, CachePolicy, add_usage
+from .rate_limit import (
+    CHARS_PER_TOKEN,
+    DEFAULT_RETRY_POLICY,
+    PRIORITY_INTERACTIVE,
+    RateLimitScheduler,
+    RetryPolicy,
+    estimate_request_tokens,
+    get_scheduler,
+)
+from .tracing import span
+
 load_dotenv()
 
+# HTTP/2 multiplexes concurrent requests over one connection, but httpx only
+# enables it when the optional `h2` package is installed.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# 529 is the API's "overloaded" status
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class AnthropicAPIError(Exception):
+    """A non-200 response from the Messages API."""
+
+    def __init__(self, status_code: int, body: str, headers: Any = None):
+        headers = headers or {}
+        self.status_code = status_code
+        self.body = body
+        self.request_id: str | None = headers.get("request-id")
+        self.retry_after = _retry_after(headers)
+        try:
+            self.error_type: str | None = json.loads(body)["error"]["type"]
+        except (ValueError, KeyError, TypeError):
+            self.error_type = None
+        super().__init__(f"API Error: {status_code} {body}")
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code in RETRYABLE_STATUS_CODES
+
+
+def _retry_after(headers: Any) -> float | None:
+    for name, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) / scale)
+        except ValueError:
+            # HTTP-date form; fall back to our own backoff
+            return None
+    return None
+
 
 class LLMClient:
-    def __init__(self, model: str = "claude-4-sonnet-20250514"):
-        self.client = AnthropicClient(model=model)
+    def __init__(
+        self,
+        model: str = "claude-4-sonnet-20250514",
+        client: "AnthropicClient | None" = None,
+        cache_policy: CachePolicy | None = DEFAULT_CACHE_POLICY,
+        http_client: httpx.AsyncClient | None = None,
+        scheduler: RateLimitScheduler | None = None,
+        retry_policy: RetryPolicy | None = DEFAULT_RETRY_POLICY,
+        priority: int = PRIORITY_INTERACTIVE,
+        session: str = "default",
+    ):
+        """
+        Args:
+            model: Model used when no client is given
+            client: Existing AnthropicClient (and its connection pool) to use;
+                if None and DEEPAGENTS_CASSETTE_MODE is set, a CassetteClient in
+                that mode is used instead of the live API
+            cache_policy: Prompt-cache breakpoints to add, or None to disable caching
+            http_client: Connection pool to share when no client is given
+            scheduler: Rate-limit scheduler to queue requests on, defaults to
+                the process-wide one from get_scheduler()
+            retry_policy: Backoff for 429/5xx responses and connection errors,
+                or None to never retry
+            priority: Scheduler lane; subagents and summaries use PRIORITY_BACKGROUND
+            session: Fair-queuing key, so busy sessions cannot starve others
+        """
+        if client is None and os.getenv("DEEPAGENTS_CASSETTE_MODE"):
+            from .cassette import CassetteClient
+
+            client = CassetteClient(
+                mode=os.environ["DEEPAGENTS_CASSETTE_MODE"], model=model
+            )
+        self.client = client or AnthropicClient(model=model, http_client=http_client)
+        self.cache_policy = cache_policy
+        self.scheduler = scheduler or get_scheduler()
+        self.retry_policy = retry_policy
+        self.priority = priority
+        self.session = session
+        # Token counts of the latest response, and running totals for this client
+        self.last_usage: dict[str, int] = {}
+        self.usage: dict[str, int] = {}
+
+    @property
+    def http_client(self) -> httpx.AsyncClient | None:
+        """The client's connection pool, for other clients to share; None if it has none."""
+        return getattr(self.client, "http_client", None)
+
+    def _apply_cache_policy(
+        self,
+        messages: list[dict[str, str]],
+        tools: list[dict[str, Any]] | None,
+        system: str | None,
+    ) -> tuple[list[dict[str, Any]], list[dict[str, Any]] | None, Any]:
+        if self.cache_policy is None:
+            return messages, tools, system
+        return (
+            self.cache_policy.apply_messages(messages),
+            self.cache_policy.apply_tools(tools),
+            self.cache_policy.apply_system(system),
+        )
+
+    def record_usage(self, usage: dict[str, Any] | None) -> None:
+        """Store the `usage` block of a response (streamed responses report it here)."""
+        self.last_usage = {
+            field: (usage or {}).get(field) or 0 for field in USAGE_FIELDS
+        }
+        add_usage(self.usage, usage)
 
-    def invoke(
+    async def invoke(
         self,
         messages: list[dict[str, str]],
         tools: list[dict[str, Any]] = None,
-        system: str = None,
+        system: str | list[dict[str, Any]] = None,
         max_tokens: int = 4000,
     ) -> dict[str, Any]:
-        return self.client.chat(messages, tools, system, max_tokens)
+        messages, tools, system = self._apply_cache_policy(messages, tools, system)
+        reserved = self._reserve(messages, tools, system, max_tokens)
+        response = None
+        with span(
+            "llm.call", **{"gen_ai.request.model": self.client.model, "stream": False}
+        ) as call:
+            attempt = 0
+            held = False
+            try:
+                while True:
+                    await self._acquire(reserved, call)
+                    held = True
+                    try:
+                        response = await self.client.chat(
+                            messages, tools, system, max_tokens
+                        )
+                        break
+                    except Exception as e:
+                        held = False
+                        await self._backoff(e, attempt, reserved, call)
+                        attempt += 1
+            finally:
+                # Cancelled mid-request: charge the prompt, which the API has
+                # likely counted, and release the unused output allowance
+                if held and response is None:
+                    self.scheduler.settle(reserved, max(0, reserved - max_tokens))
+            self.record_usage(response.get("usage"))
+            self.scheduler.settle(reserved, _used_tokens(response.get("usage")))
+            if call.recording:
+                _trace_response(call, response)
+        return response
 
     async def stream(
         self,
         messages: list[dict[str, str]],
         tools: list[dict[str, Any]] = None,
-        system: str = None,
+        system: str | list[dict[str, Any]] = None,
         max_tokens: int = 4000,
     ) -> AsyncGenerator[str, None]:
-        async for chunk in self.client.stream_chat(messages, tools, system, max_tokens):
-            yield chunk
+        messages, tools, system = self._apply_cache_policy(messages, tools, system)
+        reserved = self._reserve(messages, tools, system, max_tokens)
+        # Not made current: the consumer starts tool calls while the stream is open
+        call = span(
+            "llm.call", **{"gen_ai.request.model": self.client.model, "stream": True}
+        )
+        usage: dict[str, int] = {}
+        # Characters streamed so far, to estimate output tokens if the stream
+        # closes before the final usage arrives
+        streamed = 0
+        held = completed = False
+        try:
+            attempt = 0
+            while True:
+                await self._acquire(reserved, call)
+                held = True
+                started = False
+                try:
+                    async with aclosing(
+                        self.client.stream_chat(messages, tools, system, max_tokens)
+                    ) as stream:
+                        async for chunk in stream:
+                            started = True
+                            streamed += len(chunk)
+                            if '"message_start"' in chunk or '"message_delta"' in chunk:
+                                event = json.loads(chunk)
+                                _collect_stream_usage(usage, event)
+                                if call.recording:
+                                    _trace_stream_event(call, event)
+                            yield chunk
+                    completed = True
+                    break
+                except Exception as e:
+                    # Once chunks have reached the caller the request cannot be replayed
+                    if started:
+                        raise
+                    held = False
+                    await self._backoff(e, attempt, reserved, call)
+                    attempt += 1
+        except BaseException as e:
+            call.record_error(e)
+            raise
+        finally:
+            # Also when the consumer stops early (e.g. on complete_task) or is
+            # cancelled, so the unused part of the reservation is released
+            if held:
+                self.scheduler.settle(
+                    reserved, _settled_tokens(usage, streamed, completed, reserved)
+                )
+            call.end()
+
+    def _reserve(
+        self,
+        messages: list[dict[str, Any]],
+        tools: list[dict[str, Any]] | None,
+        system: Any,
+        max_tokens: int,
+    ) -> int:
+        # Sizing the prompt is only worth it when tokens are rate limited
+        if not self.scheduler.limits_tokens:
+            return 0
+        return estimate_request_tokens(messages, tools, system, max_tokens)
+
+    async def _acquire(self, reserved: int, call: Any) -> None:
+        waited = await self.scheduler.acquire(
+            reserved, priority=self.priority, session=self.session
+        )
+        if call.recording and waited:
+            call.set(
+                "ratelimit.wait_ms",
+                round(call.attributes.get("ratelimit.wait_ms", 0) + waited * 1000, 3),
+            )
+
+    async def _backoff(
+        self, error: Exception, attempt: int, reserved: int, call: Any
+    ) -> None:
+        """Sleep before retrying `error`, or re-raise it if it should not be retried."""
+        # A failed request used no tokens
+        self.scheduler.settle(reserved, 0)
+        if isinstance(error, AnthropicAPIError):
+            retryable = error.retryable
+            retry_after = error.retry_after
+        else:
+            retryable = isinstance(error, httpx.TransportError)
+            retry_after = None
+        if (
+            not retryable
+            or self.retry_policy is None
+            or attempt >= self.retry_policy.max_retries
+        ):
+            raise error
+
+        delay = self.retry_policy.delay(attempt, retry_after)
+        remaining = time_remaining()
+        if remaining is not None and delay >= remaining:
+            # The retry could not finish before the task's deadline
+            raise error
+        if isinstance(error, AnthropicAPIError) and (
+            error.status_code == 429 or retry_after is not None
+        ):
+            # The limit is shared, so everyone waiting on this key backs off together
+            self.scheduler.pause(delay)
+        self.scheduler.record_retry()
+        call.set("llm.retries", attempt + 1)
+        await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+# Serialized "tools"/"tool_choice"/"system" request members, keyed by the
+# identity of the (already cache-marked) tools list and system prompt
+_static_fragments: OrderedDict[tuple[int, int], tuple[Any, Any, str]] = OrderedDict()
+
+
+def _static_fragment(
+    tools: list[dict[str, Any]] | None, system: str | list[dict[str, Any]] | None
+) -> str:
+    key = (id(tools), id(system))
+    entry = _static_fragments.get(key)
+    if entry is not None and entry[0] is tools and entry[1] is system:
+        return entry[2]
+
+    members = []
+    if tools:
+        members.append(f'"tools": {json.dumps(tools)}')
+        members.append('"tool_choice": {"type": "auto"}')
+    if system:
+        members.append(f'"system": {json.dumps(system)}')
+    fragment = ", ".join(members)
+    _static_fragments[key] = (tools, system, fragment)
+    if len(_static_fragments) > 256:
+        _static_fragments.popitem(last=False)
+    return fragment
+
+
+def _used_tokens(usage: dict[str, Any] | None) -> int:
+    return sum((usage or {}).get(field) or 0 for field in USAGE_FIELDS)
+
+
+def _settled_tokens(
+    usage: dict[str, int], streamed: int, completed: bool, reserved: int
+) -> int:
+    """Tokens a streamed request used, estimated when it ended early."""
+    if completed:
+        return _used_tokens(usage)
+    if not usage:
+        # Nothing is known about what the request used
+        return reserved
+    # The final output count never arrived; the streamed events bound it
+    return _used_tokens(usage) + int(streamed / CHARS_PER_TOKEN)
+
+
+def _collect_stream_usage(usage: dict[str, int], event: dict[str, Any]) -> None:
+    if event.get("type") == "message_start":
+        usage.update((event.get("message") or {}).get("usage") or {})
+    elif event.get("type") == "message_delta":
+        usage.update(event.get("usage") or {})
+
+
+def _trace_response(call: Any, response: dict[str, Any]) -> None:
+    usage = response.get("usage") or {}
+    call.set_attributes(
+        {
+            "gen_ai.usage.input_tokens": usage.get("input_tokens"),
+            "gen_ai.usage.output_tokens": usage.get("output_tokens"),
+            "gen_ai.usage.cache_read_input_tokens": usage.get(
+                "cache_read_input_tokens"
+            ),
+            "gen_ai.usage.cache_creation_input_tokens": usage.get(
+                "cache_creation_input_tokens"
+            ),
+            "gen_ai.response.finish_reason": response.get("stop_reason"),
+        }
+    )
+
+
+def _trace_stream_event(call: Any, event: dict[str, Any]) -> None:
+    if event.get("type") == "message_start":
+        _trace_response(call, event.get("message") or {})
+    elif event.get("type") == "message_delta":
+        if event.get("usage", {}).get("output_tokens") is not None:
+            call.set("gen_ai.usage.output_tokens", event["usage"]["output_tokens"])
+        call.set(
+            "gen_ai.response.finish_reason", event.get("delta", {}).get("stop_reason")
+        )
 
 
 class AnthropicClient:
-    def __init__(self, *, api_key: str = None, model: str = "claude-4-sonnet-20250514"):
+    def __init__(
+        self,
+        *,
+        api_key: str = None,
+        model: str = "claude-4-sonnet-20250514",
+        base_url: str = None,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 600.0,
+        http2: bool = HTTP2_AVAILABLE,
+        http_client: httpx.AsyncClient | None = None,
+    ):
+        """
+        Anthropic Messages API client backed by a long-lived connection pool.
+
+        Args:
+            api_key: API key, defaults to ANTHROPIC_API_KEY
+            model: Model used for every request made by this client
+            base_url: API root, defaults to ANTHROPIC_BASE_URL or the public API
+            max_connections: Upper bound on open connections in the pool
+            max_keepalive_connections: Idle connections kept open for reuse
+            keepalive_expiry: Seconds an idle connection is kept alive
+            timeout: Per-request timeout in seconds
+            http2: Negotiate HTTP/2 (requires the `h2` package)
+            http_client: Existing pool to share instead of creating one
+        """
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY not found in environment or .env file")
         self.model = model
-        self.base_url = "https://api.anthropic.com/v1"
-
-    def chat(
-        self,
-        messages: list[dict[str, str]],
-        tools: list[dict[str, Any]] = None,
-        system: str = None,
-        max_tokens: int = 4000,
-    ) -> dict[str, Any]:
-        headers = {
+        self.base_url = base_url or os.getenv(
+            "ANTHROPIC_BASE_URL", "https://api.anthropic.com/v1"
+        )
+        self.headers = {
             "Content-Type": "application/json",
             "x-api-key": self.api_key,
             "anthropic-version": "2023-06-01",
         }
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._http_client = http_client
+        self._owns_http_client = http_client is None
+        self._encoded_messages: dict[int, tuple[dict[str, Any], str]] = {}
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """The pooled HTTP client, created on first use."""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                headers=self.headers,
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+            )
+            self._owns_http_client = True
+        return self._http_client
+
+    def _encode_payload(
+        self,
+        messages: list[dict[str, str]],
+        tools: list[dict[str, Any]] | None,
+        system: str | list[dict[str, Any]] | None,
+        max_tokens: int,
+        stream: bool = False,
+    ) -> bytes:
+        """
+        Serialize a Messages API request body.
 
-        payload = {"model": self.model, "max_tokens": max_tokens, "messages": messages}
+        The tools/system fragment is cached by the identity of its inputs
+        (shared across agents built from the same AgentSpec), and each
+        transcript message is serialized once and reused on later
+        iterations, so only new messages are encoded per call.
+        """
+        head = {"model": self.model, "max_tokens": max_tokens}
+        if stream:
+            head["stream"] = True
+        parts = [json.dumps(head)[:-1]]
+        static = _static_fragment(tools, system)
+        if static:
+            parts.append(static)
+        parts.append(f'"messages": {self._encode_messages(messages)}}}')
+        return ", ".join(parts).encode()
 
-        if tools:
-            payload["tools"] = tools
-            payload["tool_choice"] = {"type": "auto"}
+    def _encode_messages(self, messages: list[dict[str, Any]]) -> str:
+        previous = self._encoded_messages
+        current: dict[int, tuple[dict[str, Any], str]] = {}
+        encoded = []
+        for message in messages:
+            entry = previous.get(id(message))
+            # The entry keeps the message alive, so a matching id is the same dict
+            if entry is None or entry[0] is not message:
+                entry = (message, json.dumps(message))
+            current[id(message)] = entry
+            encoded.append(entry[1])
+        self._encoded_messages = current
+        return f"[{', '.join(encoded)}]"
 
-        if system:
-            payload["system"] = system
+    async def chat(
+        self,
+        messages: list[dict[str, str]],
+        tools: list[dict[str, Any]] = None,
+        system: str | list[dict[str, Any]] = None,
+        max_tokens: int = 4000,
+    ) -> dict[str, Any]:
+        body = self._encode_payload(messages, tools, system, max_tokens)
 
-        response = requests.post(
-            f"{self.base_url}/messages", headers=headers, json=payload
+        response = await self.http_client.post(
+            f"{self.base_url}/messages", headers=self.headers, content=body
         )
         if response.status_code != 200:
-            raise Exception(f"API Error: {response.status_code} {response.text}")
+            raise AnthropicAPIError(
+                response.status_code, response.text, response.headers
+            )
         return response.json()
 
     async def stream_chat(
         self,
         messages: list[dict[str, str]],
         tools: list[dict[str, Any]] = None,
-        system: str = None,
+        system: str | list[dict[str, Any]] = None,
         max_tokens: int = 4000,
     ) -> AsyncGenerator[str, None]:
-        headers = {
-            "Content-Type": "application/json",
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01",
-        }
+        body = self._encode_payload(messages, tools, system, max_tokens, stream=True)
 
-        payload = {
-            "model": self.model,
-            "max_tokens": max_tokens,
-            "messages": messages,
-            "stream": True,
-        }
+        async with self.http_client.stream(
+            "POST", f"{self.base_url}/messages", headers=self.headers, content=body
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise AnthropicAPIError(
+                    response.status_code,
+                    body.decode("utf-8", "replace"),
+                    response.headers,
+                )
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    data = line[6:]
+                    if data.strip() == "[DONE]":
+                        break
+                    yield data
 
-        if tools:
-            payload["tools"] = tools
-            payload["tool_choice"] = {"type": "auto"}
-
-        if system:
-            payload["system"] = system
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/messages", headers=headers, json=payload
-            ) as response:
-                async for line in response.content:
-                    if line.startswith(b"data: "):
-                        data = line[6:]
-                        if data.strip() == b"[DONE]":
-                            break
-                        try:
-                            yield data.decode("utf-8")
-                        except Exception:
-                            continue
+    async def aclose(self) -> None:
+        """Close the connection pool if this client created it."""
+        if self._owns_http_client and self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
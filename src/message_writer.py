@@ -0,0 +1,231 @@
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Callable
+
+from honcho.session import MessageCreateParam, Session
+from honcho_core import (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from .tracing import span
+
+TRANSIENT_ERRORS = (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+
+class MessageWriteError(Exception):
+    """Raised by `flush` when messages were dropped after writes to Honcho failed."""
+
+    def __init__(self, dropped: int, cause: Exception):
+        super().__init__(f"{dropped} messages could not be written to Honcho: {cause}")
+        self.dropped = dropped
+        self.cause = cause
+
+
+class BufferedMessageWriter:
+    """
+    Queues session messages and writes them to Honcho in batches.
+
+    `add` never waits on the network while an event loop is running: messages
+    are buffered and a background task flushes them when `batch_size` messages
+    are queued, every `flush_interval` seconds, or when `flush_soon` is called.
+    If the buffer reaches `max_buffered` before the task gets to run, writing
+    starts at once in a worker thread. Batches are always written in order.
+    Outside an event loop messages are written immediately.
+
+    A batch that keeps failing is not retried forever: permanent errors drop
+    it at once, transient ones after `max_retries` failed flushes. Dropped
+    messages are kept in `failed`, and the next `flush` raises
+    `MessageWriteError`.
+    """
+
+    def __init__(
+        self,
+        session: Session | Callable[[], Session],
+        *,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        max_buffered: int = 1000,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+    ):
+        """
+        Args:
+            session: The Honcho session messages are written to, or a function
+                returning it, called on the first write so the session can be
+                created lazily
+            batch_size: Maximum messages per `add_messages` call
+            flush_interval: Seconds between background flushes
+            max_buffered: Buffer size at which `add` starts writing in a worker
+                thread rather than waiting for the background task
+            max_retries: Retries for transient Honcho failures within a write,
+                and failed flushes before a batch is dropped
+            retry_backoff: Base delay in seconds for exponential retry backoff
+        """
+        self._session = session if isinstance(session, Session) else None
+        self._get_session = None if isinstance(session, Session) else session
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.last_error: Exception | None = None
+        self.failed: list[MessageCreateParam] = []
+
+        self._buffer: list[MessageCreateParam] = []
+        self._failed_flushes = 0
+        self._unreported: MessageWriteError | None = None
+        self._buffer_lock = threading.Lock()
+        # Held for the duration of a write so batches reach Honcho in order
+        self._send_lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self._overflow: asyncio.Future | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._closing = False
+
+    @property
+    def session(self) -> Session:
+        if self._session is None:
+            self._session = self._get_session()
+        return self._session
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def add(self, message: MessageCreateParam) -> None:
+        with self._buffer_lock:
+            self._buffer.append(message)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_blocking()
+            return
+
+        self._ensure_task(loop)
+        if len(self._buffer) >= self.max_buffered:
+            # Honcho is not keeping up, or the loop has not let the background
+            # task run; start writing now, off the loop, one drain at a time
+            if self._overflow is None or self._overflow.done():
+                self._overflow = loop.run_in_executor(None, self._drain, False)
+        elif len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def flush_soon(self) -> None:
+        """Ask the background task to flush now without waiting for it."""
+        if self._wakeup is not None and self._buffer:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        """
+        Write every buffered message to Honcho, including a batch the
+        background task is already writing, and wait for them to land.
+
+        Raises:
+            MessageWriteError: If messages were dropped since the last flush
+        """
+        await asyncio.to_thread(self._drain)
+        self._raise_dropped()
+
+    def flush_blocking(self) -> None:
+        """As `flush`, from the calling thread."""
+        self._drain()
+        self._raise_dropped()
+
+    async def aclose(self) -> None:
+        """Let the background task finish its current batch, then flush what is left."""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            if task.get_loop() is asyncio.get_running_loop():
+                self._closing = True
+                self._wakeup.set()
+                await task
+            else:
+                task.cancel()
+        self._wakeup = None
+        self._closing = False
+        await self.flush()
+
+    def _ensure_task(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            # A fresh context, so background writes aren't traced under
+            # whichever span happened to start the task
+            self._task = loop.create_task(self._run(), context=contextvars.Context())
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Failures are kept for the next `flush` to report
+            await asyncio.to_thread(self._drain, False)
+
+    def _raise_dropped(self) -> None:
+        error, self._unreported = self._unreported, None
+        if error is not None:
+            raise error
+
+    def _drain(self, settle: bool = True) -> None:
+        # Each write waits for the one in flight, so once this returns every
+        # message buffered before the call has been written, or dropped after
+        # `max_retries` failed rounds. Without `settle`, a batch that fails and
+        # is put back ends the drain, to be retried on the next tick.
+        while self._write_batch() or (settle and self._buffer):
+            pass
+
+    def _write_batch(self) -> bool:
+        """Write the oldest batch; returns whether draining should continue."""
+        with self._send_lock:
+            with self._buffer_lock:
+                batch = self._buffer[: self.batch_size]
+                del self._buffer[: len(batch)]
+            if not batch:
+                return False
+
+            with span("state.write", backend="honcho", messages=len(batch)) as write:
+                transient = False
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        self.session.add_messages(batch)
+                        self.last_error = None
+                        self._failed_flushes = 0
+                        write.set("attempts", attempt + 1)
+                        return True
+                    except TRANSIENT_ERRORS as e:
+                        self.last_error, transient = e, True
+                        if attempt == self.max_retries:
+                            break
+                        time.sleep(self.retry_backoff * 2**attempt)
+                    except Exception as e:
+                        self.last_error, transient = e, False
+                        break
+
+                self._failed_flushes += 1
+                if transient and self._failed_flushes <= self.max_retries:
+                    # Put the batch back at the front so ordering survives the
+                    # failure; a later flush retries it
+                    with self._buffer_lock:
+                        self._buffer[:0] = batch
+                    return False
+
+                write.set("dropped", len(batch))
+                self._failed_flushes = 0
+                self.failed.extend(batch)
+                dropped = len(batch) + (
+                    self._unreported.dropped if self._unreported else 0
+                )
+                self._unreported = MessageWriteError(dropped, self.last_error)
+                return True
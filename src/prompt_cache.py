@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from typing import Any, Callable
+
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+class CachePolicy:
+    """
+    Where `LLMClient` places Anthropic prompt-cache breakpoints.
+
+    Requests are cached as a prefix in the order tools -> system -> messages,
+    so the policy can mark up to three breakpoints:
+
+    - the last tool schema, caching every tool definition
+    - the system prompt
+    - the last transcript message, a rolling breakpoint that moves forward
+      every iteration; the API finds the previous iteration's prefix by
+      looking back from it, so only the newest messages are billed in full
+
+    Inputs are never mutated; marked copies are returned. Copies of the tool
+    list and system prompt are memoized by identity, so agents built from
+    one `AgentSpec` all send the very same marked objects.
+    """
+
+    def __init__(
+        self,
+        *,
+        tools: bool = True,
+        system: bool = True,
+        transcript: bool = True,
+        ttl: str | None = None,
+    ):
+        """
+        Args:
+            tools: Cache the tool schemas
+            system: Cache the system prompt
+            transcript: Keep a rolling breakpoint on the newest message
+            ttl: Cache lifetime, e.g. "1h"; the API default (5 minutes) if None
+        """
+        self.tools = tools
+        self.system = system
+        self.transcript = transcript
+        self.cache_control: dict[str, str] = {"type": "ephemeral"}
+        if ttl:
+            self.cache_control["ttl"] = ttl
+        self._marked: OrderedDict[int, tuple[Any, Any]] = OrderedDict()
+
+    def _memoized(self, value: Any, mark: Callable[[Any], Any]) -> Any:
+        entry = self._marked.get(id(value))
+        # The entry keeps `value` alive, so a matching id is the same object
+        if entry is not None and entry[0] is value:
+            return entry[1]
+        marked = mark(value)
+        self._marked[id(value)] = (value, marked)
+        if len(self._marked) > 128:
+            self._marked.popitem(last=False)
+        return marked
+
+    def apply_tools(
+        self, tools: list[dict[str, Any]] | None
+    ) -> list[dict[str, Any]] | None:
+        if not (self.tools and tools):
+            return tools
+        return self._memoized(
+            tools,
+            lambda tools: [
+                *tools[:-1],
+                {**tools[-1], "cache_control": self.cache_control},
+            ],
+        )
+
+    def apply_system(self, system: str | None) -> str | list[dict[str, Any]] | None:
+        if not (self.system and system):
+            return system
+        return self._memoized(
+            system,
+            lambda system: [
+                {"type": "text", "text": system, "cache_control": self.cache_control}
+            ],
+        )
+
+    def apply_messages(self, messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        if not (self.transcript and messages):
+            return messages
+
+        last = messages[-1]
+        content = last["content"]
+        if isinstance(content, str):
+            blocks = [{"type": "text", "text": content}]
+        else:
+            blocks = [dict(block) for block in content]
+        if not blocks:
+            return messages
+        blocks[-1]["cache_control"] = self.cache_control
+        return [*messages[:-1], {**last, "content": blocks}]
+
+
+DEFAULT_CACHE_POLICY = CachePolicy()
+
+
+def add_usage(total: dict[str, int], usage: dict[str, Any] | None) -> None:
+    """Accumulate the token counts of one response into `total`."""
+    for field in USAGE_FIELDS:
+        total[field] = total.get(field, 0) + ((usage or {}).get(field) or 0)
@@ -0,0 +1,346 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Rough characters per token, used to reserve tokens before a request is sent
+CHARS_PER_TOKEN = 3.5
+
+
+class TokenBucket:
+    """Continuously refilled allowance of `per_minute` units, burstable up to a full minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, honouring the server's `retry-after`.
+
+    Without a `retry-after`, attempt n sleeps a random time up to
+    `base_delay * 2**n` (capped at `max_delay`), so clients that failed
+    together do not retry together.
+    """
+
+    def __init__(
+        self, *, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0
+    ):
+        """
+        Args:
+            max_retries: Retries after the first attempt before giving up
+            base_delay: Backoff ceiling of the first retry, in seconds
+            max_delay: Largest backoff, in seconds
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        if retry_after is not None:
+            # A little jitter so everyone told to wait N seconds doesn't return at once
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class _Waiter:
+    __slots__ = ("tokens", "priority", "session", "loop", "future", "enqueued")
+
+    def __init__(self, tokens: int, priority: int, session: str):
+        self.tokens = tokens
+        self.priority = priority
+        self.session = session
+        self.loop = asyncio.get_running_loop()
+        self.future: asyncio.Future = self.loop.create_future()
+        self.enqueued = time.monotonic()
+
+    def wake(self) -> None:
+        self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class RateLimitScheduler:
+    """
+    Admits model requests from every agent in the process against shared
+    requests/min and tokens/min limits.
+
+    Waiting requests are queued by priority lane; within a lane, sessions
+    take turns (round robin), so one busy session cannot starve the rest.
+    Only the request at the head of the queue consumes quota, which keeps
+    the order fair and lets large requests through. After a 429 the whole
+    queue pauses for the server's `retry-after`, instead of every client
+    hammering the API on its own schedule.
+
+    Token reservations are estimates (prompt size plus `max_tokens`) and are
+    corrected with the real usage once the response arrives.
+    """
+
+    def __init__(
+        self,
+        *,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        wait_samples: int = 1024,
+    ):
+        """
+        Args:
+            requests_per_minute: Request quota, or None for no request limit
+            tokens_per_minute: Token quota (input plus output), or None for no token limit
+            wait_samples: Recent queue wait times kept for metrics
+        """
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lanes: dict[int, OrderedDict[str, deque[_Waiter]]] = {}
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+
+        self._queue_depth = 0
+        self._max_queue_depth = 0
+        self._granted: dict[int, int] = {}
+        self._wait_total: dict[int, float] = {}
+        self._waits: deque[float] = deque(maxlen=wait_samples)
+        self._throttled = 0
+        self._retries = 0
+
+    @property
+    def limits_tokens(self) -> bool:
+        return self.tokens is not None
+
+    async def acquire(
+        self,
+        tokens: int = 0,
+        *,
+        priority: int = PRIORITY_INTERACTIVE,
+        session: str = "default",
+    ) -> float:
+        """
+        Wait until a request reserving `tokens` may be sent.
+
+        Args:
+            tokens: Estimated tokens the request will use
+            priority: Lane, PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND
+            session: Fair-queuing key, normally the agent's session id
+
+        Returns:
+            Seconds spent waiting
+        """
+        waiter = _Waiter(tokens, priority, session)
+        with self._lock:
+            lane = self._lanes.setdefault(priority, OrderedDict())
+            lane.setdefault(session, deque()).append(waiter)
+            self._queue_depth += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue_depth)
+
+        granted = False
+        try:
+            while True:
+                with self._lock:
+                    if self._head() is waiter:
+                        delay = self._delay(waiter)
+                        if delay <= 0:
+                            self._grant(waiter)
+                            granted = True
+                            return time.monotonic() - waiter.enqueued
+                    else:
+                        delay = None
+                # Sleep until quota frees up, or until woken because the head changed
+                await asyncio.wait([waiter.future], timeout=delay)
+                if waiter.future.done():
+                    waiter.future = waiter.loop.create_future()
+        finally:
+            if not granted:
+                with self._lock:
+                    self._remove(waiter)
+                    head = self._head()
+                if head is not None:
+                    head.wake()
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Correct a token reservation with the tokens the request actually used."""
+        if self.tokens is None or reserved == used:
+            return
+        with self._lock:
+            if used < reserved:
+                self.tokens.give(reserved - used)
+            else:
+                self.tokens.take(used - reserved)
+            head = self._head()
+        if head is not None:
+            head.wake()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every queued request for `seconds`, e.g. after a 429."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._throttled += 1
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self._retries += 1
+
+    def metrics(self) -> dict[str, Any]:
+        """Queue depth, wait times and throttling counters."""
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "queue_depth": self._queue_depth,
+                "max_queue_depth": self._max_queue_depth,
+                "granted": sum(self._granted.values()),
+                "throttled": self._throttled,
+                "retries": self._retries,
+                "wait_ms": {
+                    "mean": round(1000 * sum(waits) / len(waits), 3) if waits else 0.0,
+                    "p50": round(1000 * _percentile(waits, 50), 3),
+                    "p99": round(1000 * _percentile(waits, 99), 3),
+                    "max": round(1000 * waits[-1], 3) if waits else 0.0,
+                },
+                "by_priority": {
+                    priority: {
+                        "granted": granted,
+                        "wait_ms_mean": round(
+                            1000 * self._wait_total[priority] / granted, 3
+                        ),
+                    }
+                    for priority, granted in sorted(self._granted.items())
+                },
+            }
+
+    def _head(self) -> _Waiter | None:
+        for priority in sorted(self._lanes):
+            for queue in self._lanes[priority].values():
+                return queue[0]
+        return None
+
+    def _delay(self, waiter: _Waiter) -> float:
+        now = time.monotonic()
+        delay = self._paused_until - now
+        if self.requests is not None:
+            delay = max(delay, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.wait_time(waiter.tokens, now))
+        return delay
+
+    def _grant(self, waiter: _Waiter) -> None:
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(waiter.tokens)
+        lane = self._lanes[waiter.priority]
+        queue = lane[waiter.session]
+        queue.popleft()
+        # Round robin: this session goes to the back of its lane
+        if queue:
+            lane.move_to_end(waiter.session)
+        else:
+            del lane[waiter.session]
+        if not lane:
+            del self._lanes[waiter.priority]
+        self._queue_depth -= 1
+
+        waited = time.monotonic() - waiter.enqueued
+        self._waits.append(waited)
+        self._granted[waiter.priority] = self._granted.get(waiter.priority, 0) + 1
+        self._wait_total[waiter.priority] = (
+            self._wait_total.get(waiter.priority, 0.0) + waited
+        )
+
+        head = self._head()
+        if head is not None:
+            head.wake()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        lane = self._lanes.get(waiter.priority)
+        queue = lane.get(waiter.session) if lane else None
+        if not queue or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del lane[waiter.session]
+        if not lane:
+            del self._lanes[waiter.priority]
+        self._queue_depth -= 1
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[max(0, int(round(q / 100 * len(ordered))) - 1)]
+
+
+def estimate_request_tokens(
+    messages: list[dict[str, Any]],
+    tools: list[dict[str, Any]] | None,
+    system: Any,
+    max_tokens: int,
+) -> int:
+    """Tokens to reserve for a request: its approximate prompt size plus `max_tokens`."""
+    chars = len(json.dumps([messages, tools, system], default=str))
+    return int(chars / CHARS_PER_TOKEN) + max_tokens
+
+
+def _env_rate(name: str) -> float | None:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+_scheduler: RateLimitScheduler | None = None
+
+
+def get_scheduler() -> RateLimitScheduler:
+    """
+    The process-wide scheduler every LLMClient shares by default.
+
+    Limits come from DEEPAGENTS_REQUESTS_PER_MINUTE and
+    DEEPAGENTS_TOKENS_PER_MINUTE; without them requests are only queued
+    (and paused after a 429), never throttled up front.
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RateLimitScheduler(
+            requests_per_minute=_env_rate("DEEPAGENTS_REQUESTS_PER_MINUTE"),
+            tokens_per_minute=_env_rate("DEEPAGENTS_TOKENS_PER_MINUTE"),
+        )
+    return _scheduler
+
+
+def set_scheduler(scheduler: RateLimitScheduler | None) -> None:
+    """Replace the shared scheduler; None restores the environment-configured default."""
+    global _scheduler
+    _scheduler = scheduler
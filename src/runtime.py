@@ -0,0 +1,222 @@
+import asyncio
+import uuid
+from typing import Any, Callable
+
+import httpx
+
+from .agent import Agent
+from .llm import HTTP2_AVAILABLE
+from .search import close_search_provider
+from .state_backends import StateBackend
+from .tool_registry import registry
+
+
+class RuntimeOverloaded(Exception):
+    """Raised when a request arrives while the runtime's queue is full."""
+
+
+class RuntimeClosed(Exception):
+    """Raised when a request arrives after `shutdown` has started."""
+
+
+class AgentRuntime:
+    """
+    Serves many concurrent tasks of one agent definition on one event loop.
+
+    Every request gets its own `Agent` with a fresh session, but all of them
+    share one Anthropic connection pool, one Honcho client (with the default
+    "honcho" backend) and the tool registry's thread pool. At most
+    `max_concurrency` tasks run at once and at most `max_queue` wait for a
+    slot; beyond that `invoke` fails fast with `RuntimeOverloaded`, so a
+    service in front of it can shed load instead of piling up latency.
+    `shutdown` stops admitting requests, drains the ones in flight and
+    closes the search provider's connections.
+
+        async with AgentRuntime("assistant", tools, instructions) as runtime:
+            result = await runtime.invoke("Summarise today's news")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        tools: list[Callable],
+        instructions: str,
+        *,
+        max_concurrency: int = 16,
+        max_queue: int = 64,
+        queue_timeout: float | None = None,
+        state_backend: str | Callable[..., StateBackend] = "honcho",
+        http_client: httpx.AsyncClient | None = None,
+        max_connections: int = 100,
+        **agent_options: Any,
+    ):
+        """
+        Args:
+            name: Agent name, also the prefix of generated session ids
+            tools: Tools of every agent the runtime creates
+            instructions: Instructions of every agent the runtime creates
+            max_concurrency: Tasks running at once
+            max_queue: Tasks allowed to wait for a slot before new ones are rejected
+            queue_timeout: Seconds a task may wait for a slot, or None to wait indefinitely
+            state_backend: As for `Agent`
+            http_client: Anthropic connection pool to share, created if None
+            max_connections: Size of the pool created when none is given
+            agent_options: Any other `Agent` arguments (model, subagents, budget, ...)
+        """
+        self.name = name
+        self.agent_options = {
+            "name": name,
+            "tools": tools,
+            "instructions": instructions,
+            "verbose": False,
+            **agent_options,
+        }
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.state_backend = state_backend
+        self.max_connections = max_connections
+        self._http_client = http_client
+        self._owns_http_client = http_client is None
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        # Admitted tasks that have not got a slot yet, including ones that
+        # were cancelled before they first ran
+        self._waiting: set[asyncio.Task] = set()
+        self._closing = False
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        """Admitted tasks waiting for a slot."""
+        return len(self._waiting)
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """The Anthropic connection pool shared by every agent, created on first use."""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=600.0,
+                http2=HTTP2_AVAILABLE,
+            )
+            self._owns_http_client = True
+        return self._http_client
+
+    def create_agent(self, session_id: str | None = None) -> Agent:
+        """Build an agent for one task, wired to the shared clients."""
+        return Agent(
+            session_id=session_id or f"{self.name}-{uuid.uuid4().hex}",
+            state_backend=self.state_backend,
+            http_client=self.http_client,
+            **self.agent_options,
+        )
+
+    def submit(self, message: str, *, session_id: str | None = None) -> asyncio.Task:
+        """
+        Admit a task and start it in the background.
+
+        Raises:
+            RuntimeClosed: If the runtime is shutting down
+            RuntimeOverloaded: If `max_queue` tasks are already waiting for a slot
+        """
+        if self._closing:
+            raise RuntimeClosed(f"Runtime {self.name} is shutting down")
+        if self.active + self.queued >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise RuntimeOverloaded(
+                f"Runtime {self.name} is at capacity "
+                f"({self.active} running, {self.queued} queued)"
+            )
+        task = asyncio.create_task(self._run(message, session_id))
+        self._tasks.add(task)
+        self._waiting.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(self._waiting.discard)
+        return task
+
+    async def invoke(self, message: str, *, session_id: str | None = None) -> str:
+        """
+        Run one task to completion; cancelling the caller cancels the task.
+
+        Args:
+            message: The task prompt
+            session_id: Session to resume, or None for a fresh one
+        """
+        return await self.submit(message, session_id=session_id)
+
+    async def _run(self, message: str, session_id: str | None) -> str:
+        try:
+            if self.queue_timeout is None:
+                await self._slots.acquire()
+            else:
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+                except asyncio.TimeoutError:
+                    self.rejected += 1
+                    raise RuntimeOverloaded(
+                        f"Runtime {self.name} had no free slot within "
+                        f"{self.queue_timeout}s"
+                    ) from None
+        finally:
+            self._waiting.discard(asyncio.current_task())
+
+        self.active += 1
+        try:
+            agent = self.create_agent(session_id)
+            try:
+                result = await agent.invoke(message)
+            finally:
+                await agent.aclose()
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "closing": self._closing,
+        }
+
+    async def shutdown(self, timeout: float | None = None) -> None:
+        """
+        Stop admitting tasks and wait for running and queued ones to finish.
+
+        Args:
+            timeout: Seconds to wait before cancelling what is left, or None to wait
+        """
+        self._closing = True
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        if self._owns_http_client and self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+        await close_search_provider()
+
+    async def __aenter__(self) -> "AgentRuntime":
+        # Start tool worker processes now, not inside the first request
+        await registry.warm_up()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.shutdown()
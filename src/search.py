@@ -0,0 +1,186 @@
+import asyncio
+import os
+import re
+from typing import Any, Protocol, runtime_checkable
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+@runtime_checkable
+class SearchProvider(Protocol):
+    """
+    A web search backend for the search tools.
+
+    `search` returns a Tavily-shaped response: a dict with a `results` list
+    whose items carry `title`, `url`, `content`, `score` and, when requested,
+    `raw_content`.
+    """
+
+    async def search(
+        self, query: str, *, max_results: int = 5, include_raw_content: bool = False
+    ) -> dict[str, Any]: ...
+
+    async def aclose(self) -> None: ...
+
+
+class TavilyProvider:
+    def __init__(
+        self,
+        *,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 5,
+        timeout: float = 60.0,
+    ):
+        """
+        Tavily search over a long-lived async connection pool.
+
+        Args:
+            api_key: API key, defaults to TAVILY_API_KEY
+            base_url: API root, defaults to TAVILY_BASE_URL or the public API
+            max_connections: Upper bound on open connections in the pool
+            max_keepalive_connections: Idle connections kept open for reuse
+            timeout: Per-request timeout in seconds
+        """
+        self.api_key = api_key or os.getenv("TAVILY_API_KEY")
+        self.base_url = base_url or os.getenv(
+            "TAVILY_BASE_URL", "https://api.tavily.com"
+        )
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.timeout = timeout
+        self._http_client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """
+        The pooled HTTP client of the running event loop, created on first use.
+
+        Connections cannot be shared between event loops, so a provider used
+        from a new loop (e.g. by successive `asyncio.run` calls) opens a new
+        pool; the old one went away with its loop.
+        """
+        loop = asyncio.get_running_loop()
+        if (
+            self._http_client is None
+            or self._http_client.is_closed
+            or self._loop is not loop
+        ):
+            self._http_client = httpx.AsyncClient(
+                headers=self.headers, limits=self.limits, timeout=self.timeout
+            )
+            self._loop = loop
+        return self._http_client
+
+    async def search(
+        self, query: str, *, max_results: int = 5, include_raw_content: bool = False
+    ) -> dict[str, Any]:
+        if not self.api_key:
+            raise ValueError("TAVILY_API_KEY not found in environment or .env file")
+        response = await self.http_client.post(
+            f"{self.base_url}/search",
+            json={
+                "query": query,
+                "max_results": max_results,
+                "include_raw_content": include_raw_content,
+            },
+        )
+        if response.status_code != 200:
+            raise Exception(f"Search API Error: {response.status_code} {response.text}")
+        return response.json()
+
+    async def aclose(self) -> None:
+        if self._http_client is not None and self._loop is asyncio.get_running_loop():
+            await self._http_client.aclose()
+        self._http_client = None
+        self._loop = None
+
+
+class LocalSearchIndex:
+    """
+    In-process search over a fixed set of documents, for tests and benchmarks.
+
+    Documents are dicts with at least `url`, `title` and `content`. Results are
+    ranked by how many query terms a document contains.
+    """
+
+    def __init__(self, documents: list[dict[str, Any]], *, latency: float = 0.0):
+        """
+        Args:
+            documents: The searchable documents
+            latency: Seconds each search sleeps, to simulate a remote backend
+        """
+        self.documents = documents
+        self.latency = latency
+        self._terms = [
+            set(_tokenize(f"{doc.get('title', '')} {doc.get('content', '')}"))
+            for doc in documents
+        ]
+
+    async def search(
+        self, query: str, *, max_results: int = 5, include_raw_content: bool = False
+    ) -> dict[str, Any]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        query_terms = set(_tokenize(query))
+        scored = []
+        for doc, terms in zip(self.documents, self._terms):
+            overlap = len(query_terms & terms)
+            if overlap:
+                scored.append((overlap / len(query_terms), doc))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        results = []
+        for score, doc in scored[:max_results]:
+            result = {
+                "title": doc.get("title"),
+                "url": doc["url"],
+                "content": doc.get("content", "")[:500],
+                "score": score,
+            }
+            if include_raw_content:
+                result["raw_content"] = doc.get("raw_content", doc.get("content"))
+            results.append(result)
+        return {"query": query, "results": results}
+
+    async def aclose(self) -> None:
+        pass
+
+
+def _tokenize(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+_provider: SearchProvider | None = None
+
+
+def get_search_provider() -> SearchProvider:
+    """The provider the search tools use, a shared TavilyProvider by default."""
+    global _provider
+    if _provider is None:
+        _provider = TavilyProvider()
+    return _provider
+
+
+def set_search_provider(provider: SearchProvider | None) -> None:
+    """Swap the provider the search tools use; None restores the default."""
+    global _provider
+    _provider = provider
+
+
+async def close_search_provider() -> None:
+    """Close the connections of the provider the search tools use, if one was created."""
+    if _provider is not None:
+        await _provider.aclose()
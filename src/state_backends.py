@@ -0,0 +1,408 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional, Protocol, runtime_checkable
+
+from .tracing import span
+
+
+@runtime_checkable
+class StateBackend(Protocol):
+    """
+    The interface the agent loop uses to record and read its conversation.
+
+    `AgentState` implements it on top of Honcho; `InMemoryState` and
+    `SQLiteState` implement it locally with no remote round trips.
+    """
+
+    peer_id: str
+    session_id: str
+
+    def add_message(
+        self, peer_name: str, content: str, metadata: dict = {}
+    ) -> None: ...
+
+    def get_messages(self) -> list[dict[str, str]]: ...
+
+    def sync(self) -> None: ...
+
+    async def load(self) -> None: ...
+
+    def search_conversation(self, query: str) -> list: ...
+
+    def set_session_metadata(self, metadata: dict) -> None: ...
+
+    def get_session_metadata(self) -> dict: ...
+
+    def query_agent_knowledge(
+        self, query: str, target_peer: Optional[str] = None
+    ) -> str: ...
+
+    def flush_soon(self) -> None: ...
+
+    async def flush(self) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+def to_anthropic_message(
+    peer_name: str, content: str, assistant: str
+) -> dict[str, str]:
+    """Format one message the way Honcho's `SessionContext.to_anthropic` does."""
+    if peer_name == assistant:
+        return {"role": "assistant", "content": content}
+    return {"role": "user", "content": f"{peer_name}: {content}"}
+
+
+def _query_terms(query: str) -> list[str]:
+    return re.findall(r"\w+", query.lower())
+
+
+class InMemoryStore:
+    """Process-local storage shared by every `InMemoryState` that uses it."""
+
+    def __init__(self):
+        self.messages: dict[str, list[dict[str, Any]]] = {}
+        self.metadata: dict[str, dict] = {}
+
+
+_default_memory_store = InMemoryStore()
+
+
+class InMemoryState:
+    """
+    Zero-I/O state backend for tests, benchmarks and throwaway runs.
+
+    Sessions live in an `InMemoryStore` (a process-wide one by default), so
+    subagents and repeated agents in the same process see each other's
+    sessions, but nothing survives the process.
+    """
+
+    def __init__(
+        self, peer_id: str, session_id: str, store: InMemoryStore | None = None
+    ):
+        self.peer_id = peer_id
+        self.session_id = session_id
+        self.store = store or _default_memory_store
+        self._log = self.store.messages.setdefault(session_id, [])
+
+    def add_message(self, peer_name: str, content: str, metadata: dict = {}) -> None:
+        self._log.append(
+            {
+                "session_id": self.session_id,
+                "peer_id": peer_name,
+                "content": content,
+                "metadata": dict(metadata),
+                "created_at": time.time(),
+            }
+        )
+
+    def get_messages(self) -> list[dict[str, str]]:
+        return [
+            to_anthropic_message(m["peer_id"], m["content"], self.peer_id)
+            for m in self._log
+        ]
+
+    def sync(self) -> None:
+        pass
+
+    async def load(self) -> None:
+        pass
+
+    def search_conversation(self, query: str) -> list:
+        terms = _query_terms(query)
+        return [
+            dict(m)
+            for m in self._log
+            if any(term in m["content"].lower() for term in terms)
+        ]
+
+    def set_session_metadata(self, metadata: dict) -> None:
+        self.store.metadata[self.session_id] = dict(metadata)
+
+    def get_session_metadata(self) -> dict:
+        return dict(self.store.metadata.get(self.session_id, {}))
+
+    def query_agent_knowledge(
+        self, query: str, target_peer: Optional[str] = None
+    ) -> str:
+        """
+        Keyword lookup over every session this peer took part in.
+
+        There is no reasoning model behind this backend, so the answer is the
+        matching messages themselves.
+        """
+        terms = _query_terms(query)
+        matches = []
+        for log in self.store.messages.values():
+            if not any(m["peer_id"] == self.peer_id for m in log):
+                continue
+            for m in log:
+                if target_peer and m["peer_id"] != target_peer:
+                    continue
+                if any(term in m["content"].lower() for term in terms):
+                    matches.append(f"{m['peer_id']}: {m['content']}")
+        return "\n".join(matches)
+
+    def flush_soon(self) -> None:
+        pass
+
+    async def flush(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    peer_id TEXT NOT NULL,
+    content TEXT NOT NULL,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, id);
+CREATE INDEX IF NOT EXISTS messages_by_peer ON messages (peer_id, session_id);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    metadata TEXT NOT NULL DEFAULT '{}'
+);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+    USING fts5(content, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+_connections: dict[str, tuple[sqlite3.Connection, threading.Lock, bool]] = {}
+_connections_lock = threading.Lock()
+
+
+def _connect(path: str) -> tuple[sqlite3.Connection, threading.Lock, bool]:
+    """Open (once per path) a WAL-mode connection shared by every SQLiteState."""
+    path = os.path.abspath(path)
+    with _connections_lock:
+        if path not in _connections:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            try:
+                conn.executescript(_FTS_SCHEMA)
+                has_fts = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: fall back to LIKE queries
+                has_fts = False
+            conn.commit()
+            _connections[path] = (conn, threading.Lock(), has_fts)
+        return _connections[path]
+
+
+class SQLiteState:
+    """
+    Local, durable state backend stored in a single SQLite file.
+
+    Messages are indexed by session and peer, and `search_conversation` uses
+    an FTS5 index when SQLite provides one. The database runs in WAL mode so
+    readers never block the writer.
+    """
+
+    def __init__(
+        self,
+        peer_id: str,
+        session_id: str,
+        path: str | None = None,
+    ):
+        """
+        Args:
+            peer_id: The agent's peer identifier
+            session_id: The session identifier for this conversation
+            path: Database file, defaults to DEEPAGENTS_SQLITE_PATH or `deepagents.db`
+        """
+        self.peer_id = peer_id
+        self.session_id = session_id
+        self.path = path or os.getenv("DEEPAGENTS_SQLITE_PATH", "deepagents.db")
+        self._conn, self._lock, self._has_fts = _connect(self.path)
+        self._messages: list[dict[str, str]] | None = None
+
+    def add_message(self, peer_name: str, content: str, metadata: dict = {}) -> None:
+        with span("state.write", backend="sqlite", messages=1), self._lock:
+            self._conn.execute(
+                "INSERT INTO messages (session_id, peer_id, content, metadata, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.session_id,
+                    peer_name,
+                    content,
+                    json.dumps(metadata),
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+        if self._messages is not None:
+            self._messages.append(
+                to_anthropic_message(peer_name, content, self.peer_id)
+            )
+
+    def get_messages(self) -> list[dict[str, str]]:
+        if self._messages is None:
+            self.sync()
+        return list(self._messages)
+
+    def sync(self) -> None:
+        with span("state.read", backend="sqlite", operation="sync"), self._lock:
+            rows = self._conn.execute(
+                "SELECT peer_id, content FROM messages WHERE session_id = ? ORDER BY id",
+                (self.session_id,),
+            ).fetchall()
+        self._messages = [
+            to_anthropic_message(peer_name, content, self.peer_id)
+            for peer_name, content in rows
+        ]
+
+    async def load(self) -> None:
+        """Read the transcript on first use without blocking the event loop."""
+        if self._messages is None:
+            await asyncio.to_thread(self.sync)
+
+    def search_conversation(self, query: str, limit: int = 10) -> list:
+        with span("state.read", backend="sqlite", operation="search"):
+            return self._search(query, limit, session_id=self.session_id)
+
+    def set_session_metadata(self, metadata: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, metadata) VALUES (?, ?)"
+                " ON CONFLICT (session_id) DO UPDATE SET metadata = excluded.metadata",
+                (self.session_id, json.dumps(metadata)),
+            )
+            self._conn.commit()
+
+    def get_session_metadata(self) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT metadata FROM sessions WHERE session_id = ?",
+                (self.session_id,),
+            ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def query_agent_knowledge(
+        self, query: str, target_peer: Optional[str] = None
+    ) -> str:
+        """
+        Full-text lookup over every session this peer took part in.
+
+        There is no reasoning model behind this backend, so the answer is the
+        best matching messages themselves.
+        """
+        results = self._search(query, 20, peer_id=self.peer_id, target_peer=target_peer)
+        return "\n".join(f"{r['peer_id']}: {r['content']}" for r in results)
+
+    def flush_soon(self) -> None:
+        pass
+
+    async def flush(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+    def _search(
+        self,
+        query: str,
+        limit: int,
+        *,
+        session_id: str | None = None,
+        peer_id: str | None = None,
+        target_peer: str | None = None,
+    ) -> list[dict[str, Any]]:
+        terms = _query_terms(query)
+        if not terms:
+            return []
+
+        filters, params = [], []
+        if session_id:
+            filters.append("m.session_id = ?")
+            params.append(session_id)
+        if peer_id:
+            filters.append(
+                "m.session_id IN (SELECT session_id FROM messages WHERE peer_id = ?)"
+            )
+            params.append(peer_id)
+        if target_peer:
+            filters.append("m.peer_id = ?")
+            params.append(target_peer)
+
+        if self._has_fts:
+            sql = (
+                "SELECT m.session_id, m.peer_id, m.content, m.metadata, m.created_at"
+                " FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid"
+                " WHERE messages_fts MATCH ?"
+            )
+            params.insert(0, " OR ".join(f'"{term}"' for term in terms))
+            order = " ORDER BY bm25(messages_fts)"
+        else:
+            sql = (
+                "SELECT m.session_id, m.peer_id, m.content, m.metadata, m.created_at"
+                " FROM messages m WHERE ("
+                + " OR ".join("lower(m.content) LIKE ?" for _ in terms)
+                + ")"
+            )
+            params[:0] = [f"%{term}%" for term in terms]
+            order = " ORDER BY m.id DESC"
+
+        for condition in filters:
+            sql += f" AND {condition}"
+        sql += order + " LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {
+                "session_id": row[0],
+                "peer_id": row[1],
+                "content": row[2],
+                "metadata": json.loads(row[3]),
+                "created_at": row[4],
+            }
+            for row in rows
+        ]
+
+
+STATE_BACKENDS: dict[str, Callable[..., StateBackend]] = {
+    "memory": InMemoryState,
+    "sqlite": SQLiteState,
+}
+
+
+def create_state(
+    backend: str | Callable[..., StateBackend], peer_id: str, session_id: str
+) -> StateBackend:
+    """
+    Build the state for one agent.
+
+    Args:
+        backend: "honcho", "memory", "sqlite", or a callable taking
+            `peer_id` and `session_id` (e.g. a `functools.partial` of a backend)
+        peer_id: The agent's peer identifier
+        session_id: The session identifier for this conversation
+    """
+    if callable(backend):
+        return backend(peer_id=peer_id, session_id=session_id)
+    if backend == "honcho":
+        from .agent_state import AgentState
+
+        return AgentState(peer_id=peer_id, session_id=session_id)
+    if backend not in STATE_BACKENDS:
+        raise ValueError(f"Unknown state backend {backend}")
+    return STATE_BACKENDS[backend](peer_id=peer_id, session_id=session_id)
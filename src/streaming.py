@@ -0,0 +1,97 @@
+import json
+from typing import Any
+
+
+class StreamError(Exception):
+    """Raised when the Messages API reports an error mid-stream."""
+
+
+class MessageAssembler:
+    """
+    Incrementally rebuilds a Messages API response from its server-sent events.
+
+    Feed it the `data:` payloads yielded by `LLMClient.stream`; every time a
+    content block closes, `feed` returns that finished block so the caller can
+    act on it while the model is still generating the rest of the message.
+
+    Text, thinking and tool input deltas are collected as parts and joined
+    once when their block closes. A tool_use block whose input JSON was cut
+    off (e.g. by `max_tokens`) is returned with `"incomplete": True` and an
+    empty input rather than raising.
+    """
+
+    def __init__(self):
+        self.message: dict[str, Any] = {"content": []}
+        self.done = False
+        # Unjoined deltas per open block: {index: {field: [parts]}}
+        self._parts: dict[int, dict[str, list[str]]] = {}
+
+    @property
+    def content(self) -> list[dict[str, Any]]:
+        return self.message["content"]
+
+    def feed(self, data: str) -> dict[str, Any] | None:
+        """
+        Apply one streamed event.
+
+        Args:
+            data: The JSON payload of a single `data:` line
+
+        Returns:
+            The completed content block when the event closes one, else None
+        """
+        event = json.loads(data)
+        event_type = event.get("type")
+
+        if event_type == "message_start":
+            self.message = {**event["message"], "content": []}
+        elif event_type == "content_block_start":
+            self.content.append(dict(event["content_block"]))
+            self._parts[event["index"]] = {}
+        elif event_type == "content_block_delta":
+            self._apply_delta(self.content[event["index"]], event)
+        elif event_type == "content_block_stop":
+            block = self.content[event["index"]]
+            for field, parts in self._parts.pop(event["index"], {}).items():
+                if field != "input":
+                    block[field] = block.get(field, "") + "".join(parts)
+                    continue
+                raw = "".join(parts)
+                try:
+                    block["input"] = json.loads(raw) if raw else {}
+                except json.JSONDecodeError:
+                    block["input"] = {}
+                    block["incomplete"] = True
+            return block
+        elif event_type == "message_delta":
+            self.message.update(event.get("delta", {}))
+            if "usage" in event:
+                self.message["usage"] = {
+                    **self.message.get("usage", {}),
+                    **event["usage"],
+                }
+        elif event_type == "message_stop":
+            self.done = True
+        elif event_type == "error":
+            error = event.get("error", {})
+            raise StreamError(
+                f"{error.get('type', 'error')}: {error.get('message', data)}"
+            )
+
+        return None
+
+    def _apply_delta(self, block: dict[str, Any], event: dict[str, Any]) -> None:
+        delta = event["delta"]
+        delta_type = delta.get("type")
+        parts = self._parts.setdefault(event["index"], {})
+
+        if delta_type == "text_delta":
+            parts.setdefault("text", []).append(delta["text"])
+        elif delta_type == "input_json_delta":
+            parts.setdefault("input", []).append(delta["partial_json"])
+        elif delta_type == "thinking_delta":
+            parts.setdefault("thinking", []).append(delta["thinking"])
+        elif delta_type == "signature_delta":
+            block["signature"] = delta["signature"]
+        elif delta_type == "citations_delta":
+            block.setdefault("citations", []).append(delta["citation"])
@@ -0,0 +1,260 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+
+def canonicalize(arguments: dict[str, Any]) -> dict[str, Any]:
+    """Default argument normalisation: trim strings and collapse inner whitespace."""
+    return {
+        key: re.sub(r"\s+", " ", value).strip() if isinstance(value, str) else value
+        for key, value in arguments.items()
+    }
+
+
+class ToolCachePolicy:
+    """How long, and where, results of one tool may be reused."""
+
+    def __init__(
+        self,
+        seconds: float,
+        *,
+        persist: bool = False,
+        normalize: Callable[[dict[str, Any]], dict[str, Any]] = canonicalize,
+    ):
+        """
+        Args:
+            seconds: Time to live of a cached result
+            persist: Also keep results in the on-disk tier, shared across
+                processes, when the cache has a path
+            normalize: Maps arguments to their canonical form before keying
+        """
+        self.seconds = seconds
+        self.persist = persist
+        self.normalize = normalize
+
+
+def ttl(
+    seconds: float,
+    *,
+    persist: bool = False,
+    normalize: Callable[[dict[str, Any]], dict[str, Any]] = canonicalize,
+) -> ToolCachePolicy:
+    """Cache policy for `@tool(cache=...)`, e.g. `cache=ttl(3600, persist=True)`."""
+    return ToolCachePolicy(seconds, persist=persist, normalize=normalize)
+
+
+class ToolResultCache:
+    """
+    Two-tier memo cache for tool results.
+
+    An in-memory LRU bounded by entry count and bytes sits in front of an
+    optional SQLite file bounded by bytes. The disk tier is only used when a
+    path is given (or set in DEEPAGENTS_TOOL_CACHE); otherwise `persist`
+    policies stay in memory. Concurrent calls with the same key share one
+    in-flight execution; if the call running it is cancelled, the others
+    run it themselves. Every caller gets its own copy of a cached value, so
+    mutating a result never alters the cache. Hit/miss counters are kept
+    per tool in `stats`.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 1024,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        path: str | None = None,
+    ):
+        """
+        Args:
+            max_entries: Entries kept in memory
+            max_memory_bytes: Approximate size bound of the in-memory tier
+            max_disk_bytes: Size bound of the on-disk tier
+            path: SQLite file of the disk tier, defaults to DEEPAGENTS_TOOL_CACHE;
+                without either there is no disk tier
+        """
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.path = path or os.getenv("DEEPAGENTS_TOOL_CACHE") or None
+        self.stats: dict[str, dict[str, int]] = {}
+
+        self._memory: OrderedDict[str, tuple[float, Any, int]] = OrderedDict()
+        self._memory_bytes = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._conn: sqlite3.Connection | None = None
+        self._disk_lock = threading.Lock()
+
+    def key(
+        self, tool_name: str, arguments: dict[str, Any], policy: ToolCachePolicy
+    ) -> str:
+        canonical = json.dumps(
+            policy.normalize(arguments),
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(f"{tool_name}\0{canonical}".encode("utf-8")).hexdigest()
+
+    async def get_or_compute(
+        self,
+        tool_name: str,
+        arguments: dict[str, Any],
+        policy: ToolCachePolicy,
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        stats = self.stats.setdefault(
+            tool_name, {"hits": 0, "misses": 0, "coalesced": 0}
+        )
+        key = self.key(tool_name, arguments, policy)
+        persist = policy.persist and self.path is not None
+
+        found, value = self._memory_get(key)
+        if not found and persist:
+            found, value = await asyncio.to_thread(self._disk_get, key)
+            if found:
+                self._memory_put(key, value, policy.seconds)
+        if found:
+            stats["hits"] += 1
+            return copy.deepcopy(value)
+
+        while key in self._inflight:
+            stats["coalesced"] += 1
+            future = self._inflight[key]
+            try:
+                return copy.deepcopy(await asyncio.shield(future))
+            except asyncio.CancelledError:
+                # The call running it was cancelled, not this one: take over
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+        # Waiters copy the result when they resume, by which time the caller
+        # may have changed its own; give them a snapshot taken now
+        future.set_result(copy.deepcopy(value))
+        self._memory_put(key, value, policy.seconds)
+        if persist:
+            await asyncio.to_thread(
+                self._disk_put, key, tool_name, value, policy.seconds
+            )
+        return value
+
+    def clear(self) -> None:
+        self._memory.clear()
+        self._memory_bytes = 0
+        if self._conn is not None:
+            with self._disk_lock:
+                self._conn.execute("DELETE FROM tool_cache")
+                self._conn.commit()
+
+    def _memory_get(self, key: str) -> tuple[bool, Any]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value, size = entry
+        if expires_at < time.time():
+            del self._memory[key]
+            self._memory_bytes -= size
+            return False, None
+        self._memory.move_to_end(key)
+        return True, value
+
+    def _memory_put(self, key: str, value: Any, seconds: float) -> None:
+        size = len(json.dumps(value, default=str))
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[2]
+        self._memory[key] = (time.time() + seconds, copy.deepcopy(value), size)
+        self._memory_bytes += size
+        while self._memory and (
+            len(self._memory) > self.max_entries
+            or self._memory_bytes > self.max_memory_bytes
+        ):
+            self._memory_bytes -= self._memory.popitem(last=False)[1][2]
+
+    def _disk(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tool_cache ("
+                " key TEXT PRIMARY KEY, tool TEXT NOT NULL, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS tool_cache_by_use ON tool_cache (used_at)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _disk_get(self, key: str) -> tuple[bool, Any]:
+        with self._disk_lock:
+            conn = self._disk()
+            row = conn.execute(
+                "SELECT value, expires_at FROM tool_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return False, None
+            if row[1] < time.time():
+                conn.execute("DELETE FROM tool_cache WHERE key = ?", (key,))
+                conn.commit()
+                return False, None
+            conn.execute(
+                "UPDATE tool_cache SET used_at = ? WHERE key = ?", (time.time(), key)
+            )
+            conn.commit()
+        return True, json.loads(row[0])
+
+    def _disk_put(self, key: str, tool_name: str, value: Any, seconds: float) -> None:
+        try:
+            body = json.dumps(value)
+        except (TypeError, ValueError):
+            # Only JSON results can be persisted; they stay in the memory tier
+            return
+
+        now = time.time()
+        with self._disk_lock:
+            conn = self._disk()
+            conn.execute(
+                "INSERT OR REPLACE INTO tool_cache"
+                " (key, tool, value, size, expires_at, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, tool_name, body, len(body), now + seconds, now),
+            )
+            conn.execute("DELETE FROM tool_cache WHERE expires_at < ?", (now,))
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM tool_cache"
+            ).fetchone()[0]
+            if total > self.max_disk_bytes:
+                # Evict least recently used rows until back under the size bound
+                rows = conn.execute(
+                    "SELECT key, size FROM tool_cache ORDER BY used_at"
+                ).fetchall()
+                for old_key, size in rows:
+                    if total <= self.max_disk_bytes:
+                        break
+                    conn.execute("DELETE FROM tool_cache WHERE key = ?", (old_key,))
+                    total -= size
+            conn.commit()
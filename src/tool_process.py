@@ -0,0 +1,203 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable
+
+# Pickled results at least this large come back through shared memory
+DEFAULT_SHARED_MEMORY_THRESHOLD = 1 << 20
+
+
+class _SharedResult:
+    """A pickled result left in a shared memory block for the parent to read."""
+
+    __slots__ = ("name", "size")
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+
+
+def tool_reference(func: Callable) -> tuple[str, str]:
+    """
+    The (module, qualified name) a worker process imports `func` by.
+
+    Raises:
+        ValueError: If `func` is not reachable from its module, e.g. a closure
+            or a function of the `__main__` script
+    """
+    if "<locals>" in func.__qualname__:
+        raise ValueError(
+            f"Tool {func.__name__} is defined inside a function; process tools "
+            "must be importable module-level functions"
+        )
+    if func.__module__ == "__main__":
+        # Spawned workers import their own __main__, which is not this script
+        raise ValueError(
+            f"Tool {func.__name__} is defined in the __main__ script; process tools "
+            "must be importable module-level functions"
+        )
+    return func.__module__, func.__qualname__
+
+
+def _resolve(module: str, qualname: str) -> Callable:
+    target: Any = importlib.import_module(module)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    return target
+
+
+def _warm_worker(modules: tuple[str, ...]) -> None:
+    # Import the tool modules up front so the first call does not pay for them
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+def _noop() -> int:
+    return os.getpid()
+
+
+def _run_in_worker(
+    module: str, qualname: str, arguments: dict[str, Any], threshold: int | None
+) -> bytes | _SharedResult:
+    result = _resolve(module, qualname)(**arguments)
+    payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    if threshold is None or len(payload) < threshold:
+        return payload
+    block = SharedMemory(create=True, size=len(payload))
+    block.buf[: len(payload)] = payload
+    block.close()
+    return _SharedResult(block.name, len(payload))
+
+
+def _load(outcome: bytes | _SharedResult) -> Any:
+    if not isinstance(outcome, _SharedResult):
+        return pickle.loads(outcome)
+    block = SharedMemory(name=outcome.name)
+    try:
+        # Unpickle straight from the shared pages; the result never crosses the pipe
+        with block.buf[: outcome.size] as view:
+            return pickle.loads(view)
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _discard(future: Future) -> None:
+    # The caller was cancelled; free the result's shared memory once it arrives
+    if not future.cancelled() and future.exception() is None:
+        outcome = future.result()
+        if isinstance(outcome, _SharedResult):
+            _load(outcome)
+
+
+class ProcessToolPool:
+    """
+    Worker processes for CPU-bound tools, so they run on other cores and
+    never hold the event loop or the GIL.
+
+    Arguments and results are pickled. Results whose pickle is at least
+    `shared_memory_threshold` bytes are written to a shared memory block
+    and unpickled by the parent straight from it, instead of being
+    streamed through the worker's pipe. Workers import the tool modules
+    when they start (`warm_up` starts them all ahead of the first call)
+    and are reused across calls; `max_tasks_per_child` replaces a worker
+    after that many calls, to contain leaks in tool code.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        *,
+        max_tasks_per_child: int | None = None,
+        shared_memory_threshold: int | None = DEFAULT_SHARED_MEMORY_THRESHOLD,
+    ):
+        """
+        Args:
+            max_workers: Worker processes, defaults to the number of CPUs
+            max_tasks_per_child: Calls a worker serves before it is replaced,
+                or None to keep workers for the pool's lifetime
+            shared_memory_threshold: Pickled size from which results are returned
+                through shared memory, or None to always use the pipe
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_tasks_per_child = max_tasks_per_child
+        self.shared_memory_threshold = shared_memory_threshold
+        self.modules: set[str] = set()
+        self._executor: ProcessPoolExecutor | None = None
+
+    def add_module(self, module: str) -> None:
+        """Have workers started from now on import `module` during warm-up."""
+        self.modules.add(module)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forked workers would inherit the event loop and its threads; spawn
+            # (or a forkserver, where available) gives them a clean interpreter
+            method = (
+                "forkserver"
+                if "forkserver" in multiprocessing.get_all_start_methods()
+                else "spawn"
+            )
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(method),
+                initializer=_warm_worker,
+                initargs=(tuple(sorted(self.modules)),),
+                max_tasks_per_child=self.max_tasks_per_child,
+            )
+        return self._executor
+
+    async def warm_up(self) -> None:
+        """Start every worker now rather than on the first calls."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(
+                asyncio.wrap_future(self.executor.submit(_noop), loop=loop)
+                for _ in range(self.max_workers)
+            )
+        )
+
+    async def run(self, func: Callable, arguments: dict[str, Any]) -> Any:
+        """Call `func(**arguments)` in a worker process and return its result."""
+        module, qualname = tool_reference(func)
+        try:
+            future = self.executor.submit(
+                _run_in_worker,
+                module,
+                qualname,
+                arguments,
+                self.shared_memory_threshold,
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OS); start a fresh pool once
+            self.shutdown(wait=False)
+            future = self.executor.submit(
+                _run_in_worker,
+                module,
+                qualname,
+                arguments,
+                self.shared_memory_threshold,
+            )
+        try:
+            outcome = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(_discard)
+            raise
+        except BrokenProcessPool:
+            self.shutdown(wait=False)
+            raise
+        return _load(outcome)
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
@@ -1,6 +1,32 @@
+import asyncio
+import contextvars
+import functools
 import inspect
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
-from typing import Any, Callable, get_type_hints
+from typing import Any, Callable
+
+from .deadline import time_remaining
+from .tool_cache import ToolCachePolicy, ToolResultCache
+from .tool_process import ProcessToolPool, tool_reference
+from .tool_results import EncodedResult, ResultEncoder
+from .tool_schema import build_schema, compile_validator
+from .tracing import span
+
+# Where a synchronous tool runs; coroutine tools always run on the event loop
+EXECUTION_INLINE = "inline"
+EXECUTION_THREAD = "thread"
+EXECUTION_PROCESS = "process"
+EXECUTION_MODES = (EXECUTION_INLINE, EXECUTION_THREAD, EXECUTION_PROCESS)
+
+
+class ToolTimeout(TimeoutError):
+    """Raised when a tool call outlives its timeout or the task's deadline."""
+
+    def __init__(self, tool: str, seconds: float):
+        self.tool = tool
+        self.seconds = seconds
+        super().__init__(f"Tool {tool} timed out after {seconds:.3g}s")
 
 
 class ToolRegistry:
@@ -8,15 +34,110 @@ class ToolRegistry:
     ToolRegistry: a set of tools and their schemas that are available to the agent.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_workers: int = 8,
+        *,
+        process_workers: int | None = None,
+        max_tasks_per_child: int | None = None,
+    ):
+        """
+        Args:
+            max_workers: Threads running synchronous tools
+            process_workers: Processes running `execution="process"` tools,
+                defaults to the number of CPUs
+            max_tasks_per_child: Calls a tool process serves before it is replaced
+        """
         self.tools: dict[str, Callable] = {}
         self.schemas: dict[str, dict[str, Any]] = {}
+        self.validators: dict[str, Callable[[dict[str, Any]], dict[str, Any]]] = {}
+        self.serial_tools: set[str] = set()
+        self.execution: dict[str, str] = {}
+        self.timeouts: dict[str, float] = {}
+        self.result_options: dict[str, dict[str, Any]] = {}
+        self.result_encoder = ResultEncoder()
+        self.cache_policies: dict[str, ToolCachePolicy] = {}
+        self.cache = ToolResultCache()
+        self.max_workers = max_workers
+        # Bumped on every registration, so compiled agent specs can tell they are stale
+        self.version = 0
+        self._executor: ThreadPoolExecutor | None = None
+        self.process_pool = ProcessToolPool(
+            process_workers, max_tasks_per_child=max_tasks_per_child
+        )
+
+    def tool(
+        self,
+        description: str = "",
+        *,
+        serial: bool = False,
+        max_result_chars: int | None = None,
+        project: Callable[[Any], Any] | None = None,
+        cache: ToolCachePolicy | None = None,
+        execution: str | None = None,
+        timeout: float | None = None,
+    ):
+        """
+        Register a function as a tool.
+
+        Args:
+            description: Description shown to the model
+            serial: The tool has side effects and must never run concurrently
+                with other tool calls from the same turn
+            max_result_chars: Results longer than this are saved to the
+                workspace and only previewed in the transcript
+            project: Reduces a result to the fields the model needs
+            cache: Reuse results for identical arguments, e.g. `cache=ttl(3600)`;
+                not allowed together with `serial`
+            execution: Where a synchronous tool runs: "thread" (the default) on
+                the registry's thread pool, "inline" on the event loop for
+                trivial tools, or "process" on the process pool for CPU-bound
+                work. Process tools must be module-level functions, and their
+                arguments and results must be picklable
+            timeout: Seconds a call may take before the agent gets a timeout
+                result instead; overrides the agent's `tool_timeout`
+        """
+        if serial and cache is not None:
+            raise ValueError("Tools with side effects (serial=True) cannot be cached")
+        if execution is not None and execution not in EXECUTION_MODES:
+            raise ValueError(
+                f"Unknown execution mode {execution!r}, expected one of "
+                f"{', '.join(EXECUTION_MODES)}"
+            )
 
-    def tool(self, description: str = ""):
         def decorator(func: Callable) -> Callable:
             name = func.__name__
+            if inspect.iscoroutinefunction(func):
+                if execution not in (None, EXECUTION_INLINE):
+                    raise ValueError(
+                        f"Tool {name} is a coroutine and always runs on the event loop"
+                    )
+                mode = EXECUTION_INLINE
+            else:
+                mode = execution or EXECUTION_THREAD
+            if mode == EXECUTION_PROCESS:
+                self.process_pool.add_module(tool_reference(func)[0])
             self.tools[name] = func
-            self.schemas[name] = self._generate_schema(func, description)
+            self.schemas[name] = build_schema(func, description)
+            self.validators[name] = compile_validator(func)
+            self.execution[name] = mode
+            if timeout is not None:
+                self.timeouts[name] = timeout
+            else:
+                self.timeouts.pop(name, None)
+            if serial:
+                self.serial_tools.add(name)
+            else:
+                self.serial_tools.discard(name)
+            if cache is not None:
+                self.cache_policies[name] = cache
+            else:
+                self.cache_policies.pop(name, None)
+            self.result_options[name] = {
+                "max_chars": max_result_chars,
+                "project": project,
+            }
+            self.version += 1
 
             @wraps(func)
             def wrapper(*args, **kwargs):
@@ -26,46 +147,6 @@ class ToolRegistry:
 
         return decorator
 
-    def _generate_schema(self, func: Callable, description: str) -> dict[str, Any]:
-        sig = inspect.signature(func)
-        type_hints = get_type_hints(func)
-
-        schema = {
-            "name": func.__name__,
-            "description": description or func.__doc__ or "",
-            "input_schema": {"type": "object", "properties": {}, "required": []},
-        }
-
-        for param_name, param in sig.parameters.items():
-            if param_name in ["state", "tool_call_id"]:
-                continue
-
-            param_schema = {
-                "type": self._python_type_to_json_type(type_hints.get(param_name, str))
-            }
-            schema["input_schema"]["properties"][param_name] = param_schema
-
-            if param.default == inspect.Parameter.empty:
-                schema["input_schema"]["required"].append(param_name)
-
-        return schema
-
-    def _python_type_to_json_type(self, py_type: type) -> str:
-        if py_type is str:
-            return "string"
-        elif py_type is int:
-            return "integer"
-        elif py_type is float:
-            return "number"
-        elif py_type is bool:
-            return "boolean"
-        elif hasattr(py_type, "__origin__") and py_type.__origin__ is list:
-            return "array"
-        elif hasattr(py_type, "__origin__") and py_type.__origin__ is dict:
-            return "object"
-        else:
-            return "string"
-
     def get_tools(self) -> list[str]:
         return list(self.tools.keys())
 
@@ -75,15 +156,119 @@ class ToolRegistry:
     def get_description(self, name: str) -> str:
         return self.schemas.get(name, {}).get("description", "")
 
-    async def execute(self, name: str, arguments: dict[str, Any]) -> Any:
+    def is_serial(self, name: str) -> bool:
+        return name in self.serial_tools
+
+    async def encode_result(self, name: str, result: Any) -> EncodedResult:
+        """Encode a tool result for the transcript using the tool's result options."""
+        return await self.result_encoder.encode(
+            name, result, **self.result_options.get(name, {})
+        )
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Bounded thread pool that synchronous tools run on."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="tool"
+            )
+        return self._executor
+
+    def validate(self, name: str, arguments: dict[str, Any]) -> dict[str, Any]:
+        """
+        Check a call's arguments against the tool's signature.
+
+        Returns:
+            The arguments, coerced to the annotated types
+
+        Raises:
+            ToolArgumentError: Listing every missing, unexpected or mistyped argument
+        """
+        return self.validators[name](arguments)
+
+    async def execute(
+        self, name: str, arguments: dict[str, Any], *, timeout: float | None = None
+    ) -> Any:
+        """
+        Validate and run one tool call.
+
+        Args:
+            name: Registered tool name
+            arguments: The model's arguments
+            timeout: Seconds the call may take, unless the tool declares its own;
+                the caller's deadline applies either way
+
+        Raises:
+            ToolArgumentError: If the arguments do not match the tool's signature
+            ToolTimeout: If the call runs out of time
+        """
         if name not in self.tools:
             raise ValueError(f"Tool {name} not found")
 
+        # Bad calls fail here, before they reach the cache or the thread pool
+        validated = self.validate(name, arguments)
+        limit = time_remaining(self.timeouts.get(name, timeout))
+        policy = self.cache_policies.get(name)
+        with span(
+            "tool.call",
+            tool=name,
+            cached=policy is not None,
+            execution=self.execution[name],
+        ):
+            if policy is not None:
+                # The timeout is inside the computation, so callers sharing it
+                # get the ToolTimeout too rather than a cancellation
+                return await self.cache.get_or_compute(
+                    name,
+                    validated,
+                    policy,
+                    lambda: self._call_within(name, validated, limit),
+                )
+            return await self._call_within(name, validated, limit)
+
+    async def _call_within(
+        self, name: str, arguments: dict[str, Any], limit: float | None
+    ) -> Any:
+        if limit is None:
+            return await self._call(name, arguments)
+        scope = asyncio.timeout(limit)
+        try:
+            async with scope:
+                return await self._call(name, arguments)
+        except TimeoutError:
+            if not scope.expired():
+                raise
+            # Threads cannot be interrupted: a sync tool finishes in the background
+            # (or stops early via check_deadline) and its result is dropped
+            raise ToolTimeout(name, limit) from None
+
+    async def _call(self, name: str, arguments: dict[str, Any]) -> Any:
         func = self.tools[name]
-        if inspect.iscoroutinefunction(func):
-            return await func(**arguments)
-        else:
-            return func(**arguments)
+        mode = self.execution[name]
+        if mode == EXECUTION_INLINE:
+            result = func(**arguments)
+            return await result if inspect.isawaitable(result) else result
+        if mode == EXECUTION_PROCESS:
+            return await self.process_pool.run(func, arguments)
+
+        # Keep blocking tools off the event loop thread
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(context.run, func, **arguments)
+        )
+
+    async def warm_up(self) -> None:
+        """Start the tool process pool, if any tool runs in it, ahead of the first call."""
+        if EXECUTION_PROCESS in self.execution.values():
+            await self.process_pool.warm_up()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the tool thread and process pools."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+        self.process_pool.shutdown(wait=wait)
 
 
 registry = ToolRegistry()
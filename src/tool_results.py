@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Callable
+
+from .context_window import CHARS_PER_TOKEN
+from .workspace import workspace_path
+
+# Spilled results live here, relative to the workspace, so `read_file` can page them
+SPILL_DIR = ".tool_results"
+
+
+class EncodedResult:
+    """A tool result as it goes into the transcript, plus what encoding saved."""
+
+    def __init__(self, text: str, baseline_chars: int, spilled_to: str | None = None):
+        self.text = text
+        self.baseline_chars = baseline_chars
+        self.spilled_to = spilled_to
+
+    @property
+    def saved_chars(self) -> int:
+        return max(0, self.baseline_chars - len(self.text))
+
+    @property
+    def saved_tokens(self) -> int:
+        return int(self.saved_chars / CHARS_PER_TOKEN)
+
+
+class ResultEncoder:
+    """
+    Turns raw tool results into compact transcript text.
+
+    Results are projected (if the tool declares a projection), serialised
+    without indentation, and, when still larger than the tool's limit,
+    written to the workspace in full with only a handle and a preview left in
+    the transcript. Running totals of what was saved are kept in `stats`.
+    """
+
+    def __init__(self, max_chars: int = 8000, preview_chars: int = 1500):
+        """
+        Args:
+            max_chars: Default transcript size limit per result
+            preview_chars: Characters of a spilled result kept inline
+        """
+        self.max_chars = max_chars
+        self.preview_chars = preview_chars
+        self.stats = {"results": 0, "spilled": 0, "saved_chars": 0, "saved_tokens": 0}
+
+    async def encode(
+        self,
+        tool_name: str,
+        result: Any,
+        *,
+        max_chars: int | None = None,
+        project: Callable[[Any], Any] | None = None,
+    ) -> EncodedResult:
+        """
+        Args:
+            tool_name: The tool that produced the result
+            result: The raw return value
+            max_chars: Limit for this tool, overriding the default
+            project: Keeps only the fields of the result worth showing the model
+        """
+        # What the transcript used to carry, for reporting only
+        baseline = len(json.dumps(result, indent=2, default=str))
+
+        text = self._serialise(project(result) if project else result)
+        limit = max_chars or self.max_chars
+        spilled_to = None
+        if len(text) > limit:
+            # The write is blocking file I/O; keep it off the event loop
+            spilled_to = await asyncio.to_thread(self._spill, tool_name, result)
+            text = (
+                f"[{len(text)} characters; full result saved to `{spilled_to}`, "
+                f"read it with read_file, which pages through long files]\n{text[: self.preview_chars]}..."
+            )
+
+        encoded = EncodedResult(text, baseline, spilled_to)
+        self.stats["results"] += 1
+        self.stats["spilled"] += spilled_to is not None
+        self.stats["saved_chars"] += encoded.saved_chars
+        self.stats["saved_tokens"] += encoded.saved_tokens
+        return encoded
+
+    def _serialise(self, value: Any) -> str:
+        if isinstance(value, str):
+            return value
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+    def _spill(self, tool_name: str, result: Any) -> str:
+        # Indented so the spilled copy can be paged by line
+        body = (
+            result
+            if isinstance(result, str)
+            else json.dumps(result, indent=1, ensure_ascii=False, default=str)
+        )
+        digest = hashlib.sha256(body.encode("utf-8")).hexdigest()[:12]
+        extension = "txt" if isinstance(result, str) else "json"
+        filename = f"{SPILL_DIR}/{tool_name}-{digest}.{extension}"
+        path = workspace_path(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(body)
+        return filename
+
+
+def project_fields(*fields: str, list_key: str | None = None) -> Callable[[Any], Any]:
+    """
+    Build a projection that keeps only `fields` of each record.
+
+    Args:
+        fields: Keys to keep; keys whose value is None are dropped too
+        list_key: Key of the record list inside a dict result (e.g. "results");
+            other keys of that dict are dropped
+    """
+
+    def project(result: Any) -> Any:
+        records = (
+            result.get(list_key, [])
+            if list_key and isinstance(result, dict)
+            else result
+        )
+        if not isinstance(records, list):
+            return result
+        projected = [
+            {k: r[k] for k in fields if r.get(k) is not None}
+            if isinstance(r, dict)
+            else r
+            for r in records
+        ]
+        return {list_key: projected} if list_key else projected
+
+    return project
@@ -0,0 +1,653 @@
+"""
+JSON Schema generation and argument validation for tool functions.
+
+Both are derived from the function's signature and type hints once, when
+the tool is registered. `build_schema` emits schemas in a fixed order
+(parameters and fields in declaration order), so a tool's schema is
+byte-stable across processes. `compile_validator` turns each parameter's
+annotation into a small checker function, so validating a call costs a
+few isinstance checks, and values the model commonly gets slightly wrong
+("5" for 5, "true" for True, a JSON-encoded list) are coerced instead of
+failing the call.
+"""
+
+import dataclasses
+import enum
+import inspect
+import json
+import re
+import types
+import typing
+from typing import Any, Callable, Literal, Union, get_args, get_origin, get_type_hints
+
+try:
+    import pydantic
+except ImportError:
+    pydantic = None
+
+# Parameters the agent loop supplies itself, never shown to the model
+HIDDEN_PARAMETERS = ("state", "tool_call_id")
+
+_NONE_TYPE = type(None)
+
+
+class ToolArgumentError(ValueError):
+    """Raised when a tool call's arguments do not match the tool's signature."""
+
+    def __init__(self, tool: str, errors: list[str]):
+        self.tool = tool
+        self.errors = errors
+        super().__init__(f"Invalid arguments for {tool}: " + "; ".join(errors))
+
+
+class _Invalid(Exception):
+    pass
+
+
+def parse_docstring(doc: str | None) -> tuple[str, dict[str, str]]:
+    """
+    Split a Google-style docstring into its summary and `Args:` descriptions.
+
+    Returns:
+        The text before the first section, and a description per parameter
+    """
+    if not doc:
+        return "", {}
+    lines = inspect.cleandoc(doc).splitlines()
+    summary: list[str] = []
+    params: dict[str, str] = {}
+    section = None
+    current = None
+    param_indent = 0
+    for line in lines:
+        header = _SECTION_HEADER.fullmatch(line)
+        if header:
+            section = header.group(1).lower()
+            current = None
+            continue
+        if section is None:
+            summary.append(line)
+        elif section in ("args", "arguments", "parameters"):
+            indent = len(line) - len(line.lstrip())
+            match = _PARAM_LINE.fullmatch(line)
+            if match and (current is None or indent <= param_indent):
+                current = match.group(1)
+                params[current] = match.group(2).strip()
+                param_indent = indent
+            elif current is not None and line.strip():
+                # Continuation line of the current parameter's description
+                params[current] = f"{params[current]} {line.strip()}".strip()
+    return "\n".join(summary).strip(), params
+
+
+_SECTION_HEADER = re.compile(r"(\w[\w ]*):\s*")
+_PARAM_LINE = re.compile(r"\s+\*{0,2}(\w+)(?:\s*\([^)]*\))?:\s*(.*)")
+
+
+def build_schema(func: Callable, description: str = "") -> dict[str, Any]:
+    """The Anthropic tool definition for `func`."""
+    summary, param_docs = parse_docstring(func.__doc__)
+    hints = _type_hints(func)
+    properties: dict[str, Any] = {}
+    required: list[str] = []
+    # Pydantic models' `$ref`s point at `#/$defs/...`, i.e. the input schema root
+    defs: dict[str, Any] = {}
+
+    for name, param in _parameters(func):
+        schema = type_to_schema(hints.get(name, str), defs)
+        if name in param_docs:
+            schema = {**schema, "description": param_docs[name]}
+        if param.default is not inspect.Parameter.empty and _json_safe(param.default):
+            schema = {**schema, "default": _json_value(param.default)}
+        properties[name] = schema
+        if param.default is inspect.Parameter.empty:
+            required.append(name)
+
+    input_schema = {"type": "object", "properties": properties, "required": required}
+    if defs:
+        input_schema["$defs"] = defs
+    return {
+        "name": func.__name__,
+        "description": description or summary or func.__doc__ or "",
+        "input_schema": input_schema,
+    }
+
+
+def type_to_schema(tp: Any, defs: dict[str, Any] | None = None) -> dict[str, Any]:
+    """
+    JSON Schema for a type annotation.
+
+    Args:
+        tp: The annotation
+        defs: Collects the `$defs` of pydantic models, for the caller to place
+            at the root of the schema their `$ref`s resolve against; if None,
+            they stay on the model's own schema
+    """
+    if tp is Any or tp is inspect.Parameter.empty:
+        return {}
+    if tp is _NONE_TYPE or tp is None:
+        return {"type": "null"}
+    if tp is str:
+        return {"type": "string"}
+    if tp is bool:
+        return {"type": "boolean"}
+    if tp is int:
+        return {"type": "integer"}
+    if tp is float:
+        return {"type": "number"}
+
+    origin = get_origin(tp)
+    args = get_args(tp)
+
+    if origin is typing.Annotated:
+        schema = type_to_schema(args[0], defs)
+        text = next((a for a in args[1:] if isinstance(a, str)), None)
+        return {**schema, "description": text} if text else schema
+    if origin is Literal:
+        values = [_json_value(value) for value in args]
+        kinds = {_schema_type(value) for value in values}
+        schema = {"type": kinds.pop()} if len(kinds) == 1 else {}
+        return {**schema, "enum": values}
+    if origin in (Union, types.UnionType):
+        options = [type_to_schema(arg, defs) for arg in args]
+        return options[0] if len(options) == 1 else {"anyOf": options}
+    if origin in (list, set, frozenset) or tp in (list, set, frozenset):
+        schema: dict[str, Any] = {"type": "array"}
+        if args:
+            schema["items"] = type_to_schema(args[0], defs)
+        if origin in (set, frozenset) or tp in (set, frozenset):
+            schema["uniqueItems"] = True
+        return schema
+    if origin is tuple or tp is tuple:
+        if len(args) == 2 and args[1] is Ellipsis:
+            return {"type": "array", "items": type_to_schema(args[0], defs)}
+        if args:
+            return {
+                "type": "array",
+                "prefixItems": [type_to_schema(arg, defs) for arg in args],
+                "minItems": len(args),
+                "maxItems": len(args),
+            }
+        return {"type": "array"}
+    if origin is dict or tp is dict:
+        schema = {"type": "object"}
+        if len(args) == 2 and args[1] is not Any:
+            schema["additionalProperties"] = type_to_schema(args[1], defs)
+        return schema
+
+    if isinstance(tp, type):
+        if issubclass(tp, enum.Enum):
+            values = [_json_value(member.value) for member in tp]
+            kinds = {_schema_type(value) for value in values}
+            schema = {"type": kinds.pop()} if len(kinds) == 1 else {}
+            return {**schema, "enum": values}
+        if _is_typeddict(tp):
+            hints = get_type_hints(tp)
+            return {
+                "type": "object",
+                "properties": {
+                    name: type_to_schema(t, defs) for name, t in hints.items()
+                },
+                "required": [name for name in hints if name in tp.__required_keys__],
+            }
+        if dataclasses.is_dataclass(tp):
+            hints = get_type_hints(tp)
+            fields = [f for f in dataclasses.fields(tp) if f.init]
+            return {
+                "type": "object",
+                "properties": {
+                    f.name: type_to_schema(hints[f.name], defs) for f in fields
+                },
+                "required": [f.name for f in fields if _field_required(f)],
+            }
+        if _is_pydantic_model(tp):
+            schema = tp.model_json_schema()
+            if defs is not None:
+                defs.update(schema.pop("$defs", {}))
+            return schema
+
+    # Unknown annotations keep the historical behaviour of accepting a string
+    return {"type": "string"}
+
+
+def compile_validator(func: Callable) -> Callable[[dict[str, Any]], dict[str, Any]]:
+    """
+    Build a validator for calls to `func`.
+
+    The validator takes the model's arguments and returns them checked and
+    coerced to the annotated types, or raises `ToolArgumentError` listing
+    every problem.
+    """
+    name = func.__name__
+    hints = _type_hints(func)
+    parameters = _parameters(func)
+    checkers = {
+        param_name: _checker(hints.get(param_name, Any)) for param_name, _ in parameters
+    }
+    required = [
+        param_name
+        for param_name, param in parameters
+        if param.default is inspect.Parameter.empty
+    ]
+    accepts_extra = any(
+        param.kind is inspect.Parameter.VAR_KEYWORD
+        for param in inspect.signature(func).parameters.values()
+    )
+
+    def validate(arguments: dict[str, Any]) -> dict[str, Any]:
+        if not isinstance(arguments, dict):
+            raise ToolArgumentError(
+                name, [f"expected an object of arguments, got {_kind(arguments)}"]
+            )
+        errors = [
+            f"missing required argument '{param}'"
+            for param in required
+            if param not in arguments
+        ]
+        validated = {}
+        for key, value in arguments.items():
+            check = checkers.get(key)
+            if check is None:
+                if accepts_extra:
+                    validated[key] = value
+                else:
+                    errors.append(
+                        f"unexpected argument '{key}' (expected {', '.join(checkers) or 'none'})"
+                    )
+                continue
+            try:
+                validated[key] = check(value, key)
+            except _Invalid as e:
+                errors.append(str(e))
+        if errors:
+            raise ToolArgumentError(name, errors)
+        return validated
+
+    return validate
+
+
+Checker = Callable[[Any, str], Any]
+
+
+def _checker(tp: Any) -> Checker:
+    """Compile a type annotation into a function that checks and coerces one value."""
+    if tp is Any or tp is inspect.Parameter.empty:
+        return _accept
+    if tp is _NONE_TYPE or tp is None:
+        return _check_none
+    if tp is str:
+        return _check_str
+    if tp is bool:
+        return _check_bool
+    if tp is int:
+        return _check_int
+    if tp is float:
+        return _check_float
+
+    origin = get_origin(tp)
+    args = get_args(tp)
+
+    if origin is typing.Annotated:
+        return _checker(args[0])
+    if origin is Literal:
+        return _literal_checker(args)
+    if origin in (Union, types.UnionType):
+        return _union_checker(args)
+    if origin in (list, set, frozenset, tuple) or tp in (list, set, frozenset, tuple):
+        return _sequence_checker(origin or tp, args)
+    if origin is dict or tp is dict:
+        return _dict_checker(args[1] if len(args) == 2 else Any)
+
+    if isinstance(tp, type):
+        if issubclass(tp, enum.Enum):
+            return _enum_checker(tp)
+        if _is_typeddict(tp):
+            return _typeddict_checker(tp)
+        if dataclasses.is_dataclass(tp):
+            return _dataclass_checker(tp)
+        if _is_pydantic_model(tp):
+            return _pydantic_checker(tp)
+    # Unrecognised annotations are not checked
+    return _accept
+
+
+def _accept(value: Any, path: str) -> Any:
+    return value
+
+
+def _check_none(value: Any, path: str) -> Any:
+    if value is None:
+        return None
+    raise _Invalid(f"{path}: expected null, got {_kind(value)}")
+
+
+def _check_str(value: Any, path: str) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise _Invalid(f"{path}: expected string, got {_kind(value)}")
+
+
+def _check_bool(value: Any, path: str) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    if value in (0, 1) and not isinstance(value, float):
+        return bool(value)
+    raise _Invalid(f"{path}: expected boolean, got {_kind(value)}")
+
+
+def _check_int(value: Any, path: str) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise _Invalid(f"{path}: expected integer, got {_kind(value)}")
+
+
+def _check_float(value: Any, path: str) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    raise _Invalid(f"{path}: expected number, got {_kind(value)}")
+
+
+def _literal_checker(allowed: tuple) -> Checker:
+    by_text = {str(value): value for value in allowed}
+    kinds = {type(value) for value in allowed}
+
+    def check(value: Any, path: str) -> Any:
+        if type(value) in kinds and value in allowed:
+            return value
+        if isinstance(value, (str, int, float)) and str(value) in by_text:
+            return by_text[str(value)]
+        raise _Invalid(
+            f"{path}: expected one of {', '.join(json.dumps(_json_value(a)) for a in allowed)}, "
+            f"got {json.dumps(value, default=str)}"
+        )
+
+    return check
+
+
+def _enum_checker(enum_type: type[enum.Enum]) -> Checker:
+    by_value = {member.value: member for member in enum_type}
+    by_text = {str(member.value): member for member in enum_type}
+    by_name = {member.name: member for member in enum_type}
+
+    def check(value: Any, path: str) -> enum.Enum:
+        if isinstance(value, enum_type):
+            return value
+        try:
+            if value in by_value:
+                return by_value[value]
+        except TypeError:
+            pass
+        if isinstance(value, (str, int, float)):
+            member = by_text.get(str(value)) or by_name.get(str(value))
+            if member is not None:
+                return member
+        raise _Invalid(
+            f"{path}: expected one of {', '.join(json.dumps(_json_value(v)) for v in by_value)}, "
+            f"got {json.dumps(value, default=str)}"
+        )
+
+    return check
+
+
+def _union_checker(options: tuple) -> Checker:
+    present = [option for option in options if option is not _NONE_TYPE]
+    if len(present) == 1:
+        # Optional[X]: X's own errors are more precise than "expected X or null"
+        inner = _checker(present[0])
+
+        def check_optional(value: Any, path: str) -> Any:
+            return None if value is None else inner(value, path)
+
+        return check_optional
+
+    checkers = [_checker(option) for option in options]
+    names = " or ".join(_type_name(option) for option in options)
+    # Exact type matches win before any option gets to coerce, so "5" stays a
+    # string in `str | int` and 5 stays an int
+    exact = tuple(
+        option for option in options if option in (str, int, float, bool, _NONE_TYPE)
+    )
+    nullable = _NONE_TYPE in options
+
+    def check(value: Any, path: str) -> Any:
+        if value is None and nullable:
+            return None
+        if exact and type(value) in exact:
+            return value
+        for checker in checkers:
+            try:
+                return checker(value, path)
+            except _Invalid:
+                continue
+        raise _Invalid(f"{path}: expected {names}, got {_kind(value)}")
+
+    return check
+
+
+def _sequence_checker(kind: type, args: tuple) -> Checker:
+    if kind is tuple and args and not (len(args) == 2 and args[1] is Ellipsis):
+        item_checkers = [_checker(arg) for arg in args]
+
+        def check_fixed(value: Any, path: str) -> tuple:
+            value = _maybe_json(value, list)
+            if not isinstance(value, (list, tuple)):
+                raise _Invalid(f"{path}: expected array, got {_kind(value)}")
+            if len(value) != len(item_checkers):
+                raise _Invalid(
+                    f"{path}: expected {len(item_checkers)} items, got {len(value)}"
+                )
+            return tuple(
+                check(item, f"{path}[{i}]")
+                for i, (check, item) in enumerate(zip(item_checkers, value))
+            )
+
+        return check_fixed
+
+    item_check = _checker(args[0]) if args else _accept
+    build = {list: list, set: set, frozenset: frozenset, tuple: tuple}[kind]
+
+    def check(value: Any, path: str) -> Any:
+        value = _maybe_json(value, list)
+        if not isinstance(value, (list, tuple, set, frozenset)):
+            raise _Invalid(f"{path}: expected array, got {_kind(value)}")
+        if item_check is _accept:
+            return value if type(value) is build else build(value)
+        errors = []
+        items = []
+        for i, item in enumerate(value):
+            try:
+                items.append(item_check(item, f"{path}[{i}]"))
+            except _Invalid as e:
+                errors.append(str(e))
+        if errors:
+            raise _Invalid("; ".join(errors))
+        return build(items)
+
+    return check
+
+
+def _dict_checker(value_type: Any) -> Checker:
+    value_check = _checker(value_type)
+
+    def check(value: Any, path: str) -> dict:
+        value = _maybe_json(value, dict)
+        if not isinstance(value, dict):
+            raise _Invalid(f"{path}: expected object, got {_kind(value)}")
+        if value_check is _accept:
+            return value
+        return {key: value_check(item, f"{path}.{key}") for key, item in value.items()}
+
+    return check
+
+
+def _object_fields_checker(
+    name: str, field_checkers: dict[str, Checker], required: set[str]
+) -> Callable[[Any, str], dict[str, Any]]:
+    def check(value: Any, path: str) -> dict[str, Any]:
+        value = _maybe_json(value, dict)
+        if not isinstance(value, dict):
+            raise _Invalid(f"{path}: expected {name} object, got {_kind(value)}")
+        errors = [
+            f"{path}: missing required field '{field}'"
+            for field in required
+            if field not in value
+        ]
+        checked = {}
+        for key, item in value.items():
+            field_check = field_checkers.get(key)
+            if field_check is None:
+                errors.append(f"{path}: unexpected field '{key}'")
+                continue
+            try:
+                checked[key] = field_check(item, f"{path}.{key}")
+            except _Invalid as e:
+                errors.append(str(e))
+        if errors:
+            raise _Invalid("; ".join(errors))
+        return checked
+
+    return check
+
+
+def _typeddict_checker(tp: type) -> Checker:
+    hints = get_type_hints(tp)
+    return _object_fields_checker(
+        tp.__name__,
+        {name: _checker(t) for name, t in hints.items()},
+        set(tp.__required_keys__),
+    )
+
+
+def _dataclass_checker(tp: type) -> Checker:
+    hints = get_type_hints(tp)
+    fields = [f for f in dataclasses.fields(tp) if f.init]
+    check_fields = _object_fields_checker(
+        tp.__name__,
+        {f.name: _checker(hints[f.name]) for f in fields},
+        {f.name for f in fields if _field_required(f)},
+    )
+
+    def check(value: Any, path: str) -> Any:
+        if isinstance(value, tp):
+            return value
+        return tp(**check_fields(value, path))
+
+    return check
+
+
+def _pydantic_checker(model: type) -> Checker:
+    def check(value: Any, path: str) -> Any:
+        try:
+            return model.model_validate(_maybe_json(value, dict))
+        except pydantic.ValidationError as e:
+            raise _Invalid(
+                "; ".join(
+                    f"{'.'.join([path, *map(str, error['loc'])])}: {error['msg']}"
+                    for error in e.errors()
+                )
+            ) from None
+
+    return check
+
+
+def _maybe_json(value: Any, expected: type) -> Any:
+    """Decode a JSON-encoded array or object the model sent as a string."""
+    if isinstance(value, str) and value[:1] in "[{":
+        try:
+            decoded = json.loads(value)
+        except ValueError:
+            return value
+        if isinstance(decoded, expected):
+            return decoded
+    return value
+
+
+def _parameters(func: Callable) -> list[tuple[str, inspect.Parameter]]:
+    return [
+        (name, param)
+        for name, param in inspect.signature(func).parameters.items()
+        if name not in HIDDEN_PARAMETERS
+        and param.kind
+        not in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD)
+    ]
+
+
+def _type_hints(func: Callable) -> dict[str, Any]:
+    try:
+        return get_type_hints(func, include_extras=True)
+    except (NameError, TypeError):
+        # Unresolvable forward references: fall back to the raw annotations
+        return dict(getattr(func, "__annotations__", {}))
+
+
+def _is_typeddict(tp: type) -> bool:
+    return issubclass(tp, dict) and hasattr(tp, "__required_keys__")
+
+
+def _is_pydantic_model(tp: type) -> bool:
+    return pydantic is not None and issubclass(tp, pydantic.BaseModel)
+
+
+def _field_required(field: dataclasses.Field) -> bool:
+    return (
+        field.default is dataclasses.MISSING
+        and field.default_factory is dataclasses.MISSING
+    )
+
+
+def _json_value(value: Any) -> Any:
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def _json_safe(value: Any) -> bool:
+    return isinstance(_json_value(value), (str, int, float, bool, type(None)))
+
+
+def _schema_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if value is None:
+        return "null"
+    return "string"
+
+
+def _kind(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return f"boolean {json.dumps(value)}"
+    if isinstance(value, (int, float)):
+        return f"{_schema_type(value)} {value}"
+    if isinstance(value, str):
+        preview = value if len(value) <= 40 else value[:37] + "..."
+        return f"string {json.dumps(preview)}"
+    if isinstance(value, (list, tuple)):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    return type(value).__name__
+
+
+def _type_name(tp: Any) -> str:
+    schema = type_to_schema(tp)
+    return schema.get("type") or getattr(tp, "__name__", None) or str(tp)
@@ -1,15 +1,27 @@
+from .append_file import append_file
 from .complete_task import complete_task
+from .edit_file import edit_file
+from .glob import glob
 from .internet_search import internet_search
 from .invoke_subagent import invoke_subagent
+from .invoke_subagents import invoke_subagents
 from .ls import ls
+from .multi_search import multi_search
 from .read_file import read_file
+from .search_files import search_files
 from .write_file import write_file
 
 __all__ = [
     "internet_search",
+    "multi_search",
     "read_file",
     "ls",
+    "glob",
+    "search_files",
     "write_file",
+    "append_file",
+    "edit_file",
     "complete_task",
     "invoke_subagent",
+    "invoke_subagents",
 ]
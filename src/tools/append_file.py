@@ -0,0 +1,22 @@
+import os
+
+from src.tool_registry import tool
+from src.workspace import WORKSPACE_DIR, resolve_workspace_path
+from src.workspace_files import append_text
+from src.workspace_index import workspace_index
+
+
+@tool(
+    description="Append content to the end of a file, creating it if needed, without rewriting what is already there",
+    serial=True,
+)
+def append_file(filename: str, content: str) -> str:
+    """Append content to a file in the workspace"""
+    try:
+        os.makedirs(WORKSPACE_DIR, exist_ok=True)
+        path = resolve_workspace_path(filename)
+        size = append_text(path, content)
+        workspace_index.invalidate(path)
+        return f"Appended {len(content)} characters to {filename} (now {size} bytes)"
+    except Exception as e:
+        return f"Error appending to {filename}: {str(e)}"
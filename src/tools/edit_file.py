@@ -0,0 +1,82 @@
+from src.tool_registry import tool
+from src.workspace import resolve_workspace_path
+from src.workspace_files import open_workspace_file, replace_bytes
+from src.workspace_index import workspace_index
+
+
+@tool(
+    description="Edit part of a file in place instead of rewriting it. Either replace `old_text`, which must occur exactly once, with `new_text`, or replace lines `start_line` to `end_line` (1-based, inclusive; end_line = start_line - 1 inserts before start_line) with `new_text`",
+    serial=True,
+)
+def edit_file(
+    filename: str,
+    new_text: str,
+    old_text: str | None = None,
+    start_line: int | None = None,
+    end_line: int | None = None,
+) -> str:
+    """
+    Replace a unique snippet or a range of lines of a file.
+
+    Args:
+        filename: File in the workspace
+        new_text: The replacement text
+        old_text: Exact text to replace; must occur exactly once in the file
+        start_line: First line to replace (1-based), when not using old_text
+        end_line: Last line to replace, inclusive; defaults to start_line
+    """
+    try:
+        path = resolve_workspace_path(filename)
+        with open_workspace_file(path) as file:
+            if old_text is not None:
+                if start_line is not None or end_line is not None:
+                    return f"Error editing {filename}: give either old_text or a line range, not both"
+                needle = old_text.encode("utf-8")
+                start = file.find(needle) if needle else -1
+                if start < 0:
+                    return f"Error editing {filename}: old_text not found"
+                if file.find(needle, start + 1) >= 0:
+                    return f"Error editing {filename}: old_text occurs more than once; include more surrounding text"
+                end = start + len(needle)
+                replacement = new_text
+                described = f"replaced text at line {file.line_of(start) + 1}"
+            elif start_line is not None:
+                end_line = start_line if end_line is None else end_line
+                if not 1 <= start_line <= file.lines + 1 or not (
+                    start_line - 1 <= end_line <= file.lines
+                ):
+                    return (
+                        f"Error editing {filename}: invalid line range "
+                        f"{start_line}-{end_line} for a file of {file.lines} lines"
+                    )
+                start = file.line_offset(start_line - 1)
+                end = file.line_offset(end_line)
+                replacement = new_text
+                # new_text stands for whole lines: keep the line break the range had
+                if (
+                    replacement
+                    and not replacement.endswith("\n")
+                    and (end < file.size or file.data[end - 1 : end] == b"\n")
+                ):
+                    replacement += "\n"
+                if (
+                    replacement
+                    and start == file.size
+                    and file.size
+                    and (file.data[start - 1 : start] != b"\n")
+                ):
+                    # Appending after a last line that has no line break
+                    replacement = "\n" + replacement
+                described = (
+                    f"inserted before line {start_line}"
+                    if end_line < start_line
+                    else f"replaced lines {start_line}-{end_line}"
+                )
+            else:
+                return f"Error editing {filename}: give old_text or start_line"
+
+        size = replace_bytes(path, start, end, replacement.encode("utf-8"))
+        workspace_index.invalidate(path)
+        return f"Edited {filename}: {described} (now {size} bytes)"
+    except Exception as e:
+        return f"Error editing {filename}: {str(e)}"
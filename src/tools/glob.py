@@ -0,0 +1,40 @@
+import os
+from pathlib import Path
+
+from src.tool_registry import tool
+from src.tools.ls import file_entry
+from src.workspace import WORKSPACE_DIR, resolve_workspace_path
+
+MAX_GLOB_RESULTS = 500
+
+
+@tool(
+    description="Find workspace files by name pattern, e.g. `*.md` or `notes/**/*.txt`, with their size and last-modified time"
+)
+def glob(pattern: str) -> list[dict]:
+    """
+    Find files in the workspace whose paths match a glob pattern.
+
+    Args:
+        pattern: Glob relative to the workspace; `**` matches any number of directories
+    """
+    if Path(pattern).is_absolute() or ".." in Path(pattern).parts:
+        return f"Error matching {pattern}: patterns must stay inside the workspace"
+    try:
+        root = Path(WORKSPACE_DIR)
+        matches = []
+        for path in sorted(root.glob(pattern)):
+            try:
+                # Skip symlinks that lead out of the workspace
+                resolve_workspace_path(os.path.relpath(path, root))
+            except ValueError:
+                continue
+            if path.is_file():
+                matches.append(
+                    file_entry(os.path.relpath(path, root), path.stat(), is_dir=False)
+                )
+                if len(matches) == MAX_GLOB_RESULTS:
+                    break
+        return matches
+    except Exception as e:
+        return f"Error matching {pattern}: {str(e)}"
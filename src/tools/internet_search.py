@@ -1,24 +1,33 @@
-import os
-
-from dotenv import load_dotenv
-from tavily import TavilyClient
-
+from src.search import get_search_provider
+from src.tool_cache import canonicalize, ttl
 from src.tool_registry import tool
+from src.tool_results import project_fields
+
 
-load_dotenv()
+def _normalize_search(arguments: dict) -> dict:
+    # Queries differing only in case or spacing return the same results
+    arguments = canonicalize(arguments)
+    arguments["query"] = arguments.get("query", "").lower()
+    # Results from a fake index must never be served for the real one
+    arguments["provider"] = type(get_search_provider()).__name__
+    return arguments
 
 
-@tool(description="Search the internet for information")
-def internet_search(
+@tool(
+    description="Search the internet for information",
+    project=project_fields(
+        "title", "url", "content", "raw_content", list_key="results"
+    ),
+    cache=ttl(3600, persist=True, normalize=_normalize_search),
+)
+async def internet_search(
     query: str,
     max_results: int = 5,
     include_raw_content: bool = False,
 ):
     """Run a web search"""
-    tavily_async_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-    search_docs = tavily_async_client.search(
+    return await get_search_provider().search(
         query,
         max_results=max_results,
         include_raw_content=include_raw_content,
     )
-    return search_docs
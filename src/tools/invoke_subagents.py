@@ -0,0 +1,16 @@
+from typing import TypedDict
+
+from src.tool_registry import tool
+
+
+class SubagentTask(TypedDict):
+    subagent_name: str
+    prompt: str
+
+
+@tool(
+    description="Invoke several subagents concurrently. `tasks` is a list of objects with `subagent_name` and `prompt` keys; use it for independent pieces of work"
+)
+def invoke_subagents(tasks: list[SubagentTask]) -> list[str]:
+    """NOTE: fake tool handled by agent loop"""
+    return []
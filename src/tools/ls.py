@@ -1,13 +1,40 @@
 import os
+from datetime import datetime, timezone
 
 from src.tool_registry import tool
+from src.workspace import WORKSPACE_DIR, resolve_workspace_path
 
 
-@tool(description="List files in the directory")
-def ls() -> list[str]:
-    """List files in the working directory"""
+def file_entry(name: str, stat: os.stat_result, is_dir: bool) -> dict:
+    """What the file tools report about one workspace entry."""
+    entry = {"name": name, "type": "dir" if is_dir else "file"}
+    if not is_dir:
+        entry["size"] = stat.st_size
+    entry["modified"] = datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(
+        timespec="seconds"
+    )
+    return entry
+
+
+@tool(
+    description="List the files in a workspace directory with their size in bytes and last-modified time"
+)
+def ls(path: str = "") -> list[dict]:
+    """
+    List files in the working directory.
+
+    Args:
+        path: Subdirectory of the workspace to list, defaults to its top level
+    """
     try:
-        os.makedirs("agent_output", exist_ok=True)
-        return os.listdir("agent_output")
+        os.makedirs(WORKSPACE_DIR, exist_ok=True)
+        with os.scandir(resolve_workspace_path(path)) as entries:
+            return sorted(
+                (
+                    file_entry(entry.name, entry.stat(), entry.is_dir())
+                    for entry in entries
+                ),
+                key=lambda entry: entry["name"],
+            )
     except Exception as e:
         return f"Error listing files: {str(e)}"
@@ -0,0 +1,106 @@
+import asyncio
+import json
+from urllib.parse import urlsplit, urlunsplit
+
+from src.search import get_search_provider
+from src.tool_registry import tool
+from src.tool_results import project_fields
+
+# Size of the merged result in the transcript; page content is trimmed to fit
+MULTI_SEARCH_MAX_CHARS = 12_000
+
+_project_results = project_fields(
+    "title", "url", "content", "raw_content", "queries", list_key="results"
+)
+
+
+def _project(response: dict) -> dict:
+    projected = _project_results(response)
+    if response.get("errors"):
+        projected["errors"] = response["errors"]
+    return projected
+
+
+def _size(response: dict) -> int:
+    return len(
+        json.dumps(
+            _project(response), separators=(",", ":"), ensure_ascii=False, default=str
+        )
+    )
+
+
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(url)
+    return urlunsplit(
+        (
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path.rstrip("/"),
+            parts.query,
+            "",
+        )
+    )
+
+
+@tool(
+    description="Run several web searches concurrently and return the merged results, without duplicate pages. Prefer this over repeated internet_search calls",
+    project=_project,
+    max_result_chars=MULTI_SEARCH_MAX_CHARS,
+)
+async def multi_search(
+    queries: list[str],
+    max_results: int = 5,
+    include_raw_content: bool = False,
+):
+    """Run web searches concurrently and merge their results"""
+    provider = get_search_provider()
+    responses = await asyncio.gather(
+        *(
+            provider.search(
+                query,
+                max_results=max_results,
+                include_raw_content=include_raw_content,
+            )
+            for query in queries
+        ),
+        return_exceptions=True,
+    )
+
+    merged: dict[str, dict] = {}
+    errors = []
+    for query, response in zip(queries, responses):
+        if isinstance(response, Exception):
+            errors.append(f"{query}: {response}")
+            continue
+        for result in response.get("results", []):
+            key = _normalize_url(result["url"])
+            if key in merged:
+                seen = merged[key]
+                seen["queries"].append(query)
+                seen["score"] = max(seen.get("score") or 0, result.get("score") or 0)
+            else:
+                merged[key] = {**result, "queries": [query]}
+
+    results = sorted(merged.values(), key=lambda r: r.get("score") or 0, reverse=True)
+    merged_response = {"results": results}
+    if errors:
+        merged_response["errors"] = errors
+
+    # Share what the titles, URLs and queries leave of the size cap evenly
+    # between the pages' text fields, so every page keeps some content and
+    # the projected result is not spilled; a tenth is left for JSON escaping
+    fields = [
+        (result, field)
+        for result in results
+        for field in ("content", "raw_content")
+        if isinstance(result.get(field), str)
+    ]
+    if _size(merged_response) > MULTI_SEARCH_MAX_CHARS and fields:
+        texts = [result[field] for result, field in fields]
+        for result, field in fields:
+            result[field] = ""
+        overhead = _size(merged_response)
+        share = max(0, (MULTI_SEARCH_MAX_CHARS - overhead) * 9 // 10) // len(fields)
+        for (result, field), value in zip(fields, texts):
+            result[field] = value if len(value) <= share else value[:share] + "..."
+    return merged_response
@@ -1,9 +1,123 @@
+from typing import Any, Literal
+
 from src.tool_registry import tool
+from src.workspace import resolve_workspace_path
+from src.workspace_files import align_to_characters, open_workspace_file
+
+# Page size when the caller gives no `limit` and the file is too long to return whole
+DEFAULT_READ_LINES = 2000
+DEFAULT_READ_BYTES = 64 * 1024
+# No page is larger than this, so a page is never spilled again by the result
+# encoder (its limit below leaves room for the page header)
+MAX_PAGE_BYTES = DEFAULT_READ_BYTES
+
+
+def _out_of_range(
+    filename: str, offset: int, unit: str, end: int, message: str
+) -> dict[str, Any]:
+    return {
+        "error": "invalid_offset",
+        "file": filename,
+        "offset": offset,
+        "unit": unit,
+        unit: end,
+        "message": message,
+    }
+
+
+@tool(
+    description="Read a file from the workspace. Files longer than 2000 lines or 64 KB are returned a page at a time, with a header giving the file's size and the offset of the next page",
+    max_result_chars=MAX_PAGE_BYTES + 1024,
+)
+def read_file(
+    filename: str,
+    offset: int = 0,
+    limit: int | None = None,
+    unit: Literal["lines", "bytes"] = "lines",
+) -> str | dict[str, Any]:
+    """
+    Read file contents, whole or one page at a time.
+
+    Args:
+        filename: File in the workspace
+        offset: Lines (or bytes) to skip from the start of the file
+        limit: Lines (or bytes) to return, defaults to 2000 lines or 64 KB;
+            a page never exceeds 64 KB
+        unit: Whether offset and limit count lines or bytes
+    """
+    if limit is not None and limit < 1:
+        return {
+            "error": "invalid_limit",
+            "file": filename,
+            "limit": limit,
+            "message": "limit must be at least 1",
+        }
+
+    try:
+        path = resolve_workspace_path(filename)
+    except ValueError as e:
+        return {"error": "outside_workspace", "file": filename, "message": str(e)}
 
+    with open_workspace_file(path) as file:
+        if unit == "bytes":
+            if not 0 <= offset < max(1, file.size):
+                return _out_of_range(
+                    filename,
+                    offset,
+                    "bytes",
+                    file.size,
+                    f"offset must be at least 0 and less than the file's {file.size} bytes",
+                )
+            page = min(limit or DEFAULT_READ_BYTES, MAX_PAGE_BYTES)
+            start, end = align_to_characters(
+                file.data, offset, min(offset + page, file.size)
+            )
+            if start == end < file.size:
+                # `limit` is narrower than the character here; return it whole
+                # so the next offset always moves forward
+                while start < file.size and file.data[start] & 0xC0 == 0x80:
+                    start += 1
+                end = min(start + 1, file.size)
+                while end < file.size and file.data[end] & 0xC0 == 0x80:
+                    end += 1
+            if start == 0 and end == file.size:
+                return file.text(0, end)
+            return (
+                f"[{filename}: bytes {start}-{end} of {file.size}, {file.lines} lines"
+                + (f"; next offset={end}" if end < file.size else "; end of file")
+                + "]\n"
+                + file.text(start, end)
+            )
 
-@tool(description="Read file contents")
-def read_file(filename: str) -> str:
-    """Read file contents"""
-    with open(f"agent_output/{filename}", "r", encoding="utf-8") as f:
-        content = f.read()
-    return content
+        if not 0 <= offset < max(1, file.lines):
+            return _out_of_range(
+                filename,
+                offset,
+                "lines",
+                file.lines,
+                f"offset must be at least 0 and less than the file's {file.lines} lines",
+            )
+        first = offset
+        last = min(first + (limit or DEFAULT_READ_LINES), file.lines)
+        start = file.line_offset(first)
+        if file.line_offset(last) - start > MAX_PAGE_BYTES:
+            # Stop at the last whole line that fits the page size
+            last = max(first + 1, file.line_of(start + MAX_PAGE_BYTES))
+        end = file.line_offset(last)
+        if end - start > MAX_PAGE_BYTES:
+            # A single line longer than a page: return its start only
+            _, cut = align_to_characters(file.data, start, start + MAX_PAGE_BYTES)
+            return (
+                f"[{filename}: line {first + 1} of {file.lines} is {end - start} "
+                f"bytes, truncated; read the rest with unit='bytes', offset={cut}]\n"
+                + file.text(start, cut)
+            )
+        text = file.text(start, end)
+        if first == 0 and last == file.lines:
+            return text
+        return (
+            f"[{filename}: lines {first + 1}-{last} of {file.lines}, {file.size} bytes"
+            + (f"; next offset={last}" if last < file.lines else "; end of file")
+            + "]\n"
+            + text
+        )
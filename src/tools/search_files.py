@@ -0,0 +1,37 @@
+import re
+
+from src.tool_registry import tool
+from src.workspace_index import workspace_index
+
+
+@tool(
+    description="Search the text of every workspace file at once and return the matching lines with their file and line number. Use this instead of reading files one by one to find something"
+)
+def search_files(
+    query: str,
+    regex: bool = False,
+    case_sensitive: bool = False,
+    files: str | None = None,
+    max_results: int = 50,
+) -> dict:
+    """
+    Full-text search over the workspace.
+
+    Args:
+        query: Text to find, or a regular expression if `regex` is true
+        regex: Treat the query as a regular expression
+        case_sensitive: Match case exactly
+        files: Only search files whose path matches this glob, e.g. `*.md`
+        max_results: Maximum matching lines to return
+    """
+    try:
+        matches, truncated = workspace_index.search(
+            query,
+            regex=regex,
+            case_sensitive=case_sensitive,
+            files=files,
+            max_results=max_results,
+        )
+    except re.error as e:
+        return f"Error: invalid regular expression: {str(e)}"
+    return {"matches": matches, "truncated": truncated}
@@ -1,15 +1,19 @@
 import os
 
 from src.tool_registry import tool
+from src.workspace import WORKSPACE_DIR, resolve_workspace_path
+from src.workspace_index import workspace_index
 
 
-@tool(description="Write content directly to filesystem")
+@tool(description="Write content directly to filesystem", serial=True)
 def write_file(filename: str, content: str) -> str:
     """Write content directly to a file on the filesystem"""
     try:
-        os.makedirs("agent_output", exist_ok=True)
-        with open(f"agent_output/{filename}", "w", encoding="utf-8") as f:
+        os.makedirs(WORKSPACE_DIR, exist_ok=True)
+        path = resolve_workspace_path(filename)
+        with open(path, "w", encoding="utf-8") as f:
             f.write(content)
+        workspace_index.invalidate(path)
         return f"Successfully wrote {len(content)} characters to {filename}"
     except Exception as e:
         return f"Error writing to {filename}: {str(e)}"
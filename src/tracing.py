@@ -0,0 +1,337 @@
+import atexit
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Protocol
+
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    """
+    One timed operation in a trace.
+
+    Using a span as a context manager makes it the parent of every span
+    started inside the block, including in tasks and tool threads spawned
+    from it, and ends it on exit (recording an exception as an error). A span
+    can also be ended explicitly with `end()` without ever becoming current.
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "status",
+        "error",
+        "_tracer",
+        "_token",
+    )
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        parent: "Span | None",
+        attributes: dict[str, Any],
+    ):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: str | None = None
+        self._tracer = tracer
+        self._token: contextvars.Token | None = None
+
+    @property
+    def recording(self) -> bool:
+        return True
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self._tracer.export(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.record_error(exc)
+        self.end()
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Returned by `span()` while tracing is disabled; every method does nothing."""
+
+    __slots__ = ()
+    recording = False
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: dict[str, Any]) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+class Tracer:
+    """Creates spans and hands every finished one to the exporters."""
+
+    def __init__(self, exporters: list[SpanExporter]):
+        self.exporters = exporters
+
+    def start_span(
+        self, name: str, attributes: dict[str, Any], parent: Span | None = None
+    ) -> Span:
+        return Span(self, name, parent or _current_span.get(), attributes)
+
+    def export(self, span: Span) -> None:
+        for exporter in self.exporters:
+            exporter.export(span)
+
+    def shutdown(self) -> None:
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+
+_tracer: Tracer | None = None
+
+
+def span(name: str, **attributes: Any) -> Span | _NoopSpan:
+    """
+    Start a span under the current one.
+
+    Costs a single global check while tracing is disabled.
+
+    Args:
+        name: Operation name, e.g. "llm.call"
+        attributes: Initial span attributes
+    """
+    if _tracer is None:
+        return NOOP_SPAN
+    return _tracer.start_span(name, attributes)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+def configure_tracing(*exporters: SpanExporter) -> Tracer:
+    """Enable tracing with the given exporters, replacing any previous setup."""
+    global _tracer
+    disable_tracing()
+    _tracer = Tracer(list(exporters))
+    return _tracer
+
+
+def disable_tracing() -> None:
+    """Stop tracing and flush the exporters."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.shutdown()
+    _tracer = None
+
+
+class InMemoryExporter:
+    """Keeps finished spans in `spans`, for tests and benchmarks."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JSONLExporter:
+    """Appends one JSON object per finished span to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class OTLPJSONExporter:
+    """
+    Writes spans in the OpenTelemetry OTLP/JSON trace format.
+
+    Each line of the file is one `ExportTraceServiceRequest` holding up to
+    `batch_size` spans, the format read by the collector's `otlpjsonfile`
+    receiver and accepted by any OTLP/HTTP endpoint at `/v1/traces`.
+    """
+
+    def __init__(
+        self, path: str, *, service_name: str = "deepagents", batch_size: int = 256
+    ):
+        self.path = path
+        self.service_name = service_name
+        self.batch_size = batch_size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._batch: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._batch.append(span)
+            if len(self._batch) >= self.batch_size:
+                self._write()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._write()
+
+    def _write(self) -> None:
+        if not self._batch:
+            return
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": _otlp_attributes(
+                            {"service.name": self.service_name}
+                        )
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "deepagents"},
+                            "spans": [_otlp_span(span) for span in self._batch],
+                        }
+                    ],
+                }
+            ]
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request, separators=(",", ":")) + "\n")
+        self._batch = []
+
+
+def _otlp_span(span: Span) -> dict[str, Any]:
+    otlp = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        # SPAN_KIND_INTERNAL
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        # STATUS_CODE_OK / STATUS_CODE_ERROR
+        "status": {"code": 2, "message": span.error}
+        if span.status == "error"
+        else {"code": 1},
+    }
+    if span.parent_id:
+        otlp["parentSpanId"] = span.parent_id
+    return otlp
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    converted = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        converted.append({"key": key, "value": typed})
+    return converted
+
+
+# DEEPAGENTS_TRACE=<path> enables tracing for the whole process, written as
+# plain span records or, with DEEPAGENTS_TRACE_FORMAT=otlp, as OTLP/JSON
+if os.getenv("DEEPAGENTS_TRACE"):
+    _path = os.environ["DEEPAGENTS_TRACE"]
+    configure_tracing(
+        OTLPJSONExporter(_path)
+        if os.getenv("DEEPAGENTS_TRACE_FORMAT") == "otlp"
+        else JSONLExporter(_path)
+    )
+atexit.register(disable_tracing)
@@ -0,0 +1,24 @@
+import os
+
+# Directory every file tool reads from and writes to
+WORKSPACE_DIR = os.getenv("DEEPAGENTS_WORKSPACE", "agent_output")
+
+
+def workspace_path(filename: str) -> str:
+    """Path of `filename` inside the agent workspace."""
+    return os.path.join(WORKSPACE_DIR, filename)
+
+
+def resolve_workspace_path(path: str) -> str:
+    """
+    Resolved path of `path` inside the agent workspace.
+
+    Raises:
+        ValueError: If `path` leads outside the workspace, through `..`, an
+            absolute path or a symlink
+    """
+    root = os.path.realpath(WORKSPACE_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if resolved != root and not resolved.startswith(root + os.sep):
+        raise ValueError(f"{path} is outside the workspace")
+    return resolved
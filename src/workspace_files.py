@@ -0,0 +1,151 @@
+import bisect
+import mmap
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
+
+# Files at least this large are read through mmap, with a cached line index,
+# so paging through them never loads the whole file
+MMAP_THRESHOLD = 1 << 20
+MAX_INDEXED_FILES = 8
+
+_NEWLINE = re.compile(b"\n")
+
+_line_indexes: OrderedDict[str, tuple[tuple[int, int], array]] = OrderedDict()
+_line_indexes_lock = threading.Lock()
+
+
+class WorkspaceFile:
+    """
+    An open workspace file: its bytes (mapped or read) and line offsets.
+
+    Lines are numbered from 0 here; `starts[i]` is the byte offset of line i.
+    A final line without a trailing newline still counts as a line.
+    """
+
+    def __init__(self, data: bytes | mmap.mmap, size: int, starts: array):
+        self.data = data
+        self.size = size
+        self.starts = starts
+
+    @property
+    def lines(self) -> int:
+        return len(self.starts)
+
+    def line_offset(self, line: int) -> int:
+        """Byte offset where `line` starts, or the file size past the last line."""
+        return self.starts[line] if line < len(self.starts) else self.size
+
+    def line_of(self, offset: int) -> int:
+        """The line (from 0) containing byte `offset`."""
+        return max(0, bisect.bisect_right(self.starts, offset) - 1)
+
+    def text(self, start: int, end: int) -> str:
+        return self.data[start:end].decode("utf-8", errors="replace")
+
+    def find(self, needle: bytes, start: int = 0) -> int:
+        return self.data.find(needle, start)
+
+
+def _line_starts(data: bytes | mmap.mmap, size: int) -> array:
+    starts = array("Q", [0] if size else [])
+    starts.extend(
+        match.end() for match in _NEWLINE.finditer(data) if match.end() < size
+    )
+    return starts
+
+
+@contextmanager
+def open_workspace_file(path: str) -> Iterator[WorkspaceFile]:
+    """Open `path` for reading; large files are memory-mapped and their line index cached."""
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size < MMAP_THRESHOLD:
+            data = f.read()
+            yield WorkspaceFile(data, len(data), _line_starts(data, len(data)))
+            return
+
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield WorkspaceFile(
+                mapped, stat.st_size, _cached_line_starts(path, stat, mapped)
+            )
+        finally:
+            mapped.close()
+
+
+def _cached_line_starts(path: str, stat: os.stat_result, mapped: mmap.mmap) -> array:
+    key = os.path.realpath(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _line_indexes_lock:
+        entry = _line_indexes.get(key)
+        if entry is not None and entry[0] == version:
+            _line_indexes.move_to_end(key)
+            return entry[1]
+
+    starts = _line_starts(mapped, stat.st_size)
+    with _line_indexes_lock:
+        _line_indexes[key] = (version, starts)
+        _line_indexes.move_to_end(key)
+        if len(_line_indexes) > MAX_INDEXED_FILES:
+            _line_indexes.popitem(last=False)
+    return starts
+
+
+def forget_line_index(path: str) -> None:
+    """Drop the cached line index of `path` after it was modified."""
+    with _line_indexes_lock:
+        _line_indexes.pop(os.path.realpath(path), None)
+
+
+def align_to_characters(
+    data: bytes | mmap.mmap, start: int, end: int
+) -> tuple[int, int]:
+    """Move a byte range inwards so it neither starts nor ends inside a UTF-8 character."""
+    size = len(data)
+    while start < end and start < size and data[start] & 0xC0 == 0x80:
+        start += 1
+    while start < end < size and data[end] & 0xC0 == 0x80:
+        end -= 1
+    return start, end
+
+
+def append_text(path: str, text: str) -> int:
+    """Append `text` to `path`, creating it if needed; returns the new size in bytes."""
+    with open(path, "ab") as f:
+        f.write(text.encode("utf-8"))
+        size = f.tell()
+    forget_line_index(path)
+    return size
+
+
+def replace_bytes(path: str, start: int, end: int, data: bytes) -> int:
+    """
+    Replace bytes `start:end` of `path` with `data`.
+
+    Only the part of the file after `start` is rewritten (nothing else when
+    the replacement has the same length), so edits near the end of a long
+    document cost little.
+
+    Returns:
+        The new size in bytes
+    """
+    with open(path, "r+b") as f:
+        if len(data) == end - start:
+            f.seek(start)
+            f.write(data)
+            f.seek(0, os.SEEK_END)
+        else:
+            f.seek(end)
+            tail = f.read()
+            f.seek(start)
+            f.write(data)
+            f.write(tail)
+            f.truncate()
+        size = f.tell()
+    forget_line_index(path)
+    return size
@@ -0,0 +1,320 @@
+import bisect
+import fnmatch
+import os
+import re
+import threading
+import time
+from array import array
+from typing import Any, Iterator
+
+from .tool_results import SPILL_DIR
+from .workspace import WORKSPACE_DIR
+
+# Larger files are not indexed (they are still searched, by a direct scan)
+MAX_INDEXED_BYTES = 8 << 20
+# Files whose first bytes contain a NUL are treated as binary and skipped
+BINARY_SNIFF_BYTES = 8192
+MAX_SNIPPET_CHARS = 200
+# Top-level workspace directories that are never indexed
+EXCLUDED_DIRS = frozenset({SPILL_DIR})
+
+
+class _IndexedFile:
+    __slots__ = ("id", "version", "text", "line_starts")
+
+    def __init__(self, id: int, version: tuple[int, int], text: str):
+        self.id = id
+        self.version = version
+        self.text = text
+        self.line_starts = _line_starts(text)
+
+
+def _trigrams(text: str) -> set[str]:
+    return set(map("".join, zip(text, text[1:], text[2:])))
+
+
+def _line_starts(text: str) -> array:
+    starts = array("Q", [0])
+    starts.extend(
+        match.end() for match in re.finditer("\n", text) if match.end() < len(text)
+    )
+    return starts
+
+
+class WorkspaceIndex:
+    """
+    Incrementally maintained full-text index of the agent workspace.
+
+    Each text file's content is kept in memory, and a posting list maps every
+    (lowercased) three-character sequence to the files containing it, as a
+    bitmap over file ids, so the index costs a few bytes per distinct
+    trigram on top of the text itself. A search only scans the files that
+    contain all trigrams of the query, so finding a phrase among hundreds of
+    research notes touches a handful of them, and never the disk.
+
+    The index is refreshed lazily: the write tools mark the files they
+    change as stale and each search re-indexes those. Files written by other
+    means are picked up by a rescan of the workspace (comparing mtime and
+    size), done at most every `rescan_interval` seconds. Spilled tool
+    results are not indexed.
+    """
+
+    def __init__(self, root: str = WORKSPACE_DIR, *, rescan_interval: float = 5.0):
+        """
+        Args:
+            root: Directory to index
+            rescan_interval: Seconds between full rescans of the workspace
+        """
+        self.root = root
+        self.rescan_interval = rescan_interval
+        self._files: dict[str, _IndexedFile] = {}
+        self._names: dict[int, str] = {}
+        self._free_ids: list[int] = []
+        self._postings: dict[str, int] = {}
+        self._stale: set[str] = set()
+        # Versions of binary files, so they are not re-read on every refresh
+        self._skipped: dict[str, tuple[int, int]] = {}
+        # Files too large to index, searched by a direct scan
+        self._large: set[str] = set()
+        self._scanned_at: float | None = None
+        self._lock = threading.Lock()
+        self.stats = {"refreshes": 0, "rescans": 0, "indexed": 0, "removed": 0}
+
+    def invalidate(self, path: str) -> None:
+        """Mark the file at `path` (a workspace path) as changed."""
+        relative = os.path.relpath(path, os.path.realpath(self.root))
+        with self._lock:
+            self._stale.add(relative)
+
+    def refresh(self, *, rescan: bool = True) -> None:
+        """
+        Bring the index up to date with the workspace.
+
+        Args:
+            rescan: Re-stat the whole workspace now, rather than only when
+                `rescan_interval` has passed
+        """
+        with self._lock:
+            self._refresh(rescan)
+
+    def search(
+        self,
+        query: str,
+        *,
+        regex: bool = False,
+        case_sensitive: bool = False,
+        files: str | None = None,
+        max_results: int = 50,
+    ) -> tuple[list[dict[str, Any]], bool]:
+        """
+        Find lines matching `query`.
+
+        Args:
+            query: Text (or a regular expression) to find
+            regex: Treat `query` as a regular expression
+            case_sensitive: Match case exactly
+            files: Glob of workspace-relative paths to search
+            max_results: Matching lines to return
+
+        Returns:
+            Matches as {"file", "line", "text"} in path and line order, and
+            whether more matches were left out
+
+        Raises:
+            re.error: If `regex` is set and `query` is not a valid expression
+        """
+        flags = 0 if case_sensitive else re.IGNORECASE
+        pattern = re.compile(query if regex else re.escape(query), flags)
+        # A literal query can only match files holding all of its trigrams
+        required = set() if regex else _trigrams(query.lower())
+
+        with self._lock:
+            self._refresh(rescan=False)
+            sources = self._candidates(required) + [
+                (relative, None) for relative in self._large
+            ]
+        if files is not None:
+            sources = [
+                source for source in sources if fnmatch.fnmatch(source[0], files)
+            ]
+        sources.sort(key=lambda source: source[0])
+
+        matches: list[dict[str, Any]] = []
+        for relative, text, line_starts in self._read(sources):
+            last_line = -1
+            for match in pattern.finditer(text):
+                line = bisect.bisect_right(line_starts, match.start()) - 1
+                if line == last_line:
+                    continue
+                last_line = line
+                if len(matches) == max_results:
+                    return matches, True
+                start = line_starts[line]
+                end = text.find("\n", start)
+                snippet = text[start : end if end >= 0 else len(text)].strip()
+                if len(snippet) > MAX_SNIPPET_CHARS:
+                    snippet = snippet[: MAX_SNIPPET_CHARS - 3] + "..."
+                matches.append({"file": relative, "line": line + 1, "text": snippet})
+        return matches, False
+
+    def _candidates(self, required: set[str]) -> list[tuple[str, _IndexedFile | None]]:
+        if not required:
+            return list(self._files.items())
+        holders = -1
+        for trigram in required:
+            holders &= self._postings.get(trigram, 0)
+            if not holders:
+                return []
+        names = []
+        while holders:
+            low = holders & -holders
+            names.append(self._names[low.bit_length() - 1])
+            holders ^= low
+        return [(name, self._files[name]) for name in names]
+
+    def _read(
+        self, sources: list[tuple[str, _IndexedFile | None]]
+    ) -> Iterator[tuple[str, str, array]]:
+        for relative, indexed in sources:
+            if indexed is not None:
+                yield relative, indexed.text, indexed.line_starts
+                continue
+            try:
+                with open(
+                    os.path.join(self.root, relative),
+                    encoding="utf-8",
+                    errors="replace",
+                ) as f:
+                    text = f.read()
+            except OSError:
+                continue
+            yield relative, text, _line_starts(text)
+
+    def _walk(self) -> Iterator[tuple[str, int, int]]:
+        """(relative path, size, mtime_ns) of every indexable file under the root."""
+        if not os.path.isdir(self.root):
+            return
+        pending = [self.root]
+        while pending:
+            directory = pending.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not (directory == self.root and entry.name in EXCLUDED_DIRS):
+                        pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat()
+                    yield (
+                        os.path.relpath(entry.path, self.root),
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                    )
+
+    def _refresh(self, rescan: bool) -> None:
+        self.stats["refreshes"] += 1
+        now = time.monotonic()
+        if (
+            rescan
+            or self._scanned_at is None
+            or now - self._scanned_at >= self.rescan_interval
+        ):
+            self._rescan()
+            self._scanned_at = now
+        else:
+            for relative in self._stale:
+                self._update(relative)
+        self._stale.clear()
+
+    def _rescan(self) -> None:
+        self.stats["rescans"] += 1
+        seen = set()
+        large = set()
+        for relative, size, mtime in self._walk():
+            seen.add(relative)
+            if size > MAX_INDEXED_BYTES:
+                large.add(relative)
+                self._forget(relative)
+                continue
+            version = (mtime, size)
+            if relative not in self._stale and self._current(relative, version):
+                continue
+            self._index(relative, version)
+        for relative in set(self._files) - seen:
+            self._forget(relative)
+            self.stats["removed"] += 1
+        self._skipped = {
+            relative: version
+            for relative, version in self._skipped.items()
+            if relative in seen
+        }
+        self._large = large
+
+    def _update(self, relative: str) -> None:
+        """Re-index one file the write tools reported as changed."""
+        top = relative.split(os.sep, 1)[0]
+        if top == os.pardir or top in EXCLUDED_DIRS:
+            return
+        try:
+            stat = os.stat(os.path.join(self.root, relative))
+        except OSError:
+            if relative in self._files:
+                self.stats["removed"] += 1
+            self._forget(relative)
+            self._large.discard(relative)
+            self._skipped.pop(relative, None)
+            return
+        if stat.st_size > MAX_INDEXED_BYTES:
+            self._forget(relative)
+            self._large.add(relative)
+            return
+        self._large.discard(relative)
+        self._index(relative, (stat.st_mtime_ns, stat.st_size))
+
+    def _current(self, relative: str, version: tuple[int, int]) -> bool:
+        indexed = self._files.get(relative)
+        if indexed is not None and indexed.version == version:
+            return True
+        return self._skipped.get(relative) == version
+
+    def _index(self, relative: str, version: tuple[int, int]) -> None:
+        self._forget(relative)
+        try:
+            with open(os.path.join(self.root, relative), "rb") as f:
+                data = f.read()
+        except OSError:
+            return
+        if b"\0" in data[:BINARY_SNIFF_BYTES]:
+            self._skipped[relative] = version
+            return
+        self._skipped.pop(relative, None)
+        id = self._free_ids.pop() if self._free_ids else len(self._files)
+        indexed = _IndexedFile(id, version, data.decode("utf-8", errors="replace"))
+        self._files[relative] = indexed
+        self._names[id] = relative
+        bit = 1 << id
+        postings = self._postings
+        for trigram in _trigrams(indexed.text.lower()):
+            postings[trigram] = postings.get(trigram, 0) | bit
+        self.stats["indexed"] += 1
+
+    def _forget(self, relative: str) -> None:
+        indexed = self._files.pop(relative, None)
+        if indexed is None:
+            return
+        # The trigrams are recomputed from the text rather than stored per file
+        mask = ~(1 << indexed.id)
+        postings = self._postings
+        for trigram in _trigrams(indexed.text.lower()):
+            holders = postings.get(trigram, 0) & mask
+            if holders:
+                postings[trigram] = holders
+            else:
+                postings.pop(trigram, None)
+        del self._names[indexed.id]
+        self._free_ids.append(indexed.id)
+
+
+workspace_index = WorkspaceIndex()